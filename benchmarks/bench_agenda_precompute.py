@@ -0,0 +1,119 @@
+"""
+Benchmark das consultas "agenda de hoje" com e sem a agenda pré-calculada
+
+Simula o pico da manhã: vários usuários vinculados perguntam pela agenda de hoje
+ao mesmo tempo. A API do Calendar é substituída por uma versão falsa com
+latência fixa. Compara o intent ConsultarAgenda consultando o Calendar ao vivo
+com o mesmo intent depois de uma rodada do AgendaPrecomputer (janela de baixa
+demanda).
+
+Uso:
+    python -m benchmarks.bench_agenda_precompute
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+logging.disable(logging.CRITICAL)
+
+from models.alexa_handler import AlexaRequestHandler  # noqa: E402
+from models.alexa_request import AlexaEnvelope  # noqa: E402
+from services.agenda_precompute import AgendaPrecomputer  # noqa: E402
+from services.metrics import metrics  # noqa: E402
+from services.oauth_service import oauth_service  # noqa: E402
+
+USERS = 50
+CALENDAR_LATENCY = 0.15
+CONCURRENCY = 16
+
+
+class FakeCalendarApi:
+    """Imita service.events().list(...) e service.settings().get(...) com latência fixa"""
+
+    EVENTS = {"items": [{"id": "1", "summary": "Reunião de equipe", "start": {"dateTime": "2026-01-01T09:00:00"}},
+                        {"id": "2", "summary": "Almoço", "start": {"dateTime": "2026-01-01T12:30:00"}}]}
+
+    def __init__(self):
+        self.calls = 0
+
+    def events(self):
+        return _FakeResource(self, "list", self.EVENTS)
+
+    def settings(self):
+        return _FakeResource(self, "get", {"value": "America/Sao_Paulo"})
+
+
+class _FakeResource:
+    def __init__(self, api: FakeCalendarApi, method: str, result):
+        self.api = api
+        self.result = result
+        setattr(self, method, lambda **kwargs: self)
+
+    def execute(self):
+        self.api.calls += 1
+        time.sleep(CALENDAR_LATENCY)
+        return self.result
+
+
+def agenda_envelope(user_id: str) -> AlexaEnvelope:
+    return AlexaEnvelope({
+        "session": {"new": False, "user": {"userId": user_id}},
+        "request": {"type": "IntentRequest",
+                    "intent": {"name": "ConsultarAgenda", "slots": {"periodo": {"name": "periodo", "value": "hoje"}}}}
+    })
+
+
+def morning_peak(handler: AlexaRequestHandler, users):
+    latencies = []
+
+    def ask(user_id):
+        start = time.monotonic()
+        handler.process_request(agenda_envelope(user_id))
+        latencies.append(time.monotonic() - start)
+
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+        list(executor.map(ask, users))
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)]
+
+
+def main():
+    users = [f"amzn1.ask.account.user{i}" for i in range(USERS)]
+    for user_id in users:
+        oauth_service.set_user_token(user_id, "fake", "fake", expiry=time.time() + 3600)
+
+    handler = AlexaRequestHandler()
+    api = FakeCalendarApi()
+
+    def initialize_service(access_token):
+        handler.calendar_service.service = api
+        return True
+
+    handler.calendar_service.initialize_service = initialize_service
+    # Relógio fixo dentro da janela de baixa demanda para a rodada de pré-cálculo
+    precomputer = AgendaPrecomputer(handler.calendar_service, oauth_service, ssml=handler.use_ssml, workers=4,
+                                    hours="4-6", now=lambda tz=None: datetime.now(tz).replace(hour=5))
+    handler.agenda_precomputer = precomputer
+
+    print(f"{USERS} usuários, {CONCURRENCY} consultas simultâneas, Calendar com {CALENDAR_LATENCY * 1000:.0f} ms")
+    p50, p95 = morning_peak(handler, users)
+    print(f"{'Ao vivo':14s} p50={p50 * 1000:6.1f} ms  p95={p95 * 1000:6.1f} ms  chamadas ao Calendar={api.calls}")
+
+    handler.calendar_service.events_cache.clear()
+    api.calls = 0
+    start = time.monotonic()
+    refreshed = precomputer.run_once()
+    print(f"Pré-cálculo: {refreshed} usuários em {time.monotonic() - start:.2f}s "
+          f"({api.calls} chamadas ao Calendar, fora do pico)")
+
+    api.calls = 0
+    metrics.reset()
+    p50, p95 = morning_peak(handler, users)
+    hits = metrics.snapshot()["counters"].get("agenda.precompute.hits", 0)
+    print(f"{'Pré-calculada':14s} p50={p50 * 1000:6.1f} ms  p95={p95 * 1000:6.1f} ms  chamadas ao Calendar={api.calls}  "
+          f"acertos={hits}")
+
+
+if __name__ == "__main__":
+    main()
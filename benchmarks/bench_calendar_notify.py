@@ -0,0 +1,157 @@
+"""
+Benchmark de frescor da agenda com notificações push em vez de polling
+
+Sobe a aplicação em processo (ASGI direto), com a API do Calendar substituída por
+uma versão falsa que aceita events.watch. Os canais dos usuários são abertos,
+a agenda de cada um muda e o substituto local do Google posta a notificação em
+/calendar/notify. Mede o tempo até a próxima consulta ver o evento novo e as
+chamadas ao Calendar, comparando com o polling necessário para o mesmo frescor.
+
+Uso:
+    python -m benchmarks.bench_calendar_notify
+"""
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+os.environ.setdefault("ALEXA_VERIFY_REQUESTS", "false")
+os.environ.setdefault("CALENDAR_WATCH_ADDRESS", "https://exemplo.com/calendar/notify")
+logging.disable(logging.CRITICAL)
+
+from benchmarks.fake_calendar_notifier import notification_headers  # noqa: E402
+from main import app, start_services  # noqa: E402
+from services.date_resolver import date_resolver  # noqa: E402
+from services.oauth_service import oauth_service  # noqa: E402
+
+USERS = 20
+CALENDAR_LATENCY = 0.1
+
+
+class FakeCalendarApi:
+    """events().list/watch e channels().stop com latência fixa e agendas por usuário"""
+
+    def __init__(self):
+        self.calls = 0
+        self.agendas = {}
+        self.user_id = None
+        self._request = None
+
+    def events(self):
+        return self
+
+    def channels(self):
+        return self
+
+    def settings(self):
+        return self
+
+    def get(self, setting):
+        self._request = ("setting", setting)
+        return self
+
+    def list(self, **kwargs):
+        self._request = ("list", self.user_id)
+        return self
+
+    def watch(self, calendarId, body):
+        self._request = ("watch", body)
+        return self
+
+    def stop(self, body):
+        self._request = ("stop", body)
+        return self
+
+    def execute(self):
+        self.calls += 1
+        time.sleep(CALENDAR_LATENCY)
+        kind, arg = self._request
+        if kind == "list":
+            return {"items": [{"id": str(i), "summary": s} for i, s in enumerate(self.agendas.get(arg, []))]}
+        if kind == "watch":
+            expiration = (time.time() + float(arg["params"]["ttl"])) * 1000
+            return {"id": arg["id"], "resourceId": f"res-{arg['id'][:8]}", "expiration": str(int(expiration))}
+        if kind == "setting":
+            return {"value": "America/Sao_Paulo"}
+        return {}
+
+
+async def post_notify(headers) -> int:
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+             "scheme": "https", "path": "/calendar/notify", "raw_path": b"/calendar/notify", "query_string": b"",
+             "root_path": "", "client": ("127.0.0.1", 12345), "server": ("127.0.0.1", 443),
+             "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()]}
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+def main():
+    alexa_handler = start_services()
+    # Rodadas executadas pelo benchmark, sem os agendadores em segundo plano
+    alexa_handler.calendar_watch.stop()
+    alexa_handler.agenda_precomputer.stop()
+
+    users = [f"amzn1.ask.account.user{i}" for i in range(USERS)]
+    for user_id in users:
+        oauth_service.set_user_token(user_id, user_id, "fake", expiry=time.time() + 3600)
+
+    api = FakeCalendarApi()
+    calendar = alexa_handler.calendar_service
+
+    def initialize_service(access_token):
+        # O token falso é o próprio user_id: a API falsa sabe de quem é a agenda
+        api.user_id = access_token
+        calendar.service = api
+        return True
+
+    calendar.initialize_service = initialize_service
+    watch = alexa_handler.calendar_watch
+    watch.filepath = os.path.join(tempfile.mkdtemp(), "calendar_channels.json")
+    precomputer = alexa_handler.agenda_precomputer
+
+    opened = watch.run_once()
+    for user_id in users:
+        api.agendas[user_id] = ["Reunião de equipe"]
+        precomputer.refresh_user(user_id)
+    api.calls = 0
+
+    # Cada agenda ganha um evento; o Google avisa e o webhook invalida e recalcula
+    freshness = []
+    for user_id in users:
+        api.agendas[user_id] = ["Reunião de equipe", "Dentista"]
+        changed_at = time.monotonic()
+        channel = watch.channel_for(user_id)
+        status = asyncio.run(post_notify(notification_headers(channel.channel_id, channel.token,
+                                                               channel.resource_id)))
+        assert status == 200
+        precomputer.run_once()
+        today = date_resolver.today(calendar.user_timezone(user_id))
+        assert "2 eventos" in (precomputer.get_speech(user_id, today) or "")
+        freshness.append(time.monotonic() - changed_at)
+    freshness.sort()
+
+    forged = notification_headers(watch.channel_for(users[0]).channel_id, "token-errado", "res")
+    rejected = asyncio.run(post_notify(forged))
+
+    print(f"{USERS} usuários, {opened} canais abertos, Calendar com {CALENDAR_LATENCY * 1000:.0f} ms")
+    print(f"Push: agenda atualizada em p50={freshness[len(freshness) // 2] * 1000:.0f} ms após a mudança, "
+          f"{api.calls / USERS:.0f} chamadas ao Calendar por mudança; notificação forjada: HTTP {rejected}")
+    staleness = freshness[len(freshness) // 2]
+    polls_per_hour = 3600 / max(staleness, 1.0) * len(users) * 2
+    print(f"Polling com o mesmo frescor (>= 1 s): {polls_per_hour:,.0f} chamadas ao Calendar por hora "
+          f"para {USERS} usuários (hoje e amanhã), mesmo sem mudanças")
+
+
+if __name__ == "__main__":
+    main()
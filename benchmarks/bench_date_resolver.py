@@ -0,0 +1,77 @@
+"""
+Benchmark da resolução dos slots data/periodo da consulta à agenda
+
+Compara uma réplica da lógica anterior do handler (datetime.now() e lower() a
+cada comparação, só hoje/amanhã/ontem/ISO) com o DateResolver (tabela do dia
+por fuso). Mostra também quantos valores do AMAZON.DATE cada versão entende.
+
+Uso:
+    python -m benchmarks.bench_date_resolver
+"""
+import time
+from datetime import datetime, timedelta
+
+from services.date_resolver import date_resolver, zone
+
+SLOTS = [(None, "hoje"), (None, "amanhã"), (None, "esta semana"), ("2026-10-20", None), (None, None),
+         ("2026-W43", None), ("2026-10-XX", None), ("2026-W43-WE", None), (None, "próximo mês")]
+
+
+def legacy_parse_date(date_text):
+    """Réplica de CalendarService.parse_date_from_speech anterior"""
+    try:
+        now = datetime.now()
+        if date_text.lower() in ['hoje', 'today']:
+            return now.replace(hour=0, minute=0, second=0, microsecond=0)
+        elif date_text.lower() in ['amanhã', 'tomorrow']:
+            return (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        elif date_text.lower() in ['ontem', 'yesterday']:
+            return (now - timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return datetime.fromisoformat(date_text)
+    except Exception:
+        return None
+
+
+def legacy_resolve(data, periodo):
+    """Réplica da determinação do período em handle_consultar_agenda anterior"""
+    if data:
+        target_date = legacy_parse_date(data)
+        if target_date:
+            return target_date, target_date + timedelta(days=1), True
+        time_min = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        return time_min, time_min + timedelta(days=1), False
+    if periodo:
+        if periodo.lower() in ['hoje', 'today']:
+            time_min = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+            return time_min, time_min + timedelta(days=1), True
+        if periodo.lower() in ['amanhã', 'tomorrow']:
+            time_min = (datetime.now() + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+            return time_min, time_min + timedelta(days=1), True
+        time_min = datetime.now()
+        return time_min, time_min + timedelta(days=7), False
+    time_min = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    return time_min, time_min + timedelta(days=1), True
+
+
+def measure(func, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for data, periodo in SLOTS:
+            func(data, periodo)
+    return (time.perf_counter() - start) / (rounds * len(SLOTS)) * 1e6
+
+
+def main(rounds: int = 20000):
+    tz = zone("America/Sao_Paulo")
+    legacy = measure(legacy_resolve, rounds)
+    resolver = measure(lambda data, periodo: date_resolver.resolve(data, periodo, tz), rounds)
+    amazon_dates = [data for data, _ in SLOTS if data]
+    legacy_ok = sum(1 for data in amazon_dates if legacy_parse_date(data))
+    resolver_ok = sum(1 for data in amazon_dates if date_resolver.resolve_date(data, tz))
+    print(f"{len(SLOTS)} combinações de slots, {rounds} rodadas")
+    print(f"{'Antes':13s} {legacy:6.2f} µs por resolução, {legacy_ok}/{len(amazon_dates)} valores AMAZON.DATE")
+    print(f"{'DateResolver':13s} {resolver:6.2f} µs por resolução, {resolver_ok}/{len(amazon_dates)} valores AMAZON.DATE")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark de decodificação do envelope da Alexa
+
+Compara o fluxo anterior (json.loads do corpo e cadeias de .get(...) repetidas
+em cada etapa do despacho) com AlexaEnvelope (decodificação única a partir dos
+bytes e campos memorizados compartilhados pelo despacho).
+
+Uso:
+    python -m benchmarks.bench_envelope_parsing
+"""
+import json
+import timeit
+import tracemalloc
+from pathlib import Path
+
+from models.alexa_request import AlexaEnvelope
+
+INTENT_BODY = (Path(__file__).resolve().parent.parent / "test_requests" / "gemini_intent.json").read_bytes()
+
+
+def legacy_dispatch(body: bytes):
+    """Acessos feitos pelo fluxo anterior para um IntentRequest"""
+    alexa_request = json.loads(body)
+    request_type = alexa_request.get("request", {}).get("type")
+    intent = alexa_request.get("request", {}).get("intent", {})
+    intent_name = intent.get("name")
+    pergunta = intent.get("slots", {}).get("pergunta", {}).get("value", "")
+    locale = alexa_request.get("request", {}).get("locale")
+    user_id = alexa_request.get("session", {}).get("user", {}).get("userId", "")
+    return request_type, intent_name, pergunta, locale, user_id
+
+
+def envelope_dispatch(body: bytes):
+    """Mesmos acessos usando o envelope tipado"""
+    envelope = AlexaEnvelope.from_bytes(body)
+    return (envelope.request_type, envelope.intent_name, envelope.slot_value("pergunta"),
+            envelope.locale, envelope.user_id)
+
+
+def allocated_bytes(func, repetitions: int = 1000) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[1]
+    for _ in range(repetitions):
+        func(INTENT_BODY)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return (peak - before) / 1024
+
+
+def main(number: int = 20000):
+    assert legacy_dispatch(INTENT_BODY) == envelope_dispatch(INTENT_BODY)
+    legacy = timeit.timeit(lambda: legacy_dispatch(INTENT_BODY), number=number) / number * 1e6
+    envelope = timeit.timeit(lambda: envelope_dispatch(INTENT_BODY), number=number) / number * 1e6
+    print(f"IntentRequest ({len(INTENT_BODY)} bytes), {number} iterações")
+    print(f"json.loads + .get(...):  {legacy:7.2f} µs/requisição, pico {allocated_bytes(legacy_dispatch):6.1f} KiB")
+    print(f"AlexaEnvelope:           {envelope:7.2f} µs/requisição, pico {allocated_bytes(envelope_dispatch):6.1f} KiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark das respostas locais do FAQ (antes do Gemini)
+
+Mede o tempo de consulta ao índice e quantas perguntas são respondidas
+localmente num conjunto rotulado: variações das perguntas do FAQ (que não
+estão escritas assim no arquivo) e perguntas gerais, que devem seguir ao Gemini.
+Também confere o recarregamento quando o arquivo muda.
+
+Uso:
+    python -m benchmarks.bench_faq
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from zoneinfo import ZoneInfo
+
+logging.disable(logging.CRITICAL)
+
+from config.settings import config  # noqa: E402
+from services.faq import FaqService  # noqa: E402
+from services.metrics import MetricsRegistry  # noqa: E402
+
+# (pergunta, id esperado ou None para seguir ao Gemini)
+UTTERANCES = [
+    ("Que horas são?", "hora"), ("alexa que horas são agora por favor", "hora"), ("me fala a hora", "hora"),
+    ("que dia é hoje?", "data"), ("qual é a data de hoje", "data"), ("hoje é que dia", "data"),
+    ("o que você faz?", "sobre_skill"), ("Quem é você", "sobre_skill"), ("o que você sabe fazer", "sobre_skill"),
+    ("quem criou você", "criador"), ("quem desenvolveu essa skill", "criador"),
+    ("qual modelo de inteligência artificial você usa", "modelo"), ("você é o chat gpt", "modelo"),
+    ("como eu vinculo minha conta do google", "vincular_conta"), ("como conecto minha agenda", "vincular_conta"),
+    ("como desvinculo minha conta", "desvincular_conta"),
+    ("você grava tudo que eu falo", "privacidade"), ("meus dados estão seguros com você", "privacidade"),
+    ("qual a capital da França", None), ("quem descobriu o Brasil", None), ("o que é um buraco negro", None),
+    ("me conta uma piada", None), ("como funciona a fotossíntese", None), ("quem criou a teoria da relatividade", None),
+    ("que dia é o natal", None), ("quantas horas tem um dia", None), ("o que você acha de futebol", None),
+    ("como fazer um bolo de chocolate", None), ("qual a data da independência do Brasil", None),
+    ("que horas são em tóquio", None), ("qual o horário do jogo agora", None), ("que dia é hoje no japão", None),
+    ("que horas começa a novela hoje", None), ("qual a data do próximo feriado", None),
+]
+
+
+def main(rounds: int = 2000):
+    registry = MetricsRegistry()
+    faq = FaqService(config.FAQ_FILE, registry=registry)
+    tz = ZoneInfo("America/Sao_Paulo")
+
+    correct = hits = false_hits = expected_hits = 0
+    for question, expected in UTTERANCES:
+        match = faq.index.match(question)
+        found = match[0].id if match else None
+        expected_hits += expected is not None
+        if found is not None:
+            hits += 1
+            correct += found == expected
+            false_hits += found != expected
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for question, _ in UTTERANCES:
+            faq.answer(question, tz)
+    per_lookup = (time.perf_counter() - start) / (rounds * len(UTTERANCES)) * 1e6
+
+    print(f"{len(faq.index)} perguntas no FAQ, {len(UTTERANCES)} perguntas de teste ({expected_hits} do FAQ)")
+    print(f"Respondidas localmente: {correct}/{expected_hits} do FAQ, {false_hits} respostas erradas "
+          f"({hits} acertos no total)")
+    print(f"Consulta ao índice: {per_lookup:.1f} µs por pergunta (com preenchimento de hora/data)")
+    snapshot = registry.snapshot()["counters"]
+    rate = snapshot.get("faq.hits", 0) / (snapshot.get("faq.hits", 0) + snapshot.get("faq.misses", 0))
+    print(f"Métricas: faq.hits={snapshot.get('faq.hits', 0):.0f} faq.misses={snapshot.get('faq.misses', 0):.0f} "
+          f"(taxa de acerto {rate:.0%})")
+
+    # Recarregamento: uma pergunta nova no arquivo passa a ser respondida sem reiniciar
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "faq.json")
+    shutil.copy(config.FAQ_FILE, path)
+    live = FaqService(path, reload_interval=0, registry=MetricsRegistry())
+    before = live.answer("qual o horário de suporte")
+    with open(path, encoding="utf-8") as f:
+        items = json.load(f)
+    items.append({"id": "suporte", "questions": ["qual o horário de suporte"], "answer": "Das 9 às 18 horas."})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(items, f, ensure_ascii=False)
+    os.utime(path, (time.time() + 1, time.time() + 1))
+    after = live.answer("qual o horário de suporte")
+    print(f"Recarregamento: antes={before!r} depois={after!r}")
+    shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
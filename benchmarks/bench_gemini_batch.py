@@ -0,0 +1,87 @@
+"""
+Benchmark dos jobs em lote do Gemini (respostas pré-geradas em segundo plano)
+
+Gera respostas para um conjunto de perguntas em alta e depois as pergunta de
+novo, como os usuários fariam ("Alexa, ..."). Compara:
+  - Antes: generate_content uma pergunta por vez;
+  - Batch API: um job batchGenerateContent no Gemini falso, acompanhado por poll_batch;
+  - Pipeline: o mesmo job com a Batch API indisponível (404), por generateContent
+    com concorrência limitada.
+Para cada um mede o tempo até todas as respostas estarem no cache, as
+requisições que contaram na cota da chave (e quanto tempo elas levariam com
+GEMINI_RATE_LIMIT_RPM, ou 60 RPM com o limite local desativado) e quantas perguntas dos usuários foram servidas do cache.
+
+Uso:
+    python -m benchmarks.bench_gemini_batch
+"""
+import logging
+import os
+import random
+import string
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+os.environ["SEMANTIC_CACHE_EMBEDDER"] = "local"
+os.environ["SEMANTIC_CACHE_THRESHOLD"] = "0.9"
+logging.disable(logging.CRITICAL)
+
+from benchmarks.fake_gemini_server import FakeGeminiBehavior, FakeGeminiServer  # noqa: E402
+from config.settings import config  # noqa: E402
+from services.gemini_service import GeminiService  # noqa: E402
+from services.rate_limiter import TokenBucket  # noqa: E402
+
+QUESTIONS = 100
+GEMINI_LATENCY = 0.2
+BATCH_LATENCY = 2.0
+POLL_INTERVAL = 0.25
+# Cota usada para estimar o tempo das requisições quando GEMINI_RATE_LIMIT_RPM é 0
+REFERENCE_RPM = 60
+
+
+def trending_questions():
+    """Perguntas distintas (temas sorteados) sobre assuntos do momento"""
+    rng = random.Random(3)
+    topics = {"".join(rng.choice(string.ascii_lowercase) for _ in range(9)) for _ in range(QUESTIONS * 2)}
+    return [f"o que é {topic}" for topic in sorted(topics)[:QUESTIONS]]
+
+
+def run(name: str, questions, behavior: FakeGeminiBehavior, mode: str):
+    with FakeGeminiServer(behavior) as server:
+        service = GeminiService()
+        service.base_url = server.base_url
+        # Cota local folgada: o benchmark conta as requisições em vez de esperar por elas
+        service.rate_limiter = TokenBucket(rate=1000, capacity=1000)
+
+        start = time.perf_counter()
+        if mode == "antes":
+            for question in questions:
+                service.generate_content(question)
+            state = "-"
+        else:
+            job = service.submit_batch(questions, display_name="perguntas-em-alta")
+            service.wait_batch(job, poll_interval=POLL_INTERVAL)
+            state = f"{job.mode}, {job.state.replace('BATCH_STATE_', '')}, {job.succeeded}/{len(questions)}"
+        elapsed = time.perf_counter() - start
+
+        quota = behavior.requests if mode != "batch" else behavior.batch_jobs
+        generated = behavior.requests
+        served = sum(bool(service.generate_content(f"Alexa, {question}").get("cached")) for question in questions)
+        extra = behavior.requests - generated
+
+    rpm = config.GEMINI_RATE_LIMIT_RPM or REFERENCE_RPM
+    print(f"{name:12s} {elapsed:6.2f}s  cota={quota:4d} req (~{quota / rpm:4.1f} min a "
+          f"{rpm:.0f} RPM)  servidas do cache={served}/{len(questions)} "
+          f"(+{extra} chamadas)  [{state}]")
+
+
+def main():
+    questions = trending_questions()
+    print(f"{len(questions)} perguntas em alta, Gemini falso com {GEMINI_LATENCY * 1000:.0f} ms por pergunta, "
+          f"job em lote concluído em {BATCH_LATENCY:.1f}s, pipeline com {config.GEMINI_BATCH_CONCURRENCY} chamadas")
+    run("Antes", questions, FakeGeminiBehavior(latency=GEMINI_LATENCY), "antes")
+    run("Batch API", questions, FakeGeminiBehavior(latency=GEMINI_LATENCY, batch_latency=BATCH_LATENCY), "batch")
+    run("Pipeline", questions, FakeGeminiBehavior(latency=GEMINI_LATENCY, batch_supported=False), "pipeline")
+
+
+if __name__ == "__main__":
+    main()
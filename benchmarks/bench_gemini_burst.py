@@ -0,0 +1,100 @@
+"""
+Benchmark de rajada de perguntas contra um Gemini simulado com cota limitada
+
+O upstream simulado atende até CAPACITY chamadas simultâneas com latência
+normal; acima disso a latência cresce e, passando de 2x a capacidade, responde
+429 após um atraso. Compara chamadas diretas (comportamento anterior) com as
+chamadas passando pelo AdaptiveConcurrencyLimiter com o prazo da Alexa.
+
+Uso:
+    python -m benchmarks.bench_gemini_burst
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.concurrency_limiter import AdaptiveConcurrencyLimiter, LoadShedError, OUTCOME_OVERLOAD
+from services.metrics import MetricsRegistry
+
+CAPACITY = 8
+BASE_LATENCY = 0.2
+DEADLINE = 7.0
+
+logging.disable(logging.WARNING)
+
+
+class FakeGemini:
+    """Upstream com cota de concorrência: degrada a latência e responde 429 quando saturado"""
+
+    def __init__(self):
+        self.active = 0
+        self.lock = threading.Lock()
+
+    def call(self) -> bool:
+        with self.lock:
+            self.active += 1
+            active = self.active
+        try:
+            if active > 2 * CAPACITY:
+                time.sleep(BASE_LATENCY)
+                return False
+            time.sleep(BASE_LATENCY * max(1.0, active / CAPACITY) ** 2)
+            return True
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+def run(requests: int, clients: int, limiter: AdaptiveConcurrencyLimiter = None):
+    upstream = FakeGemini()
+    results = []
+
+    def one_request():
+        start = time.monotonic()
+        deadline = start + DEADLINE
+        if limiter is None:
+            outcome = "ok" if upstream.call() else "429"
+        else:
+            try:
+                with limiter.slot(deadline=deadline) as permit:
+                    ok = upstream.call()
+                    if not ok:
+                        permit.outcome = OUTCOME_OVERLOAD
+                outcome = "ok" if ok else "429"
+            except LoadShedError:
+                outcome = "shed"
+        elapsed = time.monotonic() - start
+        if outcome == "ok" and elapsed > DEADLINE:
+            outcome = "late"
+        results.append((outcome, elapsed))
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        for _ in range(requests):
+            pool.submit(one_request)
+    total = time.monotonic() - start
+
+    latencies = sorted(elapsed for outcome, elapsed in results if outcome == "ok")
+    counts = {name: sum(1 for outcome, _ in results if outcome == name) for name in ("ok", "429", "shed", "late")}
+    p95 = latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0
+    return counts, p95, total
+
+
+def main(requests: int = 400, clients: int = 64):
+    print(f"{requests} perguntas de {clients} clientes simultâneos; upstream com capacidade {CAPACITY}")
+    for label, limiter in (
+        ("Sem limitador", None),
+        ("Limitador adaptativo", AdaptiveConcurrencyLimiter("bench", initial_limit=4, max_limit=32,
+                                                            initial_latency=BASE_LATENCY,
+                                                            registry=MetricsRegistry())),
+    ):
+        counts, p95, total = run(requests, clients, limiter)
+        print(f"{label:22s} ok={counts['ok']:4d} 429={counts['429']:4d} descartadas={counts['shed']:4d} "
+              f"atrasadas={counts['late']:4d} p95(ok)={p95:6.2f}s total={total:6.2f}s")
+        if limiter is not None:
+            print(f"{'':22s} limite final={int(limiter.limit)}")
+
+
+if __name__ == "__main__":
+    main()
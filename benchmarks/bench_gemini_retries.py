@@ -0,0 +1,65 @@
+"""
+Benchmark de novas tentativas e hedge do GeminiService contra o servidor falso
+
+Cenários (upstream com 15% de 429/503 e 5% de respostas lentas):
+- sem novas tentativas (comportamento anterior: qualquer erro vira falha);
+- novas tentativas com jitter decorrelacionado e Retry-After;
+- novas tentativas + hedge para a cauda de latência.
+
+Uso:
+    python -m benchmarks.bench_gemini_retries
+"""
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+logging.disable(logging.CRITICAL)
+
+from benchmarks.fake_gemini_server import FakeGeminiBehavior, FakeGeminiServer  # noqa: E402
+from services.gemini_service import GeminiService  # noqa: E402
+from services.rate_limiter import TokenBucket  # noqa: E402
+
+DEADLINE = 7.0
+
+
+def run(server: FakeGeminiServer, requests: int, clients: int, max_attempts: int, hedge_delay: float):
+    service = GeminiService()
+    service.base_url = server.base_url
+    service.max_attempts = max_attempts
+    service.hedge_delay = hedge_delay
+    # Cota folgada: aqui mede-se apenas o efeito das novas tentativas e do hedge
+    service.rate_limiter = TokenBucket(rate=1000, capacity=1000)
+    server.behavior.retry_after = "0"
+
+    def one_request(i):
+        start = time.monotonic()
+        result = service.generate_content(f"pergunta {i}", deadline=start + DEADLINE)
+        return result["success"], time.monotonic() - start
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(one_request, range(requests)))
+
+    latencies = sorted(elapsed for _, elapsed in results)
+    ok = sum(1 for success, _ in results if success)
+    return ok, latencies[len(latencies) // 2], latencies[int(0.99 * (len(latencies) - 1))]
+
+
+def main(requests: int = 400, clients: int = 8):
+    behavior = FakeGeminiBehavior(rate_limited=0.10, unavailable=0.05, latency=0.05,
+                                  slow_fraction=0.05, slow_latency=1.5)
+    with FakeGeminiServer(behavior) as server:
+        print(f"{requests} perguntas, {clients} clientes; upstream com 15% de 429/503 e 5% de respostas lentas")
+        for label, attempts, hedge in (
+            ("Sem novas tentativas", 1, 0.0),
+            ("Novas tentativas", 3, 0.0),
+            ("Novas tentativas + hedge", 3, 0.3),
+        ):
+            ok, p50, p99 = run(server, requests, clients, attempts, hedge)
+            print(f"{label:26s} sucesso={100 * ok / requests:5.1f}%  p50={p50 * 1000:7.1f} ms  "
+                  f"p99={p99 * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Benchmark do encerramento gracioso sob carga (deploy com tráfego)
+
+Sobe o main:app num uvicorn real com o Gemini falso lento e um substituto do
+servidor OAuth do Google. Os tokens de todas as contas estão vencidos e são
+renovados em memória antes do encerramento. Com perguntas ao Gemini em
+andamento, o servidor recebe o pedido de encerramento (como no SIGTERM do
+container) e o benchmark confere:
+  - quantas requisições em andamento terminaram com a resposta do Gemini;
+  - o que acontece com as que chegam depois do pedido;
+  - quantos tokens renovados estavam no arquivo antes do encerramento (o que o
+    encerramento anterior deixava, pois as renovações nunca eram gravadas) e depois.
+
+Uso:
+    python -m benchmarks.bench_graceful_shutdown
+"""
+import json
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import requests
+import uvicorn
+
+os.environ.setdefault("ALEXA_VERIFY_REQUESTS", "false")
+os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+os.environ.setdefault("GOOGLE_CLIENT_ID", "fake")
+os.environ.setdefault("GOOGLE_CLIENT_SECRET", "fake")
+os.environ["SEMANTIC_CACHE_EMBEDDER"] = ""
+# Sem gravação periódica: tudo o que chega ao arquivo vem do encerramento
+os.environ["TOKEN_FLUSH_INTERVAL"] = "0"
+logging.disable(logging.CRITICAL)
+
+import main  # noqa: E402
+from benchmarks.fake_gemini_server import FakeGeminiBehavior, FakeGeminiServer  # noqa: E402
+from config.settings import config  # noqa: E402
+from services import oauth_service as oauth_module  # noqa: E402
+from services.oauth_service import oauth_service  # noqa: E402
+
+GEMINI_LATENCY = 2.0
+IN_FLIGHT = 10
+LATE = 5
+USERS = 50
+GEMINI_BODY = json.loads((Path(__file__).resolve().parent.parent / "test_requests" / "gemini_intent.json").read_text())
+
+
+class FakeGoogleOAuth(BaseHTTPRequestHandler):
+    """Endpoint /token que devolve um token novo"""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({"access_token": "renovado", "expires_in": 3599}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def ask(url: str, index: int):
+    """(status ou erro, fala, segundos) de uma pergunta ao Gemini"""
+    start = time.perf_counter()
+    status, speech = _post_question(url, index)
+    return status, speech, time.perf_counter() - start
+
+
+def _post_question(url: str, index: int):
+    body = json.loads(json.dumps(GEMINI_BODY))
+    slots = body["request"]["intent"]["slots"]
+    slots[next(iter(slots))]["value"] = f"me explica o assunto número {index}"
+    try:
+        response = requests.post(f"{url}/alexa", json=body, timeout=30)
+    except requests.exceptions.ConnectionError:
+        return "conexão recusada", ""
+    if response.status_code != 200:
+        return response.status_code, ""
+    return 200, response.json()["response"]["outputSpeech"].get("text", "")
+
+
+def refreshed_in_file() -> int:
+    with open("user_tokens.json") as f:
+        tokens = json.load(f)
+    return sum(token["access_token"] == "renovado" for token in tokens.values())
+
+
+def main_bench():
+    os.chdir(tempfile.mkdtemp())
+    oauth = ThreadingHTTPServer(("127.0.0.1", 0), FakeGoogleOAuth)
+    threading.Thread(target=oauth.serve_forever, daemon=True).start()
+    oauth_module.TOKEN_URI = f"http://127.0.0.1:{oauth.server_address[1]}/token"
+    expired = (datetime.utcnow() - timedelta(minutes=5)).isoformat()
+    tokens = {f"amzn1.ask.account.user{i}": {
+        "access_token": "vencido", "refresh_token": "refresh", "scopes": [],
+        "token_uri": oauth_module.TOKEN_URI, "client_id": "fake",
+        "client_secret": "fake", "expiry": expired
+    } for i in range(USERS)}
+    with open("user_tokens.json", "w") as f:
+        json.dump(tokens, f)
+
+    behavior = FakeGeminiBehavior(latency=GEMINI_LATENCY)
+    with FakeGeminiServer(behavior) as gemini:
+        port = free_port()
+        server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="critical",
+                                               timeout_graceful_shutdown=int(config.SHUTDOWN_DRAIN_TIMEOUT)))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.01)
+        main.alexa_handler.gemini_service.base_url = gemini.base_url
+        url = f"http://127.0.0.1:{port}"
+
+        # Renovações em memória (como as feitas pelas requisições da Alexa)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(oauth_service.get_user_access_token, tokens))
+        before = refreshed_in_file()
+
+        executor = ThreadPoolExecutor(max_workers=IN_FLIGHT + LATE)
+        in_flight = [executor.submit(ask, url, i) for i in range(IN_FLIGHT)]
+        time.sleep(GEMINI_LATENCY / 4)
+        requested_at = time.perf_counter()
+        server.should_exit = True
+        time.sleep(0.2)
+        late = [executor.submit(ask, url, IN_FLIGHT + i) for i in range(LATE)]
+        thread.join()
+        stopped_in = time.perf_counter() - requested_at
+        in_flight = [future.result() for future in in_flight]
+        late = [future.result() for future in late]
+        executor.shutdown()
+
+    answered = sum(status == 200 and behavior.text.rstrip(".") in speech for status, speech, _ in in_flight)
+    slowest = max(seconds for _, _, seconds in in_flight)
+    print(f"Gemini falso com {GEMINI_LATENCY * 1000:.0f} ms, encerramento pedido com {IN_FLIGHT} perguntas em andamento")
+    print(f"Em andamento: {answered}/{IN_FLIGHT} responderam com o Gemini (a mais lenta em {slowest:.2f}s, "
+          f"na fila do limitador), encerramento concluído em {stopped_in:.2f}s")
+    print("Chegadas após o pedido: " + ", ".join(sorted({str(status) for status, _, _ in late})))
+    print(f"Tokens renovados no arquivo: antes do encerramento {before}/{USERS}, "
+          f"depois {refreshed_in_file()}/{USERS}")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,104 @@
+"""
+Benchmark de requisições por segundo para LaunchRequest no endpoint /alexa
+
+Compara o endpoint atual (resposta pré-serializada devolvida como bytes) com uma
+réplica do endpoint anterior (dict reconstruído a cada chamada, log com
+json.dumps indentado e serialização pelo jsonable_encoder do FastAPI).
+As requisições são enviadas diretamente à aplicação ASGI, sem rede, para medir
+apenas o custo do servidor.
+
+Uso:
+    python -m benchmarks.bench_launch_request
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+from fastapi import FastAPI, Request
+
+# Mede apenas o processamento da requisição, sem a verificação de assinatura
+os.environ.setdefault("ALEXA_VERIFY_REQUESTS", "false")
+
+# Mantém o nível de log da aplicação, mas descarta a saída durante a medição
+logging.basicConfig(level=logging.INFO, stream=open(os.devnull, "w"), force=True)
+
+from main import app, start_services  # noqa: E402
+from models.alexa_handler import LAUNCH_SPEECH  # noqa: E402
+
+# Inicialização feita pelo lifespan quando a aplicação roda no uvicorn
+alexa_handler = start_services()
+LAUNCH_BODY = (Path(__file__).resolve().parent.parent / "test_requests" / "launch_request.json").read_bytes()
+logger = logging.getLogger("benchmarks.legacy")
+
+legacy_app = FastAPI()
+
+
+@legacy_app.post("/alexa")
+async def legacy_alexa_webhook(request: Request):
+    """Réplica do endpoint anterior, usada apenas como referência"""
+    body = await request.json()
+    logger.info(f"Requisição recebida da Alexa: {json.dumps(body, indent=2)}")
+    response = alexa_handler.create_response(LAUNCH_SPEECH, should_end_session=False)
+    logger.info(f"Resposta enviada para Alexa: {json.dumps(response, indent=2)}")
+    return response
+
+
+async def call_asgi(asgi_app, body: bytes) -> int:
+    """Executa uma requisição POST /alexa diretamente na aplicação ASGI"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "https",
+        "path": "/alexa",
+        "raw_path": b"/alexa",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 12345),
+        "server": ("127.0.0.1", 443),
+    }
+    sent = False
+    status = 0
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await asgi_app(scope, receive, send)
+    return status
+
+
+async def measure(asgi_app, requests: int) -> float:
+    for _ in range(200):  # aquecimento
+        await call_asgi(asgi_app, LAUNCH_BODY)
+    start = time.perf_counter()
+    for _ in range(requests):
+        status = await call_asgi(asgi_app, LAUNCH_BODY)
+        assert status == 200
+    return requests / (time.perf_counter() - start)
+
+
+def main(requests: int = 5000):
+    legacy_rps = asyncio.run(measure(legacy_app, requests))
+    fast_rps = asyncio.run(measure(app, requests))
+    print(f"LaunchRequest, {requests} requisições sequenciais (ASGI direto)")
+    print(f"Antes (dict + jsonable_encoder + log indentado): {legacy_rps:10.0f} req/s")
+    print(f"Depois (bytes pré-serializados):                 {fast_rps:10.0f} req/s")
+    print(f"Ganho: {fast_rps / legacy_rps:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark de roteamento de modelos contra o servidor falso do Gemini
+
+Mistura de perguntas (curtas e factuais, gerais e pedidos de detalhes) enviada
+com todas as perguntas no modelo padrão (comportamento anterior) e com o
+ModelRouter. As gerais incluem palavras parecidas com pedidos de detalhes
+("compartilhar", "comparecer", "explique por que"), que devem ficar no modelo
+padrão. O servidor falso simula latência base por modelo, tempo por token
+gerado e respostas de tamanho natural diferente por tipo de pergunta (limitadas
+pelo maxOutputTokens); o custo é estimado pelo ModelStatsTracker com a tabela
+MODEL_PRICES.
+
+Uso:
+    python -m benchmarks.bench_model_routing
+"""
+import logging
+import os
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+logging.disable(logging.CRITICAL)
+
+from benchmarks.fake_gemini_server import FakeGeminiBehavior, FakeGeminiServer  # noqa: E402
+from services.gemini_service import GeminiService  # noqa: E402
+from services.metrics import MetricsRegistry  # noqa: E402
+from services.model_router import ModelRouter, ModelStatsTracker, TIER_DEFAULT, TIER_DETAILED, TIER_FAST  # noqa: E402
+from services.rate_limiter import TokenBucket  # noqa: E402
+
+SHORT = ["Quem descobriu o Brasil?", "Qual a capital da Austrália?", "Quando foi a independência do Brasil?",
+         "Quanto é 15 vezes 12?", "O que é fotossíntese?", "Onde fica o monte Everest?"]
+GENERAL = ["Me conte uma curiosidade sobre o oceano", "Sugira um nome para meu cachorro",
+           "Fale sobre a história do rock nacional", "Como compartilhar uma foto no WhatsApp",
+           "A que horas devo comparecer na reunião de condomínio", "Explique por que o céu é azul"]
+DETAILED = ["Explique em detalhes como funciona a inflação", "Compare Python e Java"]
+QUESTIONS = SHORT * 10 + GENERAL * 5 + DETAILED * 5
+
+# Tamanho natural da resposta (tokens) por tipo de pergunta, independente do modelo escolhido
+ANSWER_TOKENS = {TIER_FAST: 80, TIER_DEFAULT: 400, TIER_DETAILED: 900}
+KIND = {**dict.fromkeys(SHORT, TIER_FAST), **dict.fromkeys(GENERAL, TIER_DEFAULT),
+        **dict.fromkeys(DETAILED, TIER_DETAILED)}
+
+
+def answer_tokens(prompt: str) -> int:
+    return ANSWER_TOKENS[KIND[prompt]]
+
+
+def run(server: FakeGeminiServer, routed: bool):
+    service = GeminiService()
+    service.base_url = server.base_url
+    service.rate_limiter = TokenBucket(rate=1000, capacity=1000)
+    service.router.tracker = ModelStatsTracker(registry=MetricsRegistry())
+    if not routed:
+        # Comportamento anterior: um único modelo e orçamento fixo para todas as perguntas
+        default_model = service.router.models[TIER_DEFAULT]
+        service.router.models = dict.fromkeys(service.router.models, default_model)
+        service.router.output_tokens = dict.fromkeys(service.router.output_tokens, 1024)
+
+    latencies = []
+    misrouted = sum(ModelRouter.classify(question) != KIND[question] for question in QUESTIONS)
+    for question in QUESTIONS:
+        start = time.monotonic()
+        assert service.generate_content(question)["success"]
+        latencies.append(time.monotonic() - start)
+    latencies.sort()
+    per_model = service.router.tracker.snapshot()
+    return latencies[len(latencies) // 2], latencies[int(0.95 * (len(latencies) - 1))], per_model, misrouted
+
+
+def main():
+    behavior = FakeGeminiBehavior(
+        latency=0.08,
+        model_latency={"gemini-2.0-flash-lite": 0.04, "gemini-2.0-flash-exp": 0.08, "gemini-2.5-flash-lite": 0.10,
+                       "gemini-2.5-flash": 0.15},
+        seconds_per_token=0.0002,
+        answer_tokens=answer_tokens,
+    )
+    with FakeGeminiServer(behavior) as server:
+        print(f"{len(QUESTIONS)} perguntas (60 curtas, 30 gerais, 10 pedidos de detalhes)")
+        for label, routed in (("Modelo único", False), ("Roteador de modelos", True)):
+            p50, p95, per_model, misrouted = run(server, routed)
+            cost = sum(stats["cost_usd"] for stats in per_model.values()) / len(QUESTIONS) * 1000
+            print(f"{label:20s} p50={p50 * 1000:6.1f} ms  p95={p95 * 1000:6.1f} ms  "
+                  f"custo estimado=US$ {cost:.3f} por mil perguntas"
+                  + (f"  ({misrouted} classificadas no nível errado)" if routed else ""))
+            for model, stats in per_model.items():
+                print(f"{'':20s} {model:24s} {stats['calls']:3d} chamadas  "
+                      f"{stats['output_tokens']:6d} tokens  US$ {stats['cost_usd']:.5f}")
+
+
+if __name__ == "__main__":
+    main()
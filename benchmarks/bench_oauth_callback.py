@@ -0,0 +1,153 @@
+"""
+Benchmark de latência da Alexa durante uma campanha de vinculação de contas
+
+Sobe um substituto local do servidor OAuth do Google (troca de código lenta) e
+envia callbacks /auth/callback simultâneos enquanto LaunchRequests chegam em
+/alexa, tudo no mesmo event loop (ASGI direto). Compara uma réplica do callback
+anterior (fetch_token e gravação do arquivo no event loop) com o atual. O
+monitor do event loop conta os bloqueios e aponta onde ocorreram; com
+EVENT_LOOP_STRICT=true, um bloqueio na versão atual faz o benchmark falhar.
+
+Uso:
+    python -m benchmarks.bench_oauth_callback
+"""
+import asyncio
+import json
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import httpx
+import requests
+from fastapi import FastAPI, Query
+
+os.environ.setdefault("ALEXA_VERIFY_REQUESTS", "false")
+os.environ.setdefault("GOOGLE_CLIENT_ID", "fake")
+os.environ.setdefault("GOOGLE_CLIENT_SECRET", "fake")
+os.environ.setdefault("GOOGLE_REDIRECT_URI", "https://exemplo.com/auth/callback")
+logging.disable(logging.CRITICAL)
+
+import main  # noqa: E402
+from services import oauth_service as oauth_module  # noqa: E402
+from services.loop_monitor import EventLoopMonitor  # noqa: E402
+from services.oauth_service import oauth_service  # noqa: E402
+
+TOKEN_LATENCY = 0.3
+CALLBACKS = 20
+LAUNCHES = 60
+LINKED_USERS = 5000
+LAUNCH_BODY = (Path(__file__).resolve().parent.parent / "test_requests" / "launch_request.json").read_bytes()
+
+
+class FakeGoogleOAuth(BaseHTTPRequestHandler):
+    """Endpoints /token e /revoke com latência fixa"""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(TOKEN_LATENCY)
+        body = b"{}"
+        if self.path == "/token":
+            body = json.dumps({"access_token": "novo", "refresh_token": "refresh", "expires_in": 3599,
+                               "scope": "https://www.googleapis.com/auth/calendar"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_google() -> str:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGoogleOAuth)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def legacy_app(token_uri: str) -> FastAPI:
+    """Réplica do callback anterior (HTTP e arquivo bloqueantes no event loop) com o mesmo /alexa"""
+    app = FastAPI()
+    app.add_api_route("/alexa", main.alexa_webhook, methods=["POST"])
+
+    @app.get("/auth/callback")
+    async def legacy_callback(code: str = Query(...), state: str = Query(...)):
+        oauth_data = oauth_service.oauth_states.pop(state)
+        token = requests.post(token_uri, data={"code": code, "grant_type": "authorization_code"}, timeout=10).json()
+        oauth_service.set_user_token(oauth_data["user_id"], token["access_token"], token["refresh_token"])
+        oauth_service.save_tokens_to_file()
+        return {"ok": True}
+
+    return app
+
+
+async def run_scenario(app, monitor: EventLoopMonitor) -> list:
+    """Latências (ms) das LaunchRequests enviadas durante os callbacks"""
+    monitor.start()
+    for i in range(CALLBACKS):
+        oauth_service.oauth_states[f"estado{i}"] = {"user_id": f"amzn1.ask.account.novo{i}", "code_verifier": None}
+
+    latencies = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="https://teste") as client:
+        async def launch(start: float):
+            response = await client.post("/alexa", content=LAUNCH_BODY, headers={"Content-Type": "application/json"})
+            assert response.status_code == 200
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        async def launches():
+            # Uma requisição a cada 10 ms; a latência conta desde o instante previsto de chegada
+            first = time.perf_counter()
+            for i in range(LAUNCHES):
+                arrival = first + i * 0.01
+                await asyncio.sleep(max(0.0, arrival - time.perf_counter()))
+                await launch(arrival)
+
+        callbacks = [client.get("/auth/callback", params={"code": "codigo", "state": f"estado{i}"})
+                     for i in range(CALLBACKS)]
+        results = await asyncio.gather(launches(), *callbacks)
+    await monitor.stop()
+    assert all(response.status_code == 200 for response in results[1:])
+    return sorted(latencies)
+
+
+def report(name: str, latencies: list, elapsed: float, monitor: EventLoopMonitor):
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:10s} LaunchRequest p50={statistics.median(latencies):7.1f} ms  p95={p95:7.1f} ms  "
+          f"máx={latencies[-1]:7.1f} ms  ({CALLBACKS} callbacks concluídos em {elapsed:.2f}s)")
+    sites = {}
+    for block in monitor.reports:
+        sites[block.site] = sites.get(block.site, 0) + 1
+    print(f"{'':10s} Event loop bloqueado {monitor.blocked} vez(es)"
+          + "".join(f"\n{'':12s}{count}x {site}" for site, count in sites.items()))
+
+
+def main_bench():
+    os.chdir(tempfile.mkdtemp())
+    handler = main.start_services()
+    main.load_client_libraries()
+    handler.calendar_watch.stop()
+    handler.agenda_precomputer.stop()
+
+    base = start_fake_google()
+    oauth_module.TOKEN_URI = f"{base}/token"
+    for i in range(LINKED_USERS):
+        oauth_service.set_user_token(f"amzn1.ask.account.user{i}", "token", "refresh", expiry=time.time() + 3600)
+
+    print(f"{CALLBACKS} callbacks simultâneos, troca de código com {TOKEN_LATENCY * 1000:.0f} ms, "
+          f"{LINKED_USERS} contas no arquivo de tokens")
+    # A réplica anterior bloqueia o loop de propósito; o modo estrito vale só para a versão atual
+    for name, app, monitor in (("Antes", legacy_app(oauth_module.TOKEN_URI), EventLoopMonitor(strict=False)),
+                               ("Depois", main.app, EventLoopMonitor())):
+        start = time.perf_counter()
+        latencies = asyncio.run(run_scenario(app, monitor))
+        report(name, latencies, time.perf_counter() - start, monitor)
+        monitor.check()
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,60 @@
+"""
+Benchmark do orçamento de tokens de saída derivado do limite da fala
+
+Compara perguntas enviadas sem limite de fala (maxOutputTokens do modelo) com o
+orçamento calculado a partir de SPEECH_MAX_CHARS, contra o servidor falso do
+Gemini com tempo de geração por token. Mostra latência, tokens gerados e
+quantos deles chegam a ser falados depois da formatação e do corte.
+
+Uso:
+    python -m benchmarks.bench_output_budget
+"""
+import logging
+import os
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+logging.disable(logging.CRITICAL)
+
+from benchmarks.fake_gemini_server import FakeGeminiBehavior, FakeGeminiServer  # noqa: E402
+from config.settings import config  # noqa: E402
+from services.gemini_service import GeminiService  # noqa: E402
+from services.metrics import metrics  # noqa: E402
+from services.rate_limiter import TokenBucket  # noqa: E402
+
+QUESTIONS = ["Me conte uma curiosidade sobre o oceano", "Fale sobre a história do rock nacional",
+             "Sugira um passeio para o fim de semana", "Como funciona a energia solar?"] * 10
+
+
+def run(server: FakeGeminiServer, max_speech_chars):
+    service = GeminiService()
+    service.base_url = server.base_url
+    service.rate_limiter = TokenBucket(rate=1000, capacity=1000)
+    metrics.reset()
+
+    latencies = []
+    for question in QUESTIONS:
+        start = time.monotonic()
+        result = service.generate_content(question, max_speech_chars=max_speech_chars)
+        service.format_for_speech(result["response"], max_chars=config.SPEECH_MAX_CHARS,
+                                  output_tokens=result.get("output_tokens"))
+        latencies.append(time.monotonic() - start)
+    latencies.sort()
+    counters = metrics.snapshot()["counters"]
+    return (latencies[len(latencies) // 2], counters["gemini.tokens.generated"] / len(QUESTIONS),
+            counters["gemini.tokens.spoken"] / len(QUESTIONS))
+
+
+def main():
+    # Respostas naturais de ~700 tokens, 1 ms por token gerado
+    behavior = FakeGeminiBehavior(latency=0.05, seconds_per_token=0.001, answer_tokens=700)
+    with FakeGeminiServer(behavior) as server:
+        print(f"{len(QUESTIONS)} perguntas, fala limitada a {config.SPEECH_MAX_CHARS} caracteres")
+        for label, max_chars in (("Orçamento do modelo", None), ("Orçamento pela fala", config.SPEECH_MAX_CHARS)):
+            p50, generated, spoken = run(server, max_chars)
+            print(f"{label:20s} p50={p50 * 1000:6.1f} ms  tokens gerados={generated:6.1f}  "
+                  f"falados={spoken:5.1f} ({100 * spoken / generated:4.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Benchmark do cache semântico de respostas com perguntas parafraseadas
+
+Um conjunto rotulado de perguntas (grupos de paráfrases, incluindo grupos
+parecidos mas diferentes, como capitais de países distintos) é perguntado em
+ordem aleatória. Para cada limiar mede:
+  - recall: repetições de um grupo já respondido que vieram do cache;
+  - precisão: respostas do cache que eram do grupo certo.
+Mede também os falsos acertos em pares de perguntas parecidas com respostas
+diferentes (negação, antônimo, ordinal, outro ingrediente). Compara com a chave exata (caixa e
+espaços normalizados) usada até então. Por fim mede a latência de
+generate_content com o Gemini falso e o embedder local no limiar padrão.
+
+Uso:
+    python -m benchmarks.bench_semantic_cache
+"""
+import logging
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+os.environ["SEMANTIC_CACHE_EMBEDDER"] = "local"
+logging.disable(logging.CRITICAL)
+
+from benchmarks.fake_gemini_server import FakeGeminiBehavior, FakeGeminiServer  # noqa: E402
+from config.settings import config  # noqa: E402
+from services.gemini_service import GeminiService  # noqa: E402
+from services.metrics import MetricsRegistry  # noqa: E402
+from services.rate_limiter import TokenBucket  # noqa: E402
+from services.semantic_cache import HashingEmbedder, SemanticAnswerCache  # noqa: E402
+
+GROUPS = [
+    ["O que é IA?", "o que e ia", "me explica inteligência artificial", "o que é inteligência artificial",
+     "Alexa, o que significa IA"],
+    ["qual a capital da França", "capital da frança", "me diga a capital da França", "qual é a capital da frança?"],
+    ["qual a capital da Itália", "capital da itália", "qual é a capital da Itália"],
+    ["quem descobriu o Brasil", "quem foi que descobriu o brasil", "me conta quem descobriu o Brasil"],
+    ["quem descobriu a penicilina", "quem foi que descobriu a penicilina", "penicilina quem descobriu"],
+    ["como funciona a fotossíntese", "me explica a fotossíntese", "o que é fotossíntese", "fotossintese"],
+    ["qual a altura do monte Everest", "altura do everest", "qual é a altura do Monte Everest"],
+    ["qual a distância da Terra à Lua", "distância da terra até a lua", "qual a distância entre a Terra e a Lua"],
+    ["qual a distância da Terra ao Sol", "distância da terra até o sol", "qual a distância entre a Terra e o Sol"],
+    ["quantos ossos tem o corpo humano", "quantos ossos o corpo humano tem", "número de ossos do corpo humano"],
+    ["o que é um buraco negro", "me explica buraco negro", "buracos negros o que são"],
+    ["quem escreveu Dom Casmurro", "quem é o autor de Dom Casmurro", "dom casmurro foi escrito por quem"],
+    ["quem escreveu Os Lusíadas", "quem é o autor de os lusíadas", "os lusíadas foi escrito por quem"],
+]
+# Pares que não podem compartilhar resposta
+NEAR_MISSES = [
+    ("o que é IA", "o que não é IA"),
+    ("receita de bolo de chocolate", "receita de bolo de cenoura"),
+    ("quem ganhou a copa de 2002", "quem nunca ganhou uma copa"),
+    ("qual a capital da Austrália", "qual a capital da Áustria"),
+    ("quem escreveu Dom Casmurro", "quem escreveu Dom Quixote"),
+    ("como faço para ligar o modo avião no meu celular android samsung galaxy",
+     "como faço para desligar o modo avião no meu celular android samsung galaxy"),
+    ("qual é o maior rio em volume de água da américa do sul", "qual é o menor rio em volume de água da américa do sul"),
+    ("quem foi o primeiro presidente da república federativa do brasil depois da ditadura militar",
+     "quem foi o segundo presidente da república federativa do brasil depois da ditadura militar"),
+    ("quantos gols pelé fez na carreira", "quantos gols pelé não fez na carreira"),
+]
+THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.9)
+GEMINI_LATENCY = 0.8
+
+
+def exact_key(question: str) -> str:
+    return GeminiService._answer_key(question)
+
+
+def questions_in_order(seed: int = 7):
+    items = [(question, group) for group, questions in enumerate(GROUPS) for question in questions]
+    random.Random(seed).shuffle(items)
+    return items
+
+
+def evaluate(lookup, store):
+    """(recall, precisão, acertos) de um cache sobre a sequência de perguntas"""
+    answered, repeats, hits, correct = set(), 0, 0, 0
+    for question, group in questions_in_order():
+        if group in answered:
+            repeats += 1
+        cached = lookup(question)
+        if cached is not None:
+            hits += 1
+            correct += cached == group
+        else:
+            store(question, group)
+        answered.add(group)
+    return correct / repeats, (correct / hits if hits else 1.0), hits
+
+
+def evaluate_exact():
+    cache = {}
+    return evaluate(lambda q: cache.get(exact_key(q)), lambda q, g: cache.__setitem__(exact_key(q), g))
+
+
+def evaluate_semantic(threshold: float):
+    cache = SemanticAnswerCache(HashingEmbedder(), threshold=threshold, registry=MetricsRegistry())
+    vectors = {}
+
+    def lookup(question):
+        vector, answer = cache.lookup(question)
+        vectors[question] = vector
+        return answer
+
+    return evaluate(lookup, lambda q, g: cache.add(vectors[q], g, q) if vectors[q] is not None else None)
+
+
+def false_hits(threshold: float) -> int:
+    """Pares de NEAR_MISSES em que a segunda pergunta recebeu a resposta da primeira"""
+    hits = 0
+    for first, second in NEAR_MISSES:
+        cache = SemanticAnswerCache(HashingEmbedder(), threshold=threshold, registry=MetricsRegistry())
+        vector, _ = cache.lookup(first)
+        cache.add(vector, first, first)
+        hits += cache.lookup(second)[1] is not None
+    return hits
+
+
+def end_to_end(semantic: bool, threshold: float):
+    """(latência p50 em ms, chamadas ao Gemini) de generate_content sobre a sequência"""
+    behavior = FakeGeminiBehavior(latency=GEMINI_LATENCY)
+    with FakeGeminiServer(behavior) as server:
+        service = GeminiService()
+        service.base_url = server.base_url
+        service.rate_limiter = TokenBucket(rate=1000, capacity=1000)
+        if service.semantic_cache is not None:
+            service.semantic_cache.threshold = threshold
+        if not semantic:
+            service.semantic_cache = None
+        latencies = []
+        for question, _ in questions_in_order():
+            start = time.perf_counter()
+            assert service.generate_content(question)["success"]
+            latencies.append((time.perf_counter() - start) * 1000)
+        return statistics.median(latencies), behavior.requests
+
+
+def main():
+    total = sum(len(questions) for questions in GROUPS)
+    print(f"{total} perguntas em {len(GROUPS)} grupos de paráfrases ({total - len(GROUPS)} repetições)")
+    recall, precision, hits = evaluate_exact()
+    print(f"{'Chave exata':22s} recall={recall:5.0%}  precisão={precision:5.0%}  acertos={hits}")
+    for threshold in THRESHOLDS:
+        recall, precision, hits = evaluate_semantic(threshold)
+        print(f"{f'Semântico (local) {threshold:.1f}':22s} recall={recall:5.0%}  precisão={precision:5.0%}  "
+              f"acertos={hits}  falsos acertos={false_hits(threshold)}/{len(NEAR_MISSES)}")
+
+    threshold = config.SEMANTIC_CACHE_THRESHOLD
+    print(f"generate_content com Gemini falso ({GEMINI_LATENCY * 1000:.0f} ms), limiar {threshold}")
+    for name, semantic in (("Sem cache semântico", False), ("Com cache semântico", True)):
+        p50, calls = end_to_end(semantic, threshold)
+        print(f"{name:22s} p50={p50:6.1f} ms  chamadas ao Gemini={calls}")
+
+
+if __name__ == "__main__":
+    main()
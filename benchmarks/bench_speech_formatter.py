@@ -0,0 +1,79 @@
+"""
+Benchmark do formatador de fala: cadeia antiga de str.replace vs. formatador de passada única
+
+Uso:
+    python -m benchmarks.bench_speech_formatter
+"""
+import timeit
+
+from services.speech_formatter import speech_formatter
+
+SAMPLE_SECTION = """## Aprendizado de máquina
+
+**Aprendizado de máquina** é uma *subárea* da [inteligência artificial](https://pt.wikipedia.org/wiki/IA)
+que permite que sistemas aprendam com dados. Os principais tipos são:
+
+- Supervisionado: usa exemplos rotulados
+- Não supervisionado: encontra padrões sozinho
+- Por reforço: aprende com recompensas
+
+| Tipo | Exemplo |
+|------|---------|
+| Supervisionado | Classificação de e-mails |
+
+```python
+modelo.fit(dados, rotulos)
+```
+
+"""
+
+PROSE_SECTION = """## Visão geral
+
+A **inteligência artificial** é um campo da ciência da computação dedicado a criar sistemas capazes de \
+realizar tarefas que normalmente exigem inteligência humana, como reconhecer fala, tomar decisões e \
+traduzir idiomas. Nos últimos anos, o avanço do *aprendizado profundo* tornou possível treinar modelos \
+com bilhões de parâmetros.
+
+Entre as aplicações mais comuns estão:
+
+- Assistentes de voz
+- Recomendação de conteúdo
+
+"""
+
+# Respostas longas; 1024 tokens do Gemini equivalem a cerca de 4 a 5 mil caracteres
+SAMPLES = {
+    "markdown denso": SAMPLE_SECTION * 24,
+    "prosa": PROSE_SECTION * 24,
+}
+SIZES = (2000, 4000, 8000)
+
+
+def legacy_format_for_speech(text: str) -> str:
+    """Implementação anterior, mantida aqui apenas como referência de comparação"""
+    formatted = text.replace("**", "").replace("*", "")
+    formatted = formatted.replace("#", "")
+    formatted = formatted.replace("\n\n", ". ")
+    formatted = formatted.replace("\n", " ")
+    if len(formatted) > 500:
+        truncate_point = formatted.rfind(".", 0, 500)
+        if truncate_point > 200:
+            formatted = formatted[:truncate_point + 1]
+        else:
+            formatted = formatted[:500] + "..."
+    return formatted.strip()
+
+
+def main(number: int = 3000):
+    print(f"{'amostra':<16}{'tamanho':>9}{'antiga (µs)':>14}{'nova (µs)':>12}{'SSML (µs)':>12}{'ganho':>8}")
+    for name, sample in SAMPLES.items():
+        for size in SIZES:
+            text = sample[:size]
+            legacy = timeit.timeit(lambda: legacy_format_for_speech(text), number=number) / number * 1e6
+            single_pass = timeit.timeit(lambda: speech_formatter.format(text), number=number) / number * 1e6
+            ssml = timeit.timeit(lambda: speech_formatter.format(text, ssml=True), number=number) / number * 1e6
+            print(f"{name:<16}{size:>9}{legacy:>14.1f}{single_pass:>12.1f}{ssml:>12.1f}{legacy / single_pass:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
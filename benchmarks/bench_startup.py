@@ -0,0 +1,107 @@
+"""
+Benchmark de inicialização: tempo de import do main e tempo até a primeira resposta
+
+Cada medição roda num processo Python novo. O import do main é comparado com o
+custo que ele tinha antes (bibliotecas do Google importadas e serviços
+construídos no import). Em seguida o uvicorn é iniciado e são medidos o tempo
+até a primeira resposta HTTP, até a primeira resposta da Alexa (LaunchRequest)
+e até /health indicar pronto.
+
+Uso:
+    python -m benchmarks.bench_startup
+"""
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import requests
+
+ROOT = Path(__file__).resolve().parent.parent
+LAUNCH_BODY = (ROOT / "test_requests" / "launch_request.json").read_bytes()
+ENV = dict(os.environ, ALEXA_VERIFY_REQUESTS="false", PYTHONPATH=str(ROOT))
+
+IMPORT_MAIN = """
+import time
+start = time.perf_counter()
+import main
+print(time.perf_counter() - start)
+"""
+
+# Réplica do custo do import anterior: bibliotecas do Google e serviços construídos no import
+IMPORT_MAIN_EAGER = """
+import time
+start = time.perf_counter()
+import google_auth_oauthlib.flow, google.oauth2.credentials, googleapiclient.discovery
+import main
+main.start_services()
+main.alexa_handler.calendar_service.discovery_document()
+main.stop_services()
+print(time.perf_counter() - start)
+"""
+
+
+def run_python(code: str) -> float:
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=ENV, capture_output=True, text=True,
+                            check=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(check, timeout: float = 30.0) -> float:
+    """Repete a verificação até ela passar; retorna o instante (perf_counter) do sucesso"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if check():
+                return time.perf_counter()
+        except requests.exceptions.ConnectionError:
+            pass
+        time.sleep(0.005)
+    raise TimeoutError("o servidor não respondeu a tempo")
+
+
+def server_startup():
+    """(primeira resposta, primeira resposta da Alexa, pronto) em segundos desde o início do processo"""
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+                               "--log-level", "warning"], cwd=ROOT, env=ENV,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        first = wait_for(lambda: requests.get(f"{base}/", timeout=1).ok)
+        alexa = wait_for(lambda: requests.post(f"{base}/alexa", data=LAUNCH_BODY, timeout=1,
+                                               headers={"Content-Type": "application/json"}).ok)
+        ready = wait_for(lambda: requests.get(f"{base}/health", timeout=1).status_code == 200)
+    finally:
+        server.terminate()
+        server.wait()
+    return first - start, alexa - start, ready - start
+
+
+def main(rounds: int = 5):
+    lazy = statistics.median(run_python(IMPORT_MAIN) for _ in range(rounds))
+    eager = statistics.median(run_python(IMPORT_MAIN_EAGER) for _ in range(rounds))
+    print(f"Import do main (mediana de {rounds} processos)")
+    print(f"{'Antes (Google e serviços no import)':38s} {eager * 1000:7.0f} ms")
+    print(f"{'Depois (sob demanda, lifespan)':38s} {lazy * 1000:7.0f} ms")
+
+    results = [server_startup() for _ in range(rounds)]
+    first, alexa, ready = (statistics.median(column) for column in zip(*results))
+    print(f"uvicorn (mediana de {rounds} inícios, desde a criação do processo)")
+    print(f"{'Primeira resposta HTTP':38s} {first * 1000:7.0f} ms")
+    print(f"{'Primeira resposta da Alexa':38s} {alexa * 1000:7.0f} ms")
+    print(f"{'/health pronto':38s} {ready * 1000:7.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
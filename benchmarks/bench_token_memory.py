@@ -0,0 +1,134 @@
+"""
+Benchmark da memória dos tokens OAuth com 100 mil contas vinculadas
+
+Gera um arquivo de tokens no formato salvo pelo serviço (com token_uri,
+client_id, client_secret e escopos repetidos em cada usuário) e compara:
+  - a memória residente dos tokens carregados como antes (o dicionário do JSON)
+    e como registros compactos (UserToken com campos compartilhados);
+  - o tempo e a memória temporária de get_user_access_token com um token válido:
+    antes criava um Credentials a cada chamada.
+
+Uso:
+    python -m benchmarks.bench_token_memory
+"""
+import gc
+import json
+import logging
+import os
+import secrets
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+logging.disable(logging.CRITICAL)
+
+from config.settings import config  # noqa: E402
+from services.oauth_service import TOKEN_URI, OAuthService  # noqa: E402
+
+USERS = 100_000
+LOOKUPS = 20_000
+
+
+def token_file(path: str):
+    """Arquivo com USERS contas, tokens com o tamanho dos do Google"""
+    expiry = (datetime.utcnow() + timedelta(hours=1)).isoformat()
+    tokens = {
+        f"amzn1.ask.account.{secrets.token_hex(48)}": {
+            "access_token": "ya29." + secrets.token_urlsafe(160),
+            "refresh_token": "1//0" + secrets.token_urlsafe(75),
+            "token_uri": TOKEN_URI,
+            "client_id": "123456789012-abcdefghijklmnopqrstuvwxyz012345.apps.googleusercontent.com",
+            "client_secret": "GOCSPX-" + "a" * 28,
+            "scopes": list(config.GOOGLE_SCOPES),
+            "expiry": expiry
+        }
+        for _ in range(USERS)
+    }
+    with open(path, "w") as f:
+        json.dump(tokens, f)
+
+
+def resident(load) -> tuple:
+    """(objeto carregado, bytes mantidos após a carga, pico da carga)"""
+    gc.collect()
+    tracemalloc.start()
+    loaded = load()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return loaded, current, peak
+
+
+def legacy_access_token(token_data: dict) -> str:
+    """Réplica do get_user_access_token anterior com token válido (Credentials por chamada)"""
+    from google.oauth2.credentials import Credentials
+
+    expiry = token_data.get("expiry")
+    credentials = Credentials(
+        token=token_data["access_token"],
+        refresh_token=token_data["refresh_token"],
+        token_uri=token_data["token_uri"],
+        client_id=token_data["client_id"],
+        client_secret=token_data["client_secret"],
+        scopes=token_data["scopes"],
+        expiry=datetime.fromisoformat(expiry) if expiry else None
+    )
+    expiring = False
+    if (credentials.expired or expiring) and credentials.refresh_token:
+        raise AssertionError("token deveria estar válido")
+    return credentials.token
+
+
+def lookups(lookup, user_ids) -> tuple:
+    """(µs por consulta, bytes temporários por consulta)"""
+    start = time.perf_counter()
+    for user_id in user_ids:
+        lookup(user_id)
+    elapsed = (time.perf_counter() - start) / len(user_ids) * 1e6
+
+    tracemalloc.start()
+    temporary = 0
+    for user_id in user_ids[:1000]:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        lookup(user_id)
+        temporary += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return elapsed, temporary / 1000
+
+
+def main():
+    path = os.path.join(tempfile.mkdtemp(), "user_tokens.json")
+    token_file(path)
+    print(f"{USERS:,} contas vinculadas, arquivo de {os.path.getsize(path) / 1e6:.1f} MB")
+
+    def load_legacy():
+        with open(path) as f:
+            return json.load(f)
+
+    legacy, legacy_bytes, legacy_peak = resident(load_legacy)
+    service = OAuthService()
+    _, compact_bytes, compact_peak = resident(lambda: service.load_tokens_from_file(path))
+    print(f"{'Antes (dicts)':20s} {legacy_bytes / 1e6:7.1f} MB  ({legacy_bytes / USERS:5.0f} bytes por conta, "
+          f"pico na carga {legacy_peak / 1e6:.1f} MB)")
+    print(f"{'Depois (UserToken)':20s} {compact_bytes / 1e6:7.1f} MB  ({compact_bytes / USERS:5.0f} bytes por conta, "
+          f"pico na carga {compact_peak / 1e6:.1f} MB)")
+
+    # Sem os IDs e os próprios tokens, que as duas versões precisam guardar
+    payload = sum(len(user_id) + len(item["access_token"]) + len(item["refresh_token"]) + 3 * 49
+                  for user_id, item in legacy.items())
+    overhead_legacy = (legacy_bytes - payload) / USERS
+    overhead_compact = (compact_bytes - payload) / USERS
+    print(f"Além dos IDs e tokens: {overhead_legacy:.0f} -> {overhead_compact:.0f} bytes por conta "
+          f"({overhead_legacy / overhead_compact:.0f}x menos)")
+
+    user_ids = list(legacy)[:LOOKUPS]
+    legacy_time, legacy_temp = lookups(lambda user_id: legacy_access_token(legacy[user_id]), user_ids)
+    compact_time, compact_temp = lookups(service.get_user_access_token, user_ids)
+    print(f"get_user_access_token (token válido): antes {legacy_time:.1f} µs e {legacy_temp:.0f} bytes "
+          f"temporários por consulta; depois {compact_time:.2f} µs e {compact_temp:.0f} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Substituto local do Google para notificações push do Calendar
+
+Envia ao webhook /calendar/notify uma notificação com os mesmos cabeçalhos
+X-Goog-* que o Google envia quando a agenda de um canal muda. Os dados do canal
+(ID, token e resourceId) estão em calendar_channels.json.
+
+Uso:
+    python -m benchmarks.fake_calendar_notifier --user <user_id>
+    python -m benchmarks.fake_calendar_notifier --channel <id> --token <token> --resource <resourceId>
+"""
+import argparse
+import json
+import itertools
+from typing import Dict
+
+import requests
+
+_message_numbers = itertools.count(1)
+
+
+def notification_headers(channel_id: str, token: str, resource_id: str, state: str = "exists") -> Dict[str, str]:
+    """Cabeçalhos de uma notificação push do Calendar"""
+    return {
+        "X-Goog-Channel-ID": channel_id,
+        "X-Goog-Channel-Token": token,
+        "X-Goog-Resource-ID": resource_id,
+        "X-Goog-Resource-State": state,
+        "X-Goog-Resource-URI": "https://www.googleapis.com/calendar/v3/calendars/primary/events",
+        "X-Goog-Message-Number": str(next(_message_numbers)),
+    }
+
+
+def post_notification(url: str, channel_id: str, token: str, resource_id: str, state: str = "exists") -> int:
+    """Envia a notificação e retorna o status HTTP da resposta"""
+    response = requests.post(url, headers=notification_headers(channel_id, token, resource_id, state), timeout=5)
+    return response.status_code
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:9000/calendar/notify")
+    parser.add_argument("--user", help="Lê o canal do usuário em calendar_channels.json")
+    parser.add_argument("--channels-file", default="calendar_channels.json")
+    parser.add_argument("--channel")
+    parser.add_argument("--token")
+    parser.add_argument("--resource")
+    parser.add_argument("--state", default="exists", choices=("sync", "exists", "not_exists"))
+    args = parser.parse_args()
+
+    channel_id, token, resource_id = args.channel, args.token, args.resource
+    if args.user:
+        with open(args.channels_file) as f:
+            channel = next(item for item in json.load(f) if item["user_id"] == args.user)
+        channel_id, token, resource_id = channel["channel_id"], channel["token"], channel["resource_id"]
+
+    status = post_notification(args.url, channel_id, token, resource_id, args.state)
+    print(f"Notificação {args.state} enviada para {args.url}: HTTP {status}")
+
+
+if __name__ == "__main__":
+    main()
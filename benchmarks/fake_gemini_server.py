@@ -0,0 +1,222 @@
+"""
+Servidor HTTP local que imita o endpoint generateContent do Gemini
+
+Permite exercitar GeminiService (cota, novas tentativas, hedge) sem rede nem
+chave de API: aponte GEMINI_BASE_URL (ou service.base_url) para server.base_url.
+O comportamento é controlado por FakeGeminiBehavior: fração de respostas 429
+(com Retry-After) e 503, latência base (opcionalmente por modelo), tempo por
+token gerado e cauda lenta. embedContent responde com o embedding de
+FakeGeminiBehavior.embed (padrão: HashingEmbedder local), sem latência.
+
+batchGenerateContent cria um job em lote (ou responde 404 com
+batch_supported=False) que fica em execução por batch_latency segundos;
+GET /batches/<id> devolve o estado e, no fim, as respostas de cada pergunta,
+sorteadas como as de generateContent.
+
+Uso:
+    python -m benchmarks.fake_gemini_server  # sobe em http://127.0.0.1:8765/v1beta
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Sequence, Union
+
+from services.semantic_cache import HashingEmbedder
+
+
+class FakeGeminiBehavior:
+    """Parâmetros do servidor falso (podem ser alterados com o servidor rodando)"""
+
+    def __init__(self, rate_limited: float = 0.0, unavailable: float = 0.0, retry_after: Optional[str] = "1",
+                 latency: float = 0.05, slow_fraction: float = 0.0, slow_latency: float = 1.0,
+                 text: str = "Resposta de teste do Gemini.", seed: int = 42,
+                 model_latency: Optional[Dict[str, float]] = None, seconds_per_token: float = 0.0,
+                 answer_tokens: Optional[Union[int, Callable[[str], int]]] = None,
+                 embed: Optional[Callable[[str], Sequence[float]]] = None,
+                 batch_supported: bool = True, batch_latency: float = 1.0):
+        self.rate_limited = rate_limited
+        self.unavailable = unavailable
+        self.retry_after = retry_after
+        self.latency = latency
+        self.slow_fraction = slow_fraction
+        self.slow_latency = slow_latency
+        self.text = text
+        # Latência base por modelo e custo de geração por token (limitado por maxOutputTokens);
+        # answer_tokens pode ser fixo ou uma função do prompt
+        self.model_latency = model_latency or {}
+        self.seconds_per_token = seconds_per_token
+        self.answer_tokens = answer_tokens
+        # Embedding devolvido por embedContent
+        self.embed = embed or HashingEmbedder()
+        self.embed_requests = 0
+        # Batch API: jobs criados e tempo até cada um terminar
+        self.batch_supported = batch_supported
+        self.batch_latency = batch_latency
+        self.batch_jobs = 0
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def next_outcome(self, model: str = ""):
+        """Sorteia (status, latência) da próxima resposta"""
+        with self.lock:
+            self.requests += 1
+            roll = self.random.random()
+            slow = self.random.random() < self.slow_fraction
+        latency = self.slow_latency if slow else self.model_latency.get(model, self.latency)
+        if roll < self.rate_limited:
+            return 429, latency
+        if roll < self.rate_limited + self.unavailable:
+            return 503, latency
+        return 200, latency
+
+    def generate(self, payload: Dict, model: str = ""):
+        """(status, latência, corpo) da resposta a uma requisição generateContent"""
+        status, latency = self.next_outcome(model)
+        if status != 200:
+            return status, latency, {"error": {"code": status, "message": "fake upstream error"}}
+        prompt = payload.get("contents", [{}])[0].get("parts", [{}])[0].get("text", "")
+        text = self.text
+        if self.answer_tokens:
+            answer_tokens = self.answer_tokens
+            if callable(answer_tokens):
+                answer_tokens = answer_tokens(prompt)
+            max_tokens = payload.get("generationConfig", {}).get("maxOutputTokens", 1024)
+            text = " ".join(["palavra"] * min(answer_tokens, max_tokens))
+        output_tokens = len(text.split())
+        latency += output_tokens * self.seconds_per_token
+        body = {"candidates": [{"content": {"parts": [{"text": text}]}}],
+                "usageMetadata": {"promptTokenCount": len(prompt.split()),
+                                  "candidatesTokenCount": output_tokens}}
+        return status, latency, body
+
+
+class FakeGeminiServer:
+    """Servidor falso rodando em uma thread de fundo"""
+
+    def __init__(self, behavior: Optional[FakeGeminiBehavior] = None, host: str = "127.0.0.1", port: int = 0):
+        self.behavior = behavior or FakeGeminiBehavior()
+        behavior = self.behavior
+        # Jobs em lote: id -> [criação, modelo, requisições, respostas (calculadas ao terminar)]
+        batches: Dict[str, list] = {}
+        batch_lock = threading.Lock()
+        self.batches = batches
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if self.path.endswith(":embedContent"):
+                    return self.embed_content(payload)
+                # /v1beta/models/<modelo>:generateContent
+                model = self.path.rsplit("/", 1)[-1].split(":", 1)[0]
+                if self.path.endswith(":batchGenerateContent"):
+                    return self.create_batch(payload, model)
+                status, latency, body = behavior.generate(payload, model)
+                data = json.dumps(body).encode("utf-8")
+                time.sleep(latency)
+
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if status == 429 and behavior.retry_after is not None:
+                    self.send_header("Retry-After", behavior.retry_after)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def embed_content(self, payload):
+                # /v1beta/models/<modelo>:embedContent
+                with behavior.lock:
+                    behavior.embed_requests += 1
+                text = payload.get("content", {}).get("parts", [{}])[0].get("text", "")
+                values = [float(value) for value in behavior.embed(text)]
+                data = json.dumps({"embedding": {"values": values}}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def create_batch(self, payload, model):
+                # /v1beta/models/<modelo>:batchGenerateContent
+                if not behavior.batch_supported:
+                    return self.send_json(404, {"error": {"code": 404, "message": "not found"}})
+                requests_ = payload.get("batch", {}).get("inputConfig", {}).get("requests", {}).get("requests", [])
+                with batch_lock:
+                    behavior.batch_jobs += 1
+                    name = f"batches/fake{behavior.batch_jobs}"
+                    batches[name] = [time.monotonic(), model, requests_, None]
+                    operation = self.operation(name)
+                self.send_json(200, operation)
+
+            def operation(self, name):
+                created_at, model, requests_, responses = batches[name]
+                if time.monotonic() - created_at < behavior.batch_latency:
+                    return {"name": name, "metadata": {"state": "BATCH_STATE_RUNNING"}, "done": False}
+                if responses is None:
+                    responses = []
+                    for item in requests_:
+                        status, _, body = behavior.generate(item.get("request", {}), model)
+                        key = "response" if status == 200 else "error"
+                        responses.append({key: body if status == 200 else body["error"],
+                                          "metadata": item.get("metadata", {})})
+                    batches[name][3] = responses
+                return {"name": name, "metadata": {"state": "BATCH_STATE_SUCCEEDED"}, "done": True,
+                        "response": {"inlinedResponses": {"inlinedResponses": responses}}}
+
+            def send_json(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                # /v1beta/batches/<id>: estado do job em lote
+                name = self.path.split("/v1beta/", 1)[-1]
+                if name in batches:
+                    with batch_lock:
+                        operation = self.operation(name)
+                    return self.send_json(200, operation)
+                # /v1beta/models/<modelo>: metadados do modelo (usado no aquecimento da conexão)
+                self.send_json(200, {"name": name})
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1beta"
+
+    def start(self) -> "FakeGeminiServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "FakeGeminiServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    server = FakeGeminiServer(port=8765).start()
+    print(f"Gemini falso em {server.base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,337 @@
+"""
+Replay do tráfego gravado de /alexa (TRAFFIC_RECORD_FILE) contra o main:app atual
+
+Reenvia as requisições do arquivo nos mesmos instantes relativos da gravação
+(chegadas em malha aberta: uma requisição lenta não atrasa as seguintes),
+direto pelo ASGI. Gemini, Calendar, OAuth e Alexa Settings são substituídos por
+stand-ins que reproduzem, em cada requisição, as durações e falhas gravadas
+para ela (chamadas sem gravação correspondente, como as do aquecimento em
+segundo plano, usam a mediana daquele upstream). Com o mesmo arquivo, versões
+diferentes do código podem ser comparadas em vazão e latência de cauda. O
+monitor do event loop conta os bloqueios durante o replay; com
+EVENT_LOOP_STRICT=true, qualquer bloqueio faz o replay falhar.
+
+Uso:
+    python -m benchmarks.replay_traffic trafego.jsonl [--speed 2] [--json resultado.json]
+                                                       [--baseline anterior.json]
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import logging
+import math
+import os
+import statistics
+import tempfile
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import httpx
+import requests
+
+os.environ["ALEXA_VERIFY_REQUESTS"] = "false"
+os.environ["TRAFFIC_RECORD_FILE"] = ""
+os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+os.environ.setdefault("GOOGLE_CLIENT_ID", "fake")
+os.environ.setdefault("GOOGLE_CLIENT_SECRET", "fake")
+logging.disable(logging.CRITICAL)
+
+import main  # noqa: E402
+from services.loop_monitor import EventLoopMonitor  # noqa: E402
+from services.oauth_service import oauth_service  # noqa: E402
+from services.semantic_cache import HashingEmbedder  # noqa: E402
+
+# Chamadas gravadas da requisição em replay: upstream -> fila de (segundos, sucesso)
+_recorded_calls: contextvars.ContextVar[Optional[Dict[str, Deque[Tuple[float, bool]]]]] = contextvars.ContextVar(
+    "recorded_calls", default=None
+)
+
+CALENDAR_RESULTS = {
+    "list": {"items": [{"id": "1", "summary": "Reunião de equipe", "start": {"dateTime": "2026-01-01T09:00:00-03:00"},
+                        "end": {"dateTime": "2026-01-01T10:00:00-03:00"}}]},
+    "get": {"value": "America/Sao_Paulo"},
+    "insert": {"id": "replay", "htmlLink": ""},
+    "watch": {"id": "replay", "resourceId": "replay", "expiration": "0"},
+}
+
+
+def load_entries(path: str) -> List[Dict[str, Any]]:
+    """Requisições gravadas, em ordem de chegada (linhas inválidas são ignoradas)"""
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict) and isinstance(entry.get("envelope"), dict):
+                entries.append(entry)
+    entries.sort(key=lambda entry: entry["t"])
+    return entries
+
+
+def request_kind(envelope: Dict[str, Any]) -> str:
+    """Tipo da requisição para o relatório (nome do intent para IntentRequest)"""
+    request = envelope.get("request") or {}
+    if request.get("type") == "IntentRequest":
+        return (request.get("intent") or {}).get("name") or "IntentRequest"
+    return request.get("type") or "?"
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+class _Reply:
+    """Resposta HTTP mínima (json e raise_for_status) devolvida pelo stand-in do Gemini"""
+
+    def __init__(self, body: Dict[str, Any]):
+        self.body = body
+        self.status_code = 200
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        pass
+
+
+class _FakeCalendarRequest:
+    """Imita service.<recurso>().<método>(...).execute() com as durações gravadas"""
+
+    def __init__(self, standins: "UpstreamStandIns", method: str = ""):
+        self.standins = standins
+        self.method = method
+
+    def __getattr__(self, method: str):
+        return lambda *args, **kwargs: _FakeCalendarRequest(self.standins, method)
+
+    def execute(self):
+        self.standins.wait("calendar")
+        return CALENDAR_RESULTS.get(self.method, {})
+
+
+class UpstreamStandIns:
+    """Substitutos dos upstreams que reproduzem as durações gravadas de cada requisição"""
+
+    def __init__(self, entries: List[Dict[str, Any]]):
+        durations: Dict[str, List[float]] = {}
+        for entry in entries:
+            for name, seconds, ok in entry.get("upstream", ()):
+                if ok:
+                    durations.setdefault(name, []).append(seconds)
+        self.medians = {name: statistics.median(values) for name, values in durations.items()}
+        self.embedder = HashingEmbedder()
+        self.calls: Dict[str, int] = {}
+
+    def take(self, name: str) -> Tuple[float, bool]:
+        """Próxima chamada gravada deste upstream na requisição atual, ou a mediana"""
+        self.calls[name] = self.calls.get(name, 0) + 1
+        recorded = _recorded_calls.get()
+        if recorded and recorded.get(name):
+            return recorded[name].popleft()
+        return self.medians.get(name, 0.0), True
+
+    def wait(self, name: str, timeout: Optional[float] = None):
+        """Espera a duração da chamada e reproduz a falha gravada"""
+        seconds, ok = self.take(name)
+        if timeout is not None and seconds > timeout:
+            time.sleep(timeout)
+            raise requests.exceptions.Timeout(f"{name}: {seconds:.3f}s gravados, prazo de {timeout:.3f}s")
+        time.sleep(seconds)
+        if not ok:
+            raise requests.exceptions.ConnectionError(f"{name}: falha gravada")
+
+    def gemini_send(self, url: str, payload: Dict[str, Any], timeout: float):
+        if url.endswith(":embedContent"):
+            self.wait("gemini.embed", timeout)
+            vector = self.embedder(payload["content"]["parts"][0]["text"])
+            return _Reply({"embedding": {"values": [] if vector is None else vector.tolist()}})
+        self.wait("gemini", timeout)
+        return _Reply({"candidates": [{"content": {"parts": [{"text": "Resposta reproduzida do tráfego gravado."}]},
+                                       "finishReason": "STOP"}],
+                       "usageMetadata": {"promptTokenCount": 10, "candidatesTokenCount": 6}})
+
+    def install(self, handler, linked_users: set):
+        """Troca as chamadas de rede do handler e do OAuth pelos stand-ins"""
+        gemini = handler.gemini_service
+        gemini.hedge_delay = 0
+        gemini.warm_up = lambda timeout=2.0: True
+        gemini._send = self.gemini_send
+
+        calendar = handler.calendar_service
+
+        def initialize_service(access_token: str) -> bool:
+            calendar.service = _FakeCalendarRequest(self)
+            return True
+
+        calendar.initialize_service = initialize_service
+
+        def fetch_timezone(api_endpoint: str, device_id: str, api_access_token: str) -> Optional[str]:
+            try:
+                self.wait("alexa_settings", handler.alexa_settings.timeout)
+            except requests.exceptions.RequestException:
+                return None
+            return "America/Sao_Paulo"
+
+        handler.alexa_settings._fetch_timezone = fetch_timezone
+
+        def get_user_access_token(user_id: str, min_validity: float = 0) -> Optional[str]:
+            if user_id not in linked_users:
+                return None
+            recorded = _recorded_calls.get()
+            if recorded and recorded.get("oauth"):
+                try:
+                    self.wait("oauth")
+                except requests.exceptions.RequestException:
+                    return None
+            return "replay-token"
+
+        oauth_service.get_user_access_token = get_user_access_token
+        for user_id in linked_users:
+            oauth_service.set_user_token(user_id, "replay-token", "replay", expiry=time.time() + 86400)
+
+
+def linked_users(entries: List[Dict[str, Any]]) -> set:
+    """Usuários com conta vinculada na gravação (accessToken presente ou chamadas ao Calendar)"""
+    users = set()
+    for entry in entries:
+        envelope = entry["envelope"]
+        for section in ((envelope.get("session") or {}).get("user") or {},
+                        ((envelope.get("context") or {}).get("System") or {}).get("user") or {}):
+            linked = section.get("accessToken") or any(call[0] == "calendar" for call in entry.get("upstream", ()))
+            if linked and section.get("userId"):
+                users.add(section["userId"])
+    return users
+
+
+def replay_app(entries: List[Dict[str, Any]]):
+    """main.app com as chamadas gravadas da requisição (cabeçalho x-replay-id) no contexto"""
+
+    async def app(scope, receive, send):
+        if scope["type"] == "http":
+            index = dict(scope["headers"]).get(b"x-replay-id")
+            if index is not None:
+                calls: Dict[str, Deque[Tuple[float, bool]]] = {}
+                for name, seconds, ok in entries[int(index)].get("upstream", ()):
+                    calls.setdefault(name, deque()).append((seconds, bool(ok)))
+                _recorded_calls.set(calls)
+        await main.app(scope, receive, send)
+
+    return app
+
+
+async def replay(entries: List[Dict[str, Any]], speed: float,
+                 monitor: EventLoopMonitor) -> Tuple[List[Tuple[str, float, int]], float]:
+    """Envia as requisições nos instantes gravados; retorna [(tipo, latência em s, status)] e a duração"""
+    results = []
+    monitor.start()
+    transport = httpx.ASGITransport(app=replay_app(entries))
+    async with httpx.AsyncClient(transport=transport, base_url="https://replay", timeout=None) as client:
+        first = time.perf_counter()
+
+        async def send(index: int, entry: Dict[str, Any]):
+            # A latência conta desde o instante previsto de chegada
+            arrival = first + entry["t"] / speed
+            await asyncio.sleep(max(0.0, arrival - time.perf_counter()))
+            body = json.dumps(entry["envelope"]).encode("utf-8")
+            response = await client.post("/alexa", content=body, headers={"Content-Type": "application/json",
+                                                                          "x-replay-id": str(index)})
+            results.append((request_kind(entry["envelope"]), time.perf_counter() - arrival, response.status_code))
+
+        start_offset = entries[0]["t"]
+        for entry in entries:
+            entry["t"] -= start_offset
+        await asyncio.gather(*(send(index, entry) for index, entry in enumerate(entries)))
+        elapsed = time.perf_counter() - first
+    await monitor.stop()
+    return results, elapsed
+
+
+def summarize(latencies: List[float], errors: int) -> Dict[str, float]:
+    return {"count": len(latencies), "errors": errors, "p50": percentile(latencies, 0.5) * 1000,
+            "p95": percentile(latencies, 0.95) * 1000, "p99": percentile(latencies, 0.99) * 1000}
+
+
+def build_report(entries: List[Dict[str, Any]], results: List[Tuple[str, float, int]],
+                 elapsed: float) -> Dict[str, Any]:
+    groups: Dict[str, List[Tuple[float, int]]] = {"total": []}
+    for kind, latency, status in results:
+        groups["total"].append((latency, status))
+        groups.setdefault(kind, []).append((latency, status))
+    recorded: Dict[str, List[float]] = {"total": []}
+    for entry in entries:
+        recorded["total"].append(entry["latency"])
+        recorded.setdefault(request_kind(entry["envelope"]), []).append(entry["latency"])
+    return {
+        "requests": len(results),
+        "elapsed": elapsed,
+        "throughput": len(results) / elapsed if elapsed else 0.0,
+        "groups": {name: summarize([latency for latency, _ in items], sum(status != 200 for _, status in items))
+                   for name, items in groups.items()},
+        "recorded": {name: summarize(latencies, 0) for name, latencies in recorded.items()},
+    }
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    print(f"{report['requests']} requisições em {report['elapsed']:.2f}s ({report['throughput']:.1f} req/s)")
+    if baseline:
+        print(f"  referência: {baseline['throughput']:.1f} req/s")
+    print(f"{'Tipo':28s} {'n':>5s} {'erros':>5s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s}   gravado p50/p95 ms")
+    for name, stats in sorted(report["groups"].items(), key=lambda item: (item[0] != "total", item[0])):
+        recorded = report["recorded"].get(name, {})
+        print(f"{name:28s} {stats['count']:5d} {stats['errors']:5d} {stats['p50']:8.1f} {stats['p95']:8.1f} "
+              f"{stats['p99']:8.1f}   {recorded.get('p50', 0):6.1f}/{recorded.get('p95', 0):.1f}")
+        previous = (baseline or {}).get("groups", {}).get(name)
+        if previous:
+            deltas = "  ".join(f"{q} {stats[q] - previous[q]:+.1f}" for q in ("p50", "p95", "p99"))
+            print(f"{'  vs referência':28s} {'':11s} {deltas}")
+
+
+def main_replay():
+    parser = argparse.ArgumentParser(description="Replay do tráfego gravado de /alexa")
+    parser.add_argument("log", help="Arquivo gravado (TRAFFIC_RECORD_FILE)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Fator de aceleração das chegadas (padrão 1)")
+    parser.add_argument("--json", help="Salva o resultado em JSON (para usar como --baseline)")
+    parser.add_argument("--baseline", help="Resultado JSON de outra versão para comparar")
+    args = parser.parse_args()
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    entries = load_entries(args.log)
+    if not entries:
+        raise SystemExit(f"Nenhuma requisição em {args.log}")
+
+    os.chdir(tempfile.mkdtemp())
+    handler = main.start_services()
+    handler.calendar_watch.stop()
+    handler.agenda_precomputer.stop()
+    main.load_client_libraries()
+    standins = UpstreamStandIns(entries)
+    standins.install(handler, linked_users(entries))
+
+    monitor = EventLoopMonitor()
+    results, elapsed = asyncio.run(replay(entries, args.speed, monitor))
+    report = build_report(entries, results, elapsed)
+    report["upstream_calls"] = standins.calls
+    report["event_loop_blocked"] = monitor.blocked
+
+    baseline = None
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    print("Chamadas aos stand-ins: " + ", ".join(f"{name}={count}" for name, count in sorted(standins.calls.items())))
+    print(f"Event loop bloqueado {monitor.blocked} vez(es)"
+          + "".join(f"\n  {block.duration * 1000:.0f} ms em {block.site}" for block in monitor.reports))
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    monitor.check()
+
+
+if __name__ == "__main__":
+    main_replay()
@@ -1,5 +1,15 @@
 import os
-from typing import Optional
+from typing import Dict, Optional
+
+
+def _parse_limits(value: str) -> Dict[str, int]:
+    """Converte "IntentA=400,IntentB=800" em {"IntentA": 400, "IntentB": 800}"""
+    limits = {}
+    for item in value.split(","):
+        name, _, limit = item.partition("=")
+        if name.strip() and limit.strip().isdigit():
+            limits[name.strip()] = int(limit)
+    return limits
 
 class Config:
     """Configurações da aplicação"""
@@ -14,12 +24,159 @@ class Config:
     GOOGLE_CLIENT_SECRET: Optional[str] = os.getenv("GOOGLE_CLIENT_SECRET")
     GOOGLE_REDIRECT_URI: Optional[str] = os.getenv("GOOGLE_REDIRECT_URI")
     
+    # Troca de código, revogação e gravação de tokens, fora do pool das requisições da Alexa
+    OAUTH_WORKERS: int = int(os.getenv("OAUTH_WORKERS", "2"))
+    OAUTH_REQUEST_TIMEOUT: float = float(os.getenv("OAUTH_REQUEST_TIMEOUT", "10"))
+    OAUTH_MAX_CONNECTIONS: int = int(os.getenv("OAUTH_MAX_CONNECTIONS", "10"))
+    
     # Configurações da API do Gemini
     GEMINI_API_KEY: Optional[str] = os.getenv("GEMINI_API_KEY")
+    GEMINI_BASE_URL: str = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta")
+    GEMINI_REQUEST_TIMEOUT: float = float(os.getenv("GEMINI_REQUEST_TIMEOUT", "30"))
+    
+    # Modelos por tipo de pergunta: curtas e factuais, padrão e pedidos de detalhes
+    GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")
+    GEMINI_FAST_MODEL: str = os.getenv("GEMINI_FAST_MODEL", "gemini-2.0-flash-lite")
+    GEMINI_DETAILED_MODEL: str = os.getenv("GEMINI_DETAILED_MODEL", "gemini-2.5-flash-lite")
+    GEMINI_MAX_OUTPUT_TOKENS: int = int(os.getenv("GEMINI_MAX_OUTPUT_TOKENS", "1024"))
+    GEMINI_FAST_MAX_OUTPUT_TOKENS: int = int(os.getenv("GEMINI_FAST_MAX_OUTPUT_TOKENS", "256"))
+    GEMINI_DETAILED_MAX_OUTPUT_TOKENS: int = int(os.getenv("GEMINI_DETAILED_MAX_OUTPUT_TOKENS", "2048"))
+    # Tokens de raciocínio mantidos nos pedidos de detalhes (modelos 2.5; os demais tiers não pensam)
+    GEMINI_DETAILED_THINKING_BUDGET: int = int(os.getenv("GEMINI_DETAILED_THINKING_BUDGET", "512"))
+    
+    # Conversão do limite da fala em maxOutputTokens (caracteres por token e folga para markdown)
+    GEMINI_CHARS_PER_TOKEN: float = float(os.getenv("GEMINI_CHARS_PER_TOKEN", "3.5"))
+    GEMINI_OUTPUT_TOKEN_MARGIN: float = float(os.getenv("GEMINI_OUTPUT_TOKEN_MARGIN", "1.5"))
+    
+    # Cota da chave de API do Gemini (token bucket local); 0 desativa o limite local
+    GEMINI_RATE_LIMIT_RPM: float = float(os.getenv("GEMINI_RATE_LIMIT_RPM", "0"))
+    GEMINI_RATE_LIMIT_BURST: int = int(os.getenv("GEMINI_RATE_LIMIT_BURST", "10"))
+    
+    # Novas tentativas para erros transitórios (429/5xx/timeout), sempre dentro do prazo da Alexa
+    GEMINI_RETRY_MAX_ATTEMPTS: int = int(os.getenv("GEMINI_RETRY_MAX_ATTEMPTS", "3"))
+    GEMINI_RETRY_BASE_DELAY: float = float(os.getenv("GEMINI_RETRY_BASE_DELAY", "0.2"))
+    GEMINI_RETRY_MAX_DELAY: float = float(os.getenv("GEMINI_RETRY_MAX_DELAY", "2.0"))
+    
+    # Atraso (segundos) para enviar uma requisição de hedge; 0 desativa
+    GEMINI_HEDGE_DELAY: float = float(os.getenv("GEMINI_HEDGE_DELAY", "0"))
+    
+    # Chamadas ao Gemini mais lentas que isso contam como falha para o circuit breaker
+    GEMINI_SLOW_CALL_SECONDS: float = float(os.getenv("GEMINI_SLOW_CALL_SECONDS", "6.0"))
+    
+    # Últimas respostas conhecidas, usadas quando o Gemini está indisponível
+    ANSWER_CACHE_SIZE: int = int(os.getenv("ANSWER_CACHE_SIZE", "2000"))
+    ANSWER_CACHE_TTL: float = float(os.getenv("ANSWER_CACHE_TTL", "86400"))
+    
+    # Cache semântico de respostas (perguntas parafraseadas): embeddings "local" (CPU), "gemini"
+    # (uma chamada embedContent antes de cada geração) ou vazio (desativa, o padrão)
+    SEMANTIC_CACHE_EMBEDDER: str = os.getenv("SEMANTIC_CACHE_EMBEDDER", "")
+    SEMANTIC_CACHE_THRESHOLD: float = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+    SEMANTIC_CACHE_SIZE: int = int(os.getenv("SEMANTIC_CACHE_SIZE", "5000"))
+    SEMANTIC_CACHE_TTL: float = float(os.getenv("SEMANTIC_CACHE_TTL", "21600"))
+    GEMINI_EMBEDDING_MODEL: str = os.getenv("GEMINI_EMBEDDING_MODEL", "text-embedding-004")
+    GEMINI_EMBEDDING_TIMEOUT: float = float(os.getenv("GEMINI_EMBEDDING_TIMEOUT", "0.5"))
+    
+    # Jobs em lote (resumos, perguntas em alta, aquecimento do cache): "batch" usa a Batch API do
+    # Gemini, "pipeline" envia por generateContent com concorrência limitada
+    GEMINI_BATCH_MODE: str = os.getenv("GEMINI_BATCH_MODE", "batch")
+    GEMINI_BATCH_CONCURRENCY: int = int(os.getenv("GEMINI_BATCH_CONCURRENCY", "4"))
+    GEMINI_BATCH_POLL_INTERVAL: float = float(os.getenv("GEMINI_BATCH_POLL_INTERVAL", "30"))
+    # Prazo (segundos) de cada pergunta no modo pipeline, incluindo a espera na fila do limitador
+    GEMINI_BATCH_ITEM_TIMEOUT: float = float(os.getenv("GEMINI_BATCH_ITEM_TIMEOUT", "60"))
+    
+    # Perguntas frequentes respondidas localmente (arquivo recarregado quando muda)
+    FAQ_FILE: str = os.getenv("FAQ_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "faq.json"))
+    FAQ_MIN_SCORE: float = float(os.getenv("FAQ_MIN_SCORE", "0.7"))
+    FAQ_RELOAD_INTERVAL: float = float(os.getenv("FAQ_RELOAD_INTERVAL", "30"))
+    
+    # Circuit breakers dos upstreams (Gemini, Google Calendar, OAuth)
+    CIRCUIT_FAILURE_RATE: float = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+    CIRCUIT_MIN_CALLS: int = int(os.getenv("CIRCUIT_MIN_CALLS", "5"))
+    CIRCUIT_OPEN_SECONDS: float = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+    
+    # Agenda: chamadas lentas ao Calendar e tempo máximo para servir a última agenda conhecida
+    CALENDAR_SLOW_CALL_SECONDS: float = float(os.getenv("CALENDAR_SLOW_CALL_SECONDS", "3.0"))
+    AGENDA_CACHE_TTL: float = float(os.getenv("AGENDA_CACHE_TTL", "21600"))
+    # Idade máxima da agenda pré-carregada que ainda é servida sem consultar o Calendar
+    AGENDA_FRESH_SECONDS: float = float(os.getenv("AGENDA_FRESH_SECONDS", "60"))
+    
+    # Agenda de hoje e amanhã pré-calculada: workers (0 desativa), janela de baixa demanda
+    # (horas locais "início-fim"), idade máxima servida (sem canal de notificações do Calendar
+    # aberto para o usuário, vale AGENDA_FRESH_SECONDS) e intervalo do agendador
+    AGENDA_PRECOMPUTE_WORKERS: int = int(os.getenv("AGENDA_PRECOMPUTE_WORKERS", "2"))
+    AGENDA_PRECOMPUTE_HOURS: str = os.getenv("AGENDA_PRECOMPUTE_HOURS", "4-6")
+    AGENDA_PRECOMPUTE_MAX_AGE: float = float(os.getenv("AGENDA_PRECOMPUTE_MAX_AGE", "14400"))
+    AGENDA_PRECOMPUTE_TICK: float = float(os.getenv("AGENDA_PRECOMPUTE_TICK", "60"))
+    
+    # Notificações push do Calendar: URL pública de /calendar/notify (vazio desativa),
+    # vida dos canais e antecedência da renovação (segundos)
+    CALENDAR_WATCH_ADDRESS: Optional[str] = os.getenv("CALENDAR_WATCH_ADDRESS")
+    CALENDAR_WATCH_TTL: float = float(os.getenv("CALENDAR_WATCH_TTL", "604800"))
+    CALENDAR_WATCH_RENEW_MARGIN: float = float(os.getenv("CALENDAR_WATCH_RENEW_MARGIN", "86400"))
+    CALENDAR_WATCH_TICK: float = float(os.getenv("CALENDAR_WATCH_TICK", "300"))
+    # Espera máxima entre tentativas para um usuário cujo canal não abre (dobra a cada falha)
+    CALENDAR_WATCH_MAX_BACKOFF: float = float(os.getenv("CALENDAR_WATCH_MAX_BACKOFF", "21600"))
+    
+    # Aquecimento no início da sessão (conexão com o Gemini, token OAuth e agenda do dia)
+    WARMUP_WORKERS: int = int(os.getenv("WARMUP_WORKERS", "4"))
+    WARMUP_INTERVAL: float = float(os.getenv("WARMUP_INTERVAL", "300"))
+    
+    # Threads do pool onde rodam os handlers síncronos (run_in_threadpool); quem espera
+    # na fila do Gemini também ocupa uma thread
+    THREADPOOL_SIZE: int = int(os.getenv("THREADPOOL_SIZE", "100"))
+    
+    # Limitador de concorrência adaptativo das chamadas ao Gemini; chamadas em andamento
+    # e na fila usam no máximo metade de THREADPOOL_SIZE
+    GEMINI_INITIAL_CONCURRENCY: int = int(os.getenv("GEMINI_INITIAL_CONCURRENCY", "4"))
+    GEMINI_MAX_CONCURRENCY: int = int(os.getenv("GEMINI_MAX_CONCURRENCY", "32"))
+    GEMINI_MAX_QUEUE: int = int(os.getenv("GEMINI_MAX_QUEUE", "16"))
     
     # Configurações da Alexa
     ALEXA_SKILL_ID: Optional[str] = os.getenv("ALEXA_SKILL_ID")
     
+    # Fuso horário usado quando o do dispositivo não está disponível, consulta à
+    # Alexa Settings API e tempo de cache do fuso de cada dispositivo
+    DEFAULT_TIMEZONE: str = os.getenv("DEFAULT_TIMEZONE", "America/Sao_Paulo")
+    ALEXA_SETTINGS_TIMEOUT: float = float(os.getenv("ALEXA_SETTINGS_TIMEOUT", "1.0"))
+    TIMEZONE_CACHE_TTL: float = float(os.getenv("TIMEZONE_CACHE_TTL", "86400"))
+    
+    # Tempo (segundos) para responder à Alexa; a Alexa desiste após 8 segundos
+    ALEXA_RESPONSE_DEADLINE: float = float(os.getenv("ALEXA_RESPONSE_DEADLINE", "7.0"))
+    
+    # Verificação de assinatura das requisições da Alexa (desative apenas para testes locais)
+    ALEXA_VERIFY_REQUESTS: bool = os.getenv("ALEXA_VERIFY_REQUESTS", "True").lower() == "true"
+    ALEXA_TIMESTAMP_TOLERANCE: int = int(os.getenv("ALEXA_TIMESTAMP_TOLERANCE", "150"))
+    
+    # Formato da fala nas respostas: "PlainText" ou "SSML"
+    SPEECH_OUTPUT_MODE: str = os.getenv("SPEECH_OUTPUT_MODE", "PlainText")
+    
+    # Tamanho máximo da fala (caracteres): dispositivos só de voz, com tela, por intent e para
+    # pedidos explícitos de detalhes ("explique em detalhes", "compare")
+    SPEECH_MAX_CHARS: int = int(os.getenv("SPEECH_MAX_CHARS", "500"))
+    SPEECH_MAX_CHARS_SCREEN: int = int(os.getenv("SPEECH_MAX_CHARS_SCREEN", "800"))
+    SPEECH_MAX_CHARS_BY_INTENT: Dict[str, int] = _parse_limits(os.getenv("SPEECH_MAX_CHARS_BY_INTENT", ""))
+    SPEECH_MAX_CHARS_DETAILED: int = int(os.getenv("SPEECH_MAX_CHARS_DETAILED", "1500"))
+    
+    # Encerramento: prazo para terminar as requisições em andamento (a Alexa desiste após 8 segundos)
+    SHUTDOWN_DRAIN_TIMEOUT: float = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "8"))
+    # Prazo para as tarefas em segundo plano (aquecimento, agenda, canais) antes da gravação final dos tokens
+    SHUTDOWN_TASKS_TIMEOUT: float = float(os.getenv("SHUTDOWN_TASKS_TIMEOUT", "5"))
+    # Intervalo (segundos) da gravação dos tokens renovados em memória; 0 grava só no encerramento
+    TOKEN_FLUSH_INTERVAL: float = float(os.getenv("TOKEN_FLUSH_INTERVAL", "30"))
+    
+    # Monitor do event loop: atraso medido a cada INTERVAL segundos; bloqueios acima de THRESHOLD
+    # segundos são contados e registrados com a pilha. STRICT (testes e benchmarks) faz falhar.
+    EVENT_LOOP_MONITOR: bool = os.getenv("EVENT_LOOP_MONITOR", "True").lower() == "true"
+    EVENT_LOOP_BLOCK_THRESHOLD: float = float(os.getenv("EVENT_LOOP_BLOCK_THRESHOLD", "0.1"))
+    EVENT_LOOP_MONITOR_INTERVAL: float = float(os.getenv("EVENT_LOOP_MONITOR_INTERVAL", "0.05"))
+    EVENT_LOOP_STRICT: bool = os.getenv("EVENT_LOOP_STRICT", "False").lower() == "true"
+    
+    # Gravação do tráfego de /alexa para replay (benchmarks/replay_traffic.py); vazio desativa
+    TRAFFIC_RECORD_FILE: str = os.getenv("TRAFFIC_RECORD_FILE", "")
+    TRAFFIC_RECORD_SAMPLE_RATE: float = float(os.getenv("TRAFFIC_RECORD_SAMPLE_RATE", "1.0"))
+    # Grava o texto falado (valores dos slots) em claro; por padrão só tamanho e hash
+    TRAFFIC_RECORD_RAW_TEXT: bool = os.getenv("TRAFFIC_RECORD_RAW_TEXT", "False").lower() == "true"
+    
     # Configurações de segurança
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-here")
     
@@ -1,18 +1,122 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, RedirectResponse
-from pydantic import BaseModel
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response
+from starlette.concurrency import run_in_threadpool
+import anyio.to_thread
 import json
 import logging
-from typing import Dict, Any, Optional
+import threading
+import time
+from typing import Optional
 from models.alexa_handler import AlexaRequestHandler
+from models.alexa_request import AlexaEnvelope
+from services.alexa_verification import AlexaRequestVerifier, AlexaVerificationMiddleware
+from services.calendar_watch import NOTIFY_UNKNOWN
+from services.loop_monitor import EventLoopMonitor
+from services.metrics import metrics
 from services.oauth_service import oauth_service
+from services.request_drain import RequestDrain, RequestDrainMiddleware
+from services.traffic_recorder import TrafficRecorder, TrafficRecorderMiddleware
+from config.settings import config
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Alexa Gemini Plugin", version="1.0.0")
+# Instância do handler da Alexa (construída na inicialização da aplicação)
+alexa_handler: Optional[AlexaRequestHandler] = None
+
+# Gravador de tráfego de /alexa (None quando TRAFFIC_RECORD_FILE não está configurado)
+traffic_recorder: Optional[TrafficRecorder] = None
+
+# Monitor de atraso e bloqueios do event loop (None com EVENT_LOOP_MONITOR=false)
+loop_monitor: Optional[EventLoopMonitor] = EventLoopMonitor() if config.EVENT_LOOP_MONITOR else None
+
+# Requisições em andamento; no encerramento, novas são recusadas e as em andamento terminam
+request_drain = RequestDrain()
+
+# Sinalizado quando as bibliotecas do Google estão carregadas e o serviço pode receber tráfego
+ready = threading.Event()
+
+
+def start_services() -> AlexaRequestHandler:
+    """
+    Constrói o handler, carrega os tokens salvos e inicia os agendadores em segundo plano
+    
+    Returns:
+        Handler da Alexa (o mesmo em chamadas repetidas)
+    """
+    global alexa_handler
+    if alexa_handler is None:
+        handler = AlexaRequestHandler()
+        
+        # Carrega tokens salvos na inicialização
+        oauth_service.load_tokens_from_file()
+        
+        # Pré-cálculo da agenda de hoje e amanhã das contas vinculadas
+        handler.agenda_precomputer.start()
+        
+        # Canais de notificação push do Calendar (abertura e renovação)
+        handler.calendar_watch.start()
+        
+        # Gravação periódica dos tokens renovados em memória
+        oauth_service.start_token_flusher()
+        alexa_handler = handler
+    return alexa_handler
+
+
+def stop_services():
+    """Encerra os agendadores em segundo plano, grava os tokens alterados e fecha os pools HTTP"""
+    if alexa_handler is not None:
+        # Tarefas em andamento podem renovar tokens: terminam (com prazo) antes da gravação final
+        deadline = time.monotonic() + config.SHUTDOWN_TASKS_TIMEOUT
+        alexa_handler.warmer.shutdown(timeout=max(0.0, deadline - time.monotonic()))
+        alexa_handler.agenda_precomputer.stop(max(0.0, deadline - time.monotonic()))
+        alexa_handler.calendar_watch.stop(max(0.0, deadline - time.monotonic()))
+    oauth_service.stop_token_flusher()
+    # Renovações feitas desde a última gravação, numa única escrita
+    oauth_service.flush_tokens()
+    if alexa_handler is not None:
+        alexa_handler.gemini_service.close()
+        alexa_handler.alexa_settings.close()
+
+
+def load_client_libraries():
+    """Carrega as bibliotecas do Google (importadas sob demanda) e marca o serviço como pronto"""
+    try:
+        alexa_handler.calendar_service.load_client_libraries()
+        oauth_service.load_client_libraries()
+    except Exception as e:
+        # Sem pré-carga, a primeira requisição que precisar das bibliotecas as importa
+        logger.error(f"Erro ao carregar bibliotecas do Google: {str(e)}")
+    ready.set()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Inicialização e encerramento da aplicação"""
+    # Tamanho explícito do pool de run_in_threadpool (o padrão do anyio é 40 threads)
+    anyio.to_thread.current_default_thread_limiter().total_tokens = config.THREADPOOL_SIZE
+    if loop_monitor is not None:
+        loop_monitor.start()
+    await run_in_threadpool(start_services)
+    # O servidor já atende enquanto as bibliotecas carregam; /health indica quando está pronto
+    threading.Thread(target=load_client_libraries, name="client-libraries", daemon=True).start()
+    yield
+    # Encerramento: recusa novas requisições e espera as em andamento (dentro do prazo da Alexa)
+    request_drain.start_draining()
+    await request_drain.wait_idle(config.SHUTDOWN_DRAIN_TIMEOUT)
+    await run_in_threadpool(stop_services)
+    await oauth_service.aclose()
+    if traffic_recorder is not None:
+        traffic_recorder.close()
+    if loop_monitor is not None:
+        await loop_monitor.stop()
+        loop_monitor.check()
+
+
+app = FastAPI(title="Alexa Gemini Plugin", version="1.0.0", lifespan=lifespan)
 
 # Configuração CORS para permitir requisições da Alexa
 app.add_middleware(
@@ -23,23 +127,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Instância do handler da Alexa
-alexa_handler = AlexaRequestHandler()
-
-# Carrega tokens salvos na inicialização
-oauth_service.load_tokens_from_file()
+# Verificação de origem das requisições da Alexa (assinatura, timestamp e ID da skill)
+if config.ALEXA_VERIFY_REQUESTS:
+    app.add_middleware(
+        AlexaVerificationMiddleware,
+        verifier=AlexaRequestVerifier(
+            skill_id=config.ALEXA_SKILL_ID,
+            timestamp_tolerance=config.ALEXA_TIMESTAMP_TOLERANCE
+        )
+    )
+else:
+    logger.warning("Verificação de assinatura da Alexa desativada (ALEXA_VERIFY_REQUESTS=false)")
 
-# Modelos Pydantic para as requisições da Alexa
-class AlexaRequest(BaseModel):
-    version: str
-    session: Dict[str, Any]
-    context: Dict[str, Any]
-    request: Dict[str, Any]
+# Gravação do tráfego para replay; adicionado por último, envolve a verificação e mede a requisição inteira
+if config.TRAFFIC_RECORD_FILE:
+    traffic_recorder = TrafficRecorder(
+        config.TRAFFIC_RECORD_FILE,
+        sample_rate=config.TRAFFIC_RECORD_SAMPLE_RATE,
+        salt=config.SECRET_KEY,
+        raw_text=config.TRAFFIC_RECORD_RAW_TEXT
+    )
+    app.add_middleware(TrafficRecorderMiddleware, recorder=traffic_recorder)
+    logger.info(f"Gravando tráfego de /alexa em {config.TRAFFIC_RECORD_FILE}")
 
-class AlexaResponse(BaseModel):
-    version: str = "1.0"
-    response: Dict[str, Any]
-    sessionAttributes: Optional[Dict[str, Any]] = None
+# Contagem das requisições em andamento para o encerramento; adicionado por último, é o mais externo
+app.add_middleware(RequestDrainMiddleware, drain=request_drain)
 
 @app.get("/")
 async def root():
@@ -50,36 +162,41 @@ async def root():
 async def alexa_webhook(request: Request):
     """Endpoint principal para receber requisições da Alexa"""
     try:
-        # Recebe o JSON da requisição
-        body = await request.json()
-        logger.info(f"Requisição recebida da Alexa: {json.dumps(body, indent=2)}")
+        # Decodifica o envelope uma única vez a partir do corpo bruto
+        # (ou reaproveita o já decodificado pelo middleware de verificação)
+        envelope = getattr(request.state, "alexa_envelope", None)
+        if envelope is None:
+            envelope = AlexaEnvelope.from_bytes(await request.body())
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Requisição recebida da Alexa: {json.dumps(envelope.raw, indent=2)}")
         
-        # Processa a requisição usando o handler
-        response = alexa_handler.process_request(body)
+        # Início de sessão: aquece conexão, token e agenda em segundo plano enquanto a Alexa fala
+        alexa_handler.start_session_warmup(envelope)
         
-        logger.info(f"Resposta enviada para Alexa: {json.dumps(response, indent=2)}")
-        return response
+        # Caminho rápido: respostas fixas pré-serializadas, sem processamento nem nova codificação
+        response = alexa_handler.get_static_response(envelope)
+        if response is None:
+            # Processa a requisição usando o handler; as chamadas bloqueantes (Gemini, Calendar)
+            # rodam no pool de threads para não travar o event loop
+            response = await run_in_threadpool(alexa_handler.process_request, envelope)
+            if not isinstance(response, bytes):
+                response = alexa_handler.serialize_response(response)
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Resposta enviada para Alexa: {response.decode('utf-8')}")
+        return Response(content=response, media_type="application/json")
     
     except Exception as e:
         logger.error(f"Erro ao processar requisição da Alexa: {str(e)}")
         # Resposta de erro formatada para Alexa
-        error_response = {
-            "version": "1.0",
-            "response": {
-                "outputSpeech": {
-                    "type": "PlainText",
-                    "text": "Desculpe, ocorreu um erro interno. Tente novamente."
-                },
-                "shouldEndSession": True
-            }
-        }
-        return error_response
+        return Response(content=alexa_handler.static_responses["fatal_error"], media_type="application/json")
 
 @app.get("/auth/login")
 async def oauth_login(user_id: str = Query(..., description="ID único do usuário")):
     """Inicia o processo de autenticação OAuth"""
     try:
-        result = oauth_service.create_authorization_url(user_id)
+        # Monta o flow OAuth (e importa a biblioteca, na primeira vez) no pool do OAuth
+        result = await oauth_service.run_blocking(oauth_service.create_authorization_url, user_id)
         
         if result["success"]:
             return RedirectResponse(url=result["authorization_url"])
@@ -97,11 +214,11 @@ async def oauth_callback(
 ):
     """Processa o callback OAuth do Google"""
     try:
-        result = oauth_service.handle_oauth_callback(code, state)
+        result = await oauth_service.handle_oauth_callback(code, state)
         
         if result["success"]:
             # Salva tokens atualizados
-            oauth_service.save_tokens_to_file()
+            await oauth_service.persist_tokens()
             
             # Retorna página de sucesso
             html_content = f"""
@@ -164,7 +281,8 @@ async def oauth_callback(
 @app.get("/auth/status/{user_id}")
 async def check_auth_status(user_id: str):
     """Verifica o status de autenticação de um usuário"""
-    is_authenticated = oauth_service.is_user_authenticated(user_id)
+    # Pode renovar o token (HTTP bloqueante): roda no pool do OAuth
+    is_authenticated = await oauth_service.run_blocking(oauth_service.is_user_authenticated, user_id)
     return {
         "user_id": user_id,
         "authenticated": is_authenticated
@@ -173,19 +291,47 @@ async def check_auth_status(user_id: str):
 @app.delete("/auth/revoke/{user_id}")
 async def revoke_access(user_id: str):
     """Revoga acesso de um usuário"""
-    success = oauth_service.revoke_user_access(user_id)
+    # Encerra o canal de notificações enquanto o token do usuário ainda vale
+    await oauth_service.run_blocking(alexa_handler.calendar_watch.unwatch_user, user_id)
+    success = await oauth_service.revoke_user_access(user_id)
     if success:
-        oauth_service.save_tokens_to_file()
+        alexa_handler.agenda_precomputer.forget(user_id)
+        alexa_handler.calendar_service.invalidate_user(user_id)
+        await oauth_service.persist_tokens()
         return {"message": "Acesso revogado com sucesso"}
     else:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
 
+@app.post("/calendar/notify")
+async def calendar_notify(request: Request):
+    """Webhook das notificações push do Google Calendar (mudanças na agenda de um usuário)"""
+    status = alexa_handler.calendar_watch.handle_notification(
+        channel_id=request.headers.get("X-Goog-Channel-ID", ""),
+        token=request.headers.get("X-Goog-Channel-Token", ""),
+        resource_id=request.headers.get("X-Goog-Resource-ID", ""),
+        resource_state=request.headers.get("X-Goog-Resource-State", "")
+    )
+    if status == NOTIFY_UNKNOWN:
+        # O Google não reenvia notificações respondidas com 404
+        raise HTTPException(status_code=404, detail="Canal desconhecido")
+    return Response(status_code=200)
+
 @app.get("/health")
 async def health_check():
-    """Endpoint de verificação de saúde do serviço"""
+    """Endpoint de verificação de saúde do serviço (503 durante a inicialização e o encerramento)"""
+    if request_drain.draining:
+        return JSONResponse(status_code=503, content={"status": "draining", "service": "alexa-gemini-plugin"})
+    if not ready.is_set():
+        return JSONResponse(status_code=503, content={"status": "starting", "service": "alexa-gemini-plugin"})
     return {"status": "healthy", "service": "alexa-gemini-plugin"}
 
+@app.get("/metrics")
+async def get_metrics():
+    """Métricas internas do serviço (limitador do Gemini, latências, descartes, atraso do event loop)"""
+    return metrics.snapshot()
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=9000)
+    # Depois do prazo, o uvicorn cancela as requisições restantes e segue para o encerramento da aplicação
+    uvicorn.run(app, host="0.0.0.0", port=9000, timeout_graceful_shutdown=int(config.SHUTDOWN_DRAIN_TIMEOUT))
 
@@ -1,13 +1,100 @@
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Union
 from pydantic import BaseModel
+import json
 import logging
+from datetime import date
+from config.settings import config
+from models.alexa_request import AlexaEnvelope
+from services import ssml
+from services.concurrency_limiter import PRIORITY_HIGH, PRIORITY_NORMAL
 from services.gemini_service import GeminiService
 from services.calendar_service import CalendarService
 from services.oauth_service import oauth_service
-from datetime import datetime, timedelta
+from services.agenda_precompute import PRECOMPUTED_DAYS, AgendaPrecomputer
+from services.alexa_settings import AlexaSettingsService
+from services.calendar_watch import CalendarWatchManager
+from services.date_resolver import date_resolver
+from services.faq import FaqService
+from services.warmup import SessionWarmer
 
 logger = logging.getLogger(__name__)
 
+# Resposta já serializada em JSON (UTF-8), pronta para ser enviada à Alexa
+AlexaResponseBody = Union[Dict[str, Any], bytes]
+
+# Falas fixas: renderizadas uma única vez na inicialização do handler
+LAUNCH_SPEECH = (
+    "Olá! Eu sou sua assistente inteligente conectada ao Gemini. "
+    "Você pode me pedir para conversar sobre qualquer assunto ou consultar sua agenda. "
+    "Por exemplo, diga: 'Converse comigo sobre tecnologia' ou 'Consulte minha agenda de hoje'. "
+    "Como posso ajudá-lo?"
+)
+HELP_SPEECH = (
+    "Eu posso ajudá-lo de várias formas! "
+    "Você pode me pedir para conversar sobre qualquer assunto, por exemplo: "
+    "'Converse comigo sobre inteligência artificial'. "
+    "Também posso consultar sua agenda dizendo: 'Consulte minha agenda de hoje'. "
+    "Ou criar eventos: 'Marque reunião amanhã às 14 horas'. "
+    "Para usar as funções da agenda, você precisa vincular sua conta Google "
+    "nas configurações da skill no aplicativo Alexa. "
+    "O que você gostaria de fazer?"
+)
+CANCEL_SPEECH = "Operação cancelada. Posso ajudá-lo com algo mais?"
+STOP_SPEECH = "Até logo! Foi um prazer ajudá-lo."
+ACCOUNT_LINKING_SPEECH = (
+    "Para consultar sua agenda, você precisa primeiro vincular "
+    "sua conta Google no aplicativo Alexa. Vá em Configurações da Skill e "
+    "configure o Account Linking. Depois disso, poderei acessar sua agenda do Google."
+)
+AUTH_ERROR_SPEECH = (
+    "Houve um problema com sua autenticação. "
+    "Tente vincular sua conta Google novamente nas configurações da skill."
+)
+AUTH_UNAVAILABLE_SPEECH = (
+    "Não consegui acessar sua conta Google agora. "
+    "Tente novamente em alguns minutos."
+)
+ASK_QUESTION_SPEECH = "Sobre o que você gostaria de conversar? Faça uma pergunta e eu responderei usando o Gemini."
+UNKNOWN_INTENT_SPEECH = (
+    "Desculpe, não entendi o que você quer. "
+    "Tente dizer 'ajuda' para ver o que posso fazer."
+)
+UNSUPPORTED_REQUEST_SPEECH = "Desculpe, não consegui processar sua solicitação."
+INTERNAL_ERROR_SPEECH = "Desculpe, ocorreu um erro interno. Tente novamente."
+STALE_AGENDA_PREFIX = (
+    "Não consegui atualizar sua agenda agora, "
+    "então estas são as informações mais recentes que tenho. "
+)
+
+# Nome -> (fala, should_end_session)
+STATIC_SPEECHES = {
+    "launch": (LAUNCH_SPEECH, False),
+    "help": (HELP_SPEECH, False),
+    "cancel": (CANCEL_SPEECH, False),
+    "stop": (STOP_SPEECH, True),
+    "account_linking": (ACCOUNT_LINKING_SPEECH, False),
+    "auth_error": (AUTH_ERROR_SPEECH, False),
+    "auth_unavailable": (AUTH_UNAVAILABLE_SPEECH, False),
+    "ask_question": (ASK_QUESTION_SPEECH, False),
+    "unknown_intent": (UNKNOWN_INTENT_SPEECH, False),
+    "unsupported_request": (UNSUPPORTED_REQUEST_SPEECH, False),
+    "internal_error": (INTERNAL_ERROR_SPEECH, False),
+    "fatal_error": (INTERNAL_ERROR_SPEECH, True),
+}
+
+# Intents respondidos apenas com falas fixas (sem chamadas a serviços externos)
+STATIC_INTENTS = {
+    "AMAZON.HelpIntent": "help",
+    "AMAZON.CancelIntent": "cancel",
+    "AMAZON.StopIntent": "stop",
+}
+
+# SessionEndedRequest não exige resposta
+EMPTY_RESPONSE = b"{}"
+
+# Perguntas curtas (respostas rápidas) têm prioridade na fila do limitador do Gemini
+SHORT_QUESTION_WORDS = 8
+
 class AlexaRequestHandler:
     """Classe para processar diferentes tipos de requisições da Alexa"""
     
@@ -24,156 +111,220 @@ class AlexaRequestHandler:
         # Inicializa os serviços
         self.gemini_service = GeminiService()
         self.calendar_service = CalendarService()
+        self.alexa_settings = AlexaSettingsService()
+        self.faq = FaqService()
+        self.warmer = SessionWarmer(self.gemini_service, self.calendar_service, oauth_service)
+        
+        self.use_ssml = config.SPEECH_OUTPUT_MODE.upper() == "SSML"
+        self.agenda_precomputer = AgendaPrecomputer(self.calendar_service, oauth_service, ssml=self.use_ssml)
+        # Mudanças avisadas pelo Google descartam o cache e recalculam a agenda pré-calculada
+        self.calendar_watch = CalendarWatchManager(self.calendar_service, oauth_service,
+                                                   on_change=self.agenda_precomputer.mark_stale)
+        
+        # Respostas fixas pré-serializadas (bytes imutáveis reutilizados a cada requisição)
+        self.static_responses = self._render_static_responses()
+    
+    def _render_static_responses(self) -> Dict[str, bytes]:
+        """Renderiza e serializa uma única vez as respostas que não dependem da requisição"""
+        return {
+            name: self.serialize_response(self.create_response(speech_text, should_end_session=end_session))
+            for name, (speech_text, end_session) in STATIC_SPEECHES.items()
+        }
+    
+    @staticmethod
+    def serialize_response(response: Dict[str, Any]) -> bytes:
+        """Serializa uma resposta da Alexa em JSON compacto (UTF-8)"""
+        return json.dumps(response, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
     
-    def process_request(self, alexa_request: Dict[str, Any]) -> Dict[str, Any]:
+    def get_static_response(self, envelope: AlexaEnvelope) -> Optional[bytes]:
+        """
+        Caminho rápido: retorna a resposta pré-serializada para requisições que não
+        dependem de serviços externos (launch, ajuda, cancelar, parar, fim de sessão)
+        
+        Args:
+            envelope: Requisição da Alexa
+            
+        Returns:
+            Resposta em bytes ou None se a requisição precisa do processamento completo
+        """
+        request_type = envelope.request_type
+        
+        if request_type == "LaunchRequest":
+            return self.static_responses["launch"]
+        if request_type == "SessionEndedRequest":
+            return EMPTY_RESPONSE
+        if request_type == "IntentRequest":
+            name = STATIC_INTENTS.get(envelope.intent_name)
+            if name:
+                return self.static_responses[name]
+        return None
+    
+    def start_session_warmup(self, envelope: AlexaEnvelope) -> bool:
+        """
+        Dispara o aquecimento em segundo plano no início da sessão (LaunchRequest ou sessão nova)
+        
+        Args:
+            envelope: Requisição da Alexa
+            
+        Returns:
+            True se o aquecimento foi agendado
+        """
+        if envelope.request_type != "LaunchRequest" and not envelope.is_new_session:
+            return False
+        return self.warmer.schedule(envelope.user_id)
+    
+    def process_request(self, alexa_request: Union[AlexaEnvelope, Dict[str, Any]]) -> AlexaResponseBody:
         """Processa uma requisição da Alexa e retorna a resposta apropriada"""
         try:
-            request_type = alexa_request.get("request", {}).get("type")
+            envelope = alexa_request if isinstance(alexa_request, AlexaEnvelope) else AlexaEnvelope(alexa_request)
+            request_type = envelope.request_type
             
             if request_type == "LaunchRequest":
                 return self.handle_launch()
             elif request_type == "IntentRequest":
-                return self.handle_intent(alexa_request)
+                return self.handle_intent(envelope)
             elif request_type == "SessionEndedRequest":
                 return self.handle_session_ended()
             else:
-                return self.create_response("Desculpe, não consegui processar sua solicitação.")
+                return self.static_responses["unsupported_request"]
         
         except Exception as e:
             logger.error(f"Erro ao processar requisição da Alexa: {str(e)}")
-            return self.create_response("Desculpe, ocorreu um erro interno. Tente novamente.")
+            return self.static_responses["internal_error"]
+    
+    def response_deadline(self, envelope: AlexaEnvelope) -> float:
+        """Instante (time.monotonic) até o qual a resposta precisa ser enviada à Alexa"""
+        return envelope.received_at + config.ALEXA_RESPONSE_DEADLINE
+    
+    def precomputed_speech(self, user_id: str, day: date) -> Optional[str]:
+        """
+        Fala pré-calculada da agenda do dia, se ainda reflete o Calendar
+
+        Só com um canal de notificações aberto as mudanças na agenda descartam a fala
+        pré-calculada; sem ele, ela vale só por AGENDA_FRESH_SECONDS, como a agenda
+        pré-carregada na consulta ao vivo.
+        """
+        max_age = None if self.calendar_watch.channel_for(user_id) is not None else config.AGENDA_FRESH_SECONDS
+        return self.agenda_precomputer.get_speech(user_id, day, max_age=max_age)
     
-    def handle_launch(self) -> Dict[str, Any]:
+    def speech_limit(self, envelope: AlexaEnvelope) -> int:
+        """Tamanho máximo da fala (caracteres) para o intent e o tipo de dispositivo"""
+        limit = config.SPEECH_MAX_CHARS_BY_INTENT.get(envelope.intent_name)
+        if limit:
+            return limit
+        return config.SPEECH_MAX_CHARS_SCREEN if envelope.has_screen else config.SPEECH_MAX_CHARS
+    
+    def handle_launch(self) -> AlexaResponseBody:
         """Manipula o LaunchRequest (quando o usuário abre a skill)"""
-        speech_text = (
-            "Olá! Eu sou sua assistente inteligente conectada ao Gemini. "
-            "Você pode me pedir para conversar sobre qualquer assunto ou consultar sua agenda. "
-            "Por exemplo, diga: 'Converse comigo sobre tecnologia' ou 'Consulte minha agenda de hoje'. "
-            "Como posso ajudá-lo?"
-        )
-        return self.create_response(speech_text, should_end_session=False)
+        return self.static_responses["launch"]
     
-    def handle_intent(self, alexa_request: Dict[str, Any]) -> Dict[str, Any]:
+    def handle_intent(self, envelope: AlexaEnvelope) -> AlexaResponseBody:
         """Manipula IntentRequest baseado no intent específico"""
-        intent = alexa_request.get("request", {}).get("intent", {})
-        intent_name = intent.get("name")
-        
-        handler = self.intent_handlers.get(intent_name)
+        handler = self.intent_handlers.get(envelope.intent_name)
         if handler:
-            return handler(intent, alexa_request)
+            return handler(envelope)
         else:
-            return self.create_response(
-                "Desculpe, não entendi o que você quer. "
-                "Tente dizer 'ajuda' para ver o que posso fazer."
-            )
+            return self.static_responses["unknown_intent"]
     
-    def handle_conversar_gemini(self, intent: Dict[str, Any], alexa_request: Dict[str, Any]) -> Dict[str, Any]:
+    def handle_conversar_gemini(self, envelope: AlexaEnvelope) -> AlexaResponseBody:
         """Manipula o intent ConversarComGemini"""
-        slots = intent.get("slots", {})
-        pergunta_slot = slots.get("pergunta", {})
-        pergunta = pergunta_slot.get("value", "")
+        pergunta = envelope.slot_value("pergunta")
         
         if not pergunta:
-            speech_text = "Sobre o que você gostaria de conversar? Faça uma pergunta e eu responderei usando o Gemini."
-            return self.create_response(speech_text, should_end_session=False)
+            return self.static_responses["ask_question"]
         
-        # Chama o serviço do Gemini
+        # Perguntas frequentes (sobre a skill, hora, data) são respondidas sem o Gemini
+        faq_answer = self.faq.answer(
+            pergunta,
+            tz=lambda: self.calendar_service.cached_timezone(envelope.user_id) or self.alexa_settings.timezone(envelope)
+        )
+        if faq_answer is not None:
+            return self.create_response(faq_answer)
+        
+        # Chama o serviço do Gemini dentro do prazo da Alexa
         logger.info(f"Processando pergunta para o Gemini: {pergunta}")
-        gemini_response = self.gemini_service.generate_content(pergunta)
+        priority = PRIORITY_HIGH if len(pergunta.split()) <= SHORT_QUESTION_WORDS else PRIORITY_NORMAL
+        max_chars = self.gemini_service.speech_limit(pergunta, self.speech_limit(envelope))
+        gemini_response = self.gemini_service.generate_content(
+            pergunta, priority=priority, deadline=self.response_deadline(envelope),
+            max_speech_chars=max_chars
+        )
         
         if gemini_response["success"]:
-            # Formata a resposta para fala
-            speech_text = self.gemini_service.format_for_speech(gemini_response["response"])
-        else:
-            speech_text = gemini_response["response"]
+            # Formata a resposta para fala, no mesmo limite usado para pedir a resposta ao Gemini
+            speech_text = self.gemini_service.format_for_speech(
+                gemini_response["response"], ssml=self.use_ssml, max_chars=max_chars,
+                output_tokens=gemini_response.get("output_tokens")
+            )
+            return self.create_response(speech_text, is_ssml=self.use_ssml)
         
-        return self.create_response(speech_text)
+        return self.create_response(gemini_response["response"])
     
-    def handle_consultar_agenda(self, intent: Dict[str, Any], alexa_request: Dict[str, Any]) -> Dict[str, Any]:
+    def handle_consultar_agenda(self, envelope: AlexaEnvelope) -> AlexaResponseBody:
         """Manipula o intent ConsultarAgenda"""
         # Extrai o user ID da requisição da Alexa
-        user_id = alexa_request.get("session", {}).get("user", {}).get("userId", "")
+        user_id = envelope.user_id
         
         # Verifica se o usuário está autenticado
         if not oauth_service.is_user_authenticated(user_id):
-            speech_text = (
-                "Para consultar sua agenda, você precisa primeiro vincular "
-                "sua conta Google no aplicativo Alexa. Vá em Configurações da Skill e "
-                "configure o Account Linking. Depois disso, poderei acessar sua agenda do Google."
-            )
-            return self.create_response(speech_text)
+            # Com o servidor OAuth fora do ar, usuários vinculados não devem ser mandados vincular de novo
+            if oauth_service.refresh_unavailable(user_id):
+                return self.static_responses["auth_unavailable"]
+            return self.static_responses["account_linking"]
+        
+        # Resolve o período pedido no fuso do usuário (o do Calendar, se já conhecido, ou o do
+        # dispositivo); é uma consulta à tabela do dia
+        data = envelope.slot_value("data")
+        periodo = envelope.resolved_slot_value("periodo")
+        tz = self.calendar_service.cached_timezone(user_id) or self.alexa_settings.timezone(envelope)
+        date_range = date_resolver.resolve(data, periodo, tz)
+        
+        # Hoje e amanhã costumam estar pré-calculados: responde sem consultar o Calendar
+        if date_range.days_ahead in PRECOMPUTED_DAYS:
+            speech_text = self.precomputed_speech(user_id, date_range.start.date())
+            if speech_text is not None:
+                return self.create_response(speech_text, is_ssml=self.use_ssml)
         
         # Obtém token de acesso
         access_token = oauth_service.get_user_access_token(user_id)
         if not access_token:
-            speech_text = (
-                "Houve um problema com sua autenticação. "
-                "Tente vincular sua conta Google novamente nas configurações da skill."
-            )
-            return self.create_response(speech_text)
+            if oauth_service.refresh_unavailable(user_id):
+                return self.static_responses["auth_unavailable"]
+            return self.static_responses["auth_error"]
         
         # Inicializa o serviço do Calendar
         if not self.calendar_service.initialize_service(access_token):
             speech_text = "Desculpe, não consegui acessar sua agenda no momento. Tente novamente."
             return self.create_response(speech_text)
         
-        slots = intent.get("slots", {})
-        data_slot = slots.get("data", {})
-        periodo_slot = slots.get("periodo", {})
-        
-        data = data_slot.get("value", "")
-        periodo = periodo_slot.get("value", "")
-        
-        # Determina o período para consulta
-        if data:
-            target_date = self.calendar_service.parse_date_from_speech(data)
-            if target_date:
-                time_min = target_date
-                time_max = target_date + timedelta(days=1)
-                period_text = f"para {data}"
-            else:
-                period_text = "para hoje"
-                time_min = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-                time_max = time_min + timedelta(days=1)
-        elif periodo:
-            if periodo.lower() in ['hoje', 'today']:
-                time_min = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-                time_max = time_min + timedelta(days=1)
-                period_text = "para hoje"
-            elif periodo.lower() in ['amanhã', 'tomorrow']:
-                time_min = (datetime.now() + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
-                time_max = time_min + timedelta(days=1)
-                period_text = "para amanhã"
-            else:
-                time_min = datetime.now()
-                time_max = time_min + timedelta(days=7)
-                period_text = f"para {periodo}"
-        else:
-            time_min = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-            time_max = time_min + timedelta(days=1)
-            period_text = "para hoje"
+        # Primeira consulta do usuário: confirma o fuso configurado no Calendar
+        user_tz = self.calendar_service.user_timezone(user_id, fallback=tz)
+        if user_tz != tz:
+            tz = user_tz
+            date_range = date_resolver.resolve(data, periodo, tz)
         
-        # Busca eventos
-        result = self.calendar_service.get_events(time_min=time_min, time_max=time_max)
+        # Busca eventos (a agenda de hoje costuma já estar no cache, pré-carregada no LaunchRequest)
+        result = self.calendar_service.get_events(time_min=date_range.start, time_max=date_range.end,
+                                                  user_id=user_id, max_age=config.AGENDA_FRESH_SECONDS,
+                                                  time_zone=str(tz))
         
         if result["success"]:
             events = result["events"]
-            speech_text = self.calendar_service.format_events_for_speech(events)
-        else:
-            speech_text = f"Desculpe, não consegui consultar sua agenda {period_text}. Tente novamente."
+            speech_text = self.calendar_service.format_events_for_speech(events, ssml=self.use_ssml)
+            if result.get("stale"):
+                # Agenda em cache servida porque o Calendar está indisponível
+                prefix = ssml.text(STALE_AGENDA_PREFIX) if self.use_ssml else STALE_AGENDA_PREFIX
+                speech_text = prefix + speech_text
+            return self.create_response(speech_text, is_ssml=self.use_ssml)
         
+        speech_text = f"Desculpe, não consegui consultar sua agenda {date_range.label}. Tente novamente."
         return self.create_response(speech_text)
     
-    def handle_criar_evento(self, intent: Dict[str, Any], alexa_request: Dict[str, Any]) -> Dict[str, Any]:
+    def handle_criar_evento(self, envelope: AlexaEnvelope) -> Dict[str, Any]:
         """Manipula o intent CriarEvento"""
-        slots = intent.get("slots", {})
-        titulo_slot = slots.get("titulo", {})
-        data_slot = slots.get("data", {})
-        hora_slot = slots.get("hora", {})
-        
-        titulo = titulo_slot.get("value", "")
-        data = data_slot.get("value", "")
-        hora = hora_slot.get("value", "")
+        titulo = envelope.slot_value("titulo")
+        data = envelope.slot_value("data")
+        hora = envelope.slot_value("hora")
         
         if not titulo:
             speech_text = "Qual é o título do evento que você quer criar?"
@@ -193,56 +344,61 @@ class AlexaRequestHandler:
         
         return self.create_response(speech_text)
     
-    def handle_help(self, intent: Dict[str, Any], alexa_request: Dict[str, Any]) -> Dict[str, Any]:
+    def handle_help(self, envelope: AlexaEnvelope) -> AlexaResponseBody:
         """Manipula o intent de ajuda"""
-        speech_text = (
-            "Eu posso ajudá-lo de várias formas! "
-            "Você pode me pedir para conversar sobre qualquer assunto, por exemplo: "
-            "'Converse comigo sobre inteligência artificial'. "
-            "Também posso consultar sua agenda dizendo: 'Consulte minha agenda de hoje'. "
-            "Ou criar eventos: 'Marque reunião amanhã às 14 horas'. "
-            "Para usar as funções da agenda, você precisa vincular sua conta Google "
-            "nas configurações da skill no aplicativo Alexa. "
-            "O que você gostaria de fazer?"
-        )
-        return self.create_response(speech_text, should_end_session=False)
+        return self.static_responses["help"]
     
-    def handle_cancel(self, intent: Dict[str, Any], alexa_request: Dict[str, Any]) -> Dict[str, Any]:
+    def handle_cancel(self, envelope: AlexaEnvelope) -> AlexaResponseBody:
         """Manipula o intent de cancelamento"""
-        speech_text = "Operação cancelada. Posso ajudá-lo com algo mais?"
-        return self.create_response(speech_text, should_end_session=False)
+        return self.static_responses["cancel"]
     
-    def handle_stop(self, intent: Dict[str, Any], alexa_request: Dict[str, Any]) -> Dict[str, Any]:
+    def handle_stop(self, envelope: AlexaEnvelope) -> AlexaResponseBody:
         """Manipula o intent de parada"""
-        speech_text = "Até logo! Foi um prazer ajudá-lo."
-        return self.create_response(speech_text, should_end_session=True)
+        return self.static_responses["stop"]
     
-    def handle_session_ended(self) -> Dict[str, Any]:
+    def handle_session_ended(self) -> AlexaResponseBody:
         """Manipula o SessionEndedRequest"""
         # Não precisa retornar resposta para SessionEndedRequest
-        return {}
+        return EMPTY_RESPONSE
     
     def create_response(self, speech_text: str, should_end_session: bool = False, 
-                       reprompt_text: Optional[str] = None) -> Dict[str, Any]:
-        """Cria uma resposta formatada para a Alexa"""
+                       reprompt_text: Optional[str] = None, is_ssml: bool = False) -> Dict[str, Any]:
+        """
+        Cria uma resposta formatada para a Alexa
+        
+        Args:
+            speech_text: Texto da fala (texto comum, ou conteúdo SSML se is_ssml=True)
+            should_end_session: Se a sessão deve ser encerrada
+            reprompt_text: Texto para repetir caso o usuário não responda
+            is_ssml: Indica que speech_text já é conteúdo SSML escapado
+        """
         response = {
             "version": "1.0",
             "response": {
-                "outputSpeech": {
-                    "type": "PlainText",
-                    "text": speech_text
-                },
+                "outputSpeech": self._output_speech(speech_text, is_ssml),
                 "shouldEndSession": should_end_session
             }
         }
         
         if reprompt_text and not should_end_session:
             response["response"]["reprompt"] = {
-                "outputSpeech": {
-                    "type": "PlainText",
-                    "text": reprompt_text
-                }
+                "outputSpeech": self._output_speech(reprompt_text)
             }
         
         return response
-
+    
+    def _output_speech(self, speech_text: str, is_ssml: bool = False) -> Dict[str, str]:
+        """Monta o objeto outputSpeech no formato configurado (PlainText ou SSML)"""
+        if not self.use_ssml:
+            return {
+                "type": "PlainText",
+                "text": speech_text
+            }
+        
+        # Sem <lang>: o idioma do dispositivo não diz em que idioma o texto está (respostas
+        # do Gemini e falas fixas são em português)
+        content = speech_text if is_ssml else ssml.text(speech_text)
+        return {
+            "type": "SSML",
+            "ssml": ssml.speak(content)
+        }
@@ -0,0 +1,169 @@
+import time
+from typing import Any, Dict, Optional
+from pydantic_core import from_json
+
+_EMPTY: Dict[str, Any] = {}
+
+
+def _section(container: Dict[str, Any], key: str) -> Dict[str, Any]:
+    """Retorna um objeto aninhado, tratando ausência ou tipo inválido como vazio"""
+    value = container.get(key)
+    return value if isinstance(value, dict) else _EMPTY
+
+
+class Slot:
+    """Slot de um intent da Alexa"""
+
+    __slots__ = ("name", "value", "_raw")
+
+    def __init__(self, name: str, raw: Dict[str, Any]):
+        self.name = name
+        self.value = raw.get("value") or ""
+        self._raw = raw
+
+    @property
+    def resolved_value(self) -> str:
+        """
+        Valor canônico da resolução de entidades (ex: sinônimo "hj" -> "hoje"),
+        ou o valor falado quando não há resolução
+        """
+        for authority in _section(self._raw, "resolutions").get("resolutionsPerAuthority", ()):
+            if _section(authority, "status").get("code") == "ER_SUCCESS_MATCH":
+                values = authority.get("values") or ()
+                if values:
+                    return _section(values[0], "value").get("name") or self.value
+        return self.value
+
+
+class AlexaEnvelope:
+    """
+    Representação tipada da requisição da Alexa
+
+    O corpo é decodificado uma única vez a partir dos bytes recebidos e os campos
+    usados pelos handlers são extraídos sob demanda e memorizados, de forma que
+    toda a cadeia de despacho compartilha o mesmo objeto em vez de repetir
+    cadeias de .get(...).
+    """
+
+    __slots__ = ("raw", "received_at", "_request", "_intent", "_slots", "_system")
+
+    def __init__(self, raw: Dict[str, Any]):
+        if not isinstance(raw, dict):
+            raise ValueError("Envelope da Alexa deve ser um objeto JSON")
+        self.raw = raw
+        # Instante de chegada (time.monotonic), base do prazo de resposta à Alexa
+        self.received_at = time.monotonic()
+        self._request: Optional[Dict[str, Any]] = None
+        self._intent: Optional[Dict[str, Any]] = None
+        self._slots: Optional[Dict[str, Slot]] = None
+        self._system: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_bytes(cls, body: bytes) -> "AlexaEnvelope":
+        """
+        Decodifica o envelope a partir do corpo bruto da requisição
+
+        Args:
+            body: Corpo HTTP em bytes
+
+        Returns:
+            Envelope da requisição
+
+        Raises:
+            ValueError: Se o corpo não for um objeto JSON válido
+        """
+        return cls(from_json(body))
+
+    @property
+    def request(self) -> Dict[str, Any]:
+        if self._request is None:
+            self._request = _section(self.raw, "request")
+        return self._request
+
+    @property
+    def request_type(self) -> Optional[str]:
+        return self.request.get("type")
+
+    @property
+    def request_id(self) -> Optional[str]:
+        return self.request.get("requestId")
+
+    @property
+    def timestamp(self) -> Optional[str]:
+        return self.request.get("timestamp")
+
+    @property
+    def locale(self) -> Optional[str]:
+        return self.request.get("locale")
+
+    @property
+    def intent(self) -> Dict[str, Any]:
+        if self._intent is None:
+            self._intent = _section(self.request, "intent")
+        return self._intent
+
+    @property
+    def intent_name(self) -> Optional[str]:
+        return self.intent.get("name")
+
+    @property
+    def slots(self) -> Dict[str, Slot]:
+        if self._slots is None:
+            self._slots = {
+                name: Slot(name, raw)
+                for name, raw in _section(self.intent, "slots").items()
+                if isinstance(raw, dict)
+            }
+        return self._slots
+
+    def slot_value(self, name: str) -> str:
+        """Valor falado de um slot ("" se ausente)"""
+        slot = self.slots.get(name)
+        return slot.value if slot else ""
+
+    def resolved_slot_value(self, name: str) -> str:
+        """Valor canônico de um slot de tipo personalizado ("" se ausente)"""
+        slot = self.slots.get(name)
+        return slot.resolved_value if slot else ""
+
+    @property
+    def system(self) -> Dict[str, Any]:
+        if self._system is None:
+            self._system = _section(_section(self.raw, "context"), "System")
+        return self._system
+
+    @property
+    def user_id(self) -> str:
+        user_id = _section(_section(self.raw, "session"), "user").get("userId")
+        return user_id or _section(self.system, "user").get("userId") or ""
+
+    @property
+    def application_id(self) -> Optional[str]:
+        application_id = _section(_section(self.raw, "session"), "application").get("applicationId")
+        return application_id or _section(self.system, "application").get("applicationId")
+
+    @property
+    def is_new_session(self) -> bool:
+        return bool(_section(self.raw, "session").get("new"))
+
+    @property
+    def device_id(self) -> Optional[str]:
+        return _section(self.system, "device").get("deviceId")
+
+    @property
+    def supported_interfaces(self) -> Dict[str, Any]:
+        return _section(_section(self.system, "device"), "supportedInterfaces")
+
+    @property
+    def has_screen(self) -> bool:
+        """Indica se o dispositivo tem tela (Echo Show, Fire TV...)"""
+        interfaces = self.supported_interfaces
+        return "Display" in interfaces or "Alexa.Presentation.APL" in interfaces
+
+    @property
+    def api_endpoint(self) -> Optional[str]:
+        return self.system.get("apiEndpoint")
+
+    @property
+    def api_access_token(self) -> Optional[str]:
+        return self.system.get("apiAccessToken")
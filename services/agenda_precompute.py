@@ -0,0 +1,300 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta, tzinfo
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from config.settings import config
+from services.date_resolver import date_resolver
+from services.metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+# Dias pré-calculados: hoje e amanhã
+PRECOMPUTED_DAYS = (0, 1)
+
+
+def parse_hours(value: str) -> Tuple[int, int]:
+    """
+    Converte uma janela "4-6" em (4, 6): das 4h às 6h (fim exclusivo)
+
+    Janelas que viram o dia ("23-2") são aceitas; "" desativa a janela (0, 0).
+    """
+    start, _, end = value.partition("-")
+    if not start.strip() or not end.strip():
+        return 0, 0
+    return int(start) % 24, int(end) % 24
+
+
+class PrecomputedAgenda:
+    """Fala pronta da agenda de um dia"""
+
+    __slots__ = ("day", "speech", "count", "computed_at")
+
+    def __init__(self, day: date, speech: str, count: int, computed_at: float):
+        self.day = day
+        self.speech = speech
+        self.count = count
+        self.computed_at = computed_at
+
+
+class _UserState:
+    __slots__ = ("agendas", "computed_at", "dirty", "version", "refreshing")
+
+    def __init__(self):
+        self.agendas: Dict[date, PrecomputedAgenda] = {}
+        self.computed_at: Optional[datetime] = None
+        self.dirty = False
+        # Incrementada a cada mudança: um cálculo iniciado antes dela não limpa o dirty
+        self.version = 0
+        self.refreshing = False
+
+
+class AgendaPrecomputer:
+    """
+    Pré-cálculo da fala da agenda de hoje e de amanhã para as contas vinculadas
+
+    Um agendador em segundo plano recalcula a agenda de todos os usuários uma vez
+    por dia dentro da janela de baixa demanda (AGENDA_PRECOMPUTE_HOURS no fuso
+    DEFAULT_TIMEZONE, antes do pico da manhã) e, a qualquer hora, a dos usuários marcados com mark_stale() (ex:
+    notificação de mudança no Calendar). O trabalho roda num pool limitado
+    (AGENDA_PRECOMPUTE_WORKERS) para não disputar a cota do Calendar com as
+    consultas ao vivo.
+
+    get_speech() só devolve a fala se ela for do dia pedido, não estiver marcada
+    como desatualizada e tiver menos de AGENDA_PRECOMPUTE_MAX_AGE segundos (ou da
+    idade pedida, se menor); caso contrário o handler consulta o Calendar normalmente.
+    """
+
+    def __init__(self, calendar_service, oauth, ssml: bool = False, workers: int = config.AGENDA_PRECOMPUTE_WORKERS,
+                 hours: str = config.AGENDA_PRECOMPUTE_HOURS, max_age: float = config.AGENDA_PRECOMPUTE_MAX_AGE,
+                 tick: float = config.AGENDA_PRECOMPUTE_TICK, now: Callable[[tzinfo], datetime] = datetime.now,
+                 clock: Callable[[], float] = time.monotonic, registry: MetricsRegistry = metrics):
+        self.calendar_service = calendar_service
+        self.oauth = oauth
+        self.ssml = ssml
+        self.workers = workers
+        self.window = parse_hours(hours)
+        # A janela de baixa demanda é contada no fuso padrão; cada agenda, no fuso do usuário
+        self.window_tz = date_resolver.default_timezone
+        self.max_age = max_age
+        self.tick = tick
+        self.now = now
+        self.clock = clock
+        self.registry = registry
+
+        self._users: Dict[str, _UserState] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._round: List[Future] = []
+
+    def get_speech(self, user_id: str, day: date, max_age: Optional[float] = None) -> Optional[str]:
+        """
+        Fala pré-calculada da agenda do dia, se existir e estiver em dia
+
+        Args:
+            user_id: ID do usuário
+            day: Data pedida, no fuso do usuário
+            max_age: Idade máxima aceita (segundos), se menor que a configurada
+
+        Returns:
+            Texto da fala ou None
+        """
+        if max_age is None or max_age > self.max_age:
+            max_age = self.max_age
+        with self._lock:
+            state = self._users.get(user_id)
+            agenda = state.agendas.get(day) if state and not state.dirty else None
+        if agenda is None or self.clock() - agenda.computed_at > max_age:
+            self.registry.increment("agenda.precompute.misses")
+            return None
+        self.registry.increment("agenda.precompute.hits")
+        return agenda.speech
+
+    def mark_stale(self, user_id: str):
+        """Descarta a agenda pré-calculada do usuário e agenda o recálculo (ex: evento alterado)"""
+        with self._lock:
+            state = self._users.get(user_id)
+            if state is None:
+                state = self._users[user_id] = _UserState()
+            state.dirty = True
+            state.version += 1
+        self.registry.increment("agenda.precompute.marked_stale")
+        self._wakeup.set()
+
+    def forget(self, user_id: str):
+        """Remove o usuário do armazenamento (ex: acesso revogado)"""
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def refresh_user(self, user_id: str) -> bool:
+        """
+        Recalcula a agenda de hoje e de amanhã de um usuário
+
+        Returns:
+            True se todas as agendas foram calculadas com dados atuais do Calendar
+        """
+        with self._lock:
+            state = self._users.get(user_id)
+            if state is None:
+                state = self._users[user_id] = _UserState()
+            version = state.version
+            state.refreshing = True
+
+        try:
+            agendas = self._compute(user_id)
+        except Exception:
+            self._fail(state, version)
+            raise
+        if agendas is None:
+            return self._fail(state, version)
+
+        with self._lock:
+            state.agendas = {agenda.day: agenda for agenda in agendas}
+            state.computed_at = self.now(self.window_tz)
+            self._finish(state, version)
+        self.registry.increment("agenda.precompute.users")
+        return True
+
+    def due_users(self, user_ids: Iterable[str]) -> List[str]:
+        """
+        Usuários que precisam de recálculo agora
+
+        Marcados como desatualizados: sempre. Demais: só dentro da janela de baixa
+        demanda, se ainda não foram calculados nesta janela.
+        """
+        now = self.now(self.window_tz)
+        window_start = self._window_start(now)
+        due = []
+        with self._lock:
+            for user_id in user_ids:
+                state = self._users.get(user_id)
+                if state is not None and state.refreshing:
+                    continue
+                if state is not None and state.dirty:
+                    due.append(user_id)
+                elif window_start is not None and (
+                        state is None or state.computed_at is None or state.computed_at < window_start):
+                    due.append(user_id)
+        return due
+
+    def run_once(self) -> int:
+        """
+        Executa uma rodada do agendador com concorrência limitada
+
+        Returns:
+            Número de usuários recalculados com sucesso
+        """
+        users = self.due_users(list(self.oauth.user_tokens))
+        if not users:
+            return 0
+        start = time.monotonic()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=max(1, self.workers),
+                                                thread_name_prefix="agenda-precompute")
+        self._round = [self._executor.submit(self._refresh_safely, user_id) for user_id in users]
+        wait(self._round)
+        # Recálculos cancelados no encerramento não contam
+        refreshed = sum(1 for future in self._round if not future.cancelled() and future.result())
+        self.registry.observe("agenda.precompute.round_seconds", time.monotonic() - start)
+        logger.info(f"Agenda pré-calculada para {refreshed} de {len(users)} usuários")
+        return refreshed
+
+    def start(self):
+        """Inicia o agendador em segundo plano (não faz nada com AGENDA_PRECOMPUTE_WORKERS=0)"""
+        if self.workers <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="agenda-precompute-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Interrompe o agendador e o pool de trabalho
+
+        Recálculos da rodada que ainda não começaram são cancelados; os em andamento
+        (que podem ter renovado tokens OAuth) são esperados por até timeout segundos.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self._stop.set()
+        self._wakeup.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            wait(self._round, timeout)
+            self._executor = None
+        if self._thread is not None:
+            self._thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Erro no agendador da agenda pré-calculada: {str(e)}")
+            self._wakeup.wait(self.tick)
+            self._wakeup.clear()
+
+    def _compute(self, user_id: str) -> Optional[List[PrecomputedAgenda]]:
+        """Consulta o Calendar e formata as falas (None se algum dia não pôde ser consultado)"""
+        access_token = self.oauth.get_user_access_token(user_id)
+        if not access_token or not self.calendar_service.initialize_service(access_token):
+            return None
+
+        # Dias contados no fuso do usuário, para coincidir com o "hoje" das consultas
+        tz = self.calendar_service.user_timezone(user_id)
+        now = self.now(tz)
+        agendas = []
+        for days_ahead in PRECOMPUTED_DAYS:
+            time_min, time_max = self.calendar_service.day_range(days_ahead, now, tz)
+            result = self.calendar_service.get_events(time_min=time_min, time_max=time_max, user_id=user_id,
+                                                      time_zone=str(tz))
+            if not result["success"] or result.get("stale"):
+                return None
+            speech = self.calendar_service.format_events_for_speech(result["events"], ssml=self.ssml)
+            agendas.append(PrecomputedAgenda(time_min.date(), speech, result["count"], self.clock()))
+        return agendas
+
+    @staticmethod
+    def _finish(state: _UserState, version: int):
+        # Mudanças que chegaram durante o cálculo mantêm o usuário marcado para a próxima rodada
+        if state.version == version:
+            state.dirty = False
+        state.refreshing = False
+
+    def _fail(self, state: _UserState, version: int) -> bool:
+        # A agenda antiga deixa de ser servida; a próxima tentativa fica para a próxima janela
+        # (ou notificação), sem insistir a cada rodada num usuário sem acesso
+        with self._lock:
+            state.agendas = {}
+            state.computed_at = self.now(self.window_tz)
+            self._finish(state, version)
+        self.registry.increment("agenda.precompute.failures")
+        return False
+
+    def _refresh_safely(self, user_id: str) -> bool:
+        try:
+            return self.refresh_user(user_id)
+        except Exception as e:
+            logger.warning(f"Falha ao pré-calcular a agenda de {user_id}: {str(e)}")
+            self.registry.increment("agenda.precompute.failures")
+            return False
+
+    def _window_start(self, now: datetime) -> Optional[datetime]:
+        """Início da janela de baixa demanda em andamento (None fora dela)"""
+        start, end = self.window
+        if start == end:
+            return None
+        hour = now.hour
+        inside = start <= hour < end if start < end else (hour >= start or hour < end)
+        if not inside:
+            return None
+        window_start = now.replace(hour=start, minute=0, second=0, microsecond=0)
+        if window_start > now:
+            # Janela que vira o dia e começou ontem
+            window_start -= timedelta(days=1)
+        return window_start
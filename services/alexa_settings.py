@@ -0,0 +1,79 @@
+import logging
+from datetime import tzinfo
+from typing import Optional
+
+import requests
+
+from config.settings import config
+from models.alexa_request import AlexaEnvelope
+from services.cache import TTLCache
+from services.date_resolver import zone
+from services.metrics import metrics
+from services.traffic_recorder import upstream_timer
+
+logger = logging.getLogger(__name__)
+
+# Após uma falha na consulta, o fuso padrão é usado por este tempo antes de tentar de novo
+FAILURE_RETRY_SECONDS = 300.0
+
+
+class AlexaSettingsService:
+    """
+    Configurações do dispositivo pela Alexa Settings API (fuso horário)
+
+    O fuso de cada dispositivo é consultado uma vez e mantido em cache por
+    TIMEZONE_CACHE_TTL; falhas usam DEFAULT_TIMEZONE e só são repetidas depois de
+    FAILURE_RETRY_SECONDS, para não pagar a consulta a cada requisição.
+    """
+
+    def __init__(self, timeout: float = config.ALEXA_SETTINGS_TIMEOUT, cache_ttl: float = config.TIMEZONE_CACHE_TTL,
+                 default_timezone: str = config.DEFAULT_TIMEZONE):
+        self.timeout = timeout
+        self.default_timezone = zone(default_timezone)
+        self.session = requests.Session()
+        # device_id -> nome IANA do fuso ("" quando a consulta falhou)
+        self.timezones: TTLCache[str] = TTLCache(max_size=10000, ttl=cache_ttl)
+
+    def timezone(self, envelope: AlexaEnvelope) -> tzinfo:
+        """
+        Fuso horário do dispositivo que fez a requisição
+
+        Args:
+            envelope: Requisição da Alexa (deviceId, apiEndpoint e apiAccessToken)
+
+        Returns:
+            Fuso do dispositivo ou DEFAULT_TIMEZONE
+        """
+        device_id = envelope.device_id
+        if not device_id or not envelope.api_endpoint or not envelope.api_access_token:
+            return self.default_timezone
+
+        cached = self.timezones.get_entry(device_id)
+        if cached is not None:
+            name, age = cached
+            if name or age < FAILURE_RETRY_SECONDS:
+                metrics.increment("alexa.timezone.cache_hits")
+                return zone(name) or self.default_timezone
+
+        name = self._fetch_timezone(envelope.api_endpoint, device_id, envelope.api_access_token)
+        self.timezones.set(device_id, name or "")
+        return zone(name) or self.default_timezone
+
+    def close(self):
+        """Fecha o pool de conexões com a API de configurações da Alexa"""
+        self.session.close()
+
+    def _fetch_timezone(self, api_endpoint: str, device_id: str, api_access_token: str) -> Optional[str]:
+        url = f"{api_endpoint.rstrip('/')}/v2/devices/{device_id}/settings/System.timeZone"
+        try:
+            with upstream_timer("alexa_settings"):
+                response = self.session.get(url, headers={"Authorization": f"Bearer {api_access_token}"},
+                                            timeout=self.timeout)
+                response.raise_for_status()
+            name = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.warning(f"Não foi possível obter o fuso horário do dispositivo: {str(e)}")
+            metrics.increment("alexa.timezone.failures")
+            return None
+        metrics.increment("alexa.timezone.lookups")
+        return name if isinstance(name, str) else None
@@ -0,0 +1,336 @@
+import base64
+import logging
+import posixpath
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from cryptography import x509
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.x509.verification import PolicyBuilder, Store, VerificationError
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+from models.alexa_request import AlexaEnvelope
+
+logger = logging.getLogger(__name__)
+
+# Regras de https://developer.amazon.com/docs/custom-skills/host-a-custom-skill-as-a-web-service.html
+ALEXA_CERT_HOST = "s3.amazonaws.com"
+ALEXA_CERT_PATH_PREFIX = "/echo.api/"
+ALEXA_SIGNING_DOMAIN = "echo-api.amazon.com"
+DEFAULT_TIMESTAMP_TOLERANCE = 150
+# Até a assinatura ser conferida a URL do certificado vem do cliente: limites para
+# que URLs inventadas não ocupem o threadpool com downloads
+DEFAULT_FAILURE_TTL = 60
+DEFAULT_MAX_URLS = 32
+DEFAULT_MAX_PENDING_FETCHES = 4
+
+CertFetcher = Callable[[str], bytes]
+
+
+class AlexaVerificationError(Exception):
+    """Requisição que não passou na verificação de origem da Alexa"""
+
+
+def fetch_certificate_chain(url: str) -> bytes:
+    """
+    Baixa a cadeia de certificados (PEM) indicada pela Alexa
+
+    Args:
+        url: Valor do cabeçalho SignatureCertChainUrl (já validado)
+
+    Returns:
+        Conteúdo PEM da cadeia
+    """
+    response = requests.get(url, timeout=5)
+    response.raise_for_status()
+    return response.content
+
+
+def load_default_trusted_roots() -> List[x509.Certificate]:
+    """Carrega as CAs raiz do pacote certifi (dependência do requests)"""
+    import certifi
+
+    with open(certifi.where(), "rb") as f:
+        return x509.load_pem_x509_certificates(f.read())
+
+
+class AlexaRequestVerifier:
+    """
+    Verifica se uma requisição veio de fato da Alexa
+
+    As verificações baratas (cabeçalhos, URL do certificado, timestamp e ID da
+    skill) são feitas antes de qualquer criptografia. A chave pública de cada
+    cadeia de certificados fica em cache por URL até a expiração do certificado,
+    então no caso comum a verificação custa apenas uma checagem de assinatura RSA.
+
+    URLs cujo download ou validação falhou são recusadas sem rede por
+    failure_ttl segundos; cada URL é baixada por uma requisição de cada vez
+    (as demais esperam o resultado) e no máximo max_pending_fetches URLs
+    distintas são baixadas ao mesmo tempo.
+    """
+
+    def __init__(self, skill_id: Optional[str] = None, cert_fetcher: Optional[CertFetcher] = None,
+                 trusted_roots: Optional[List[x509.Certificate]] = None,
+                 timestamp_tolerance: int = DEFAULT_TIMESTAMP_TOLERANCE,
+                 max_cache_ttl: int = 24 * 3600, failure_ttl: int = DEFAULT_FAILURE_TTL,
+                 max_urls: int = DEFAULT_MAX_URLS, max_pending_fetches: int = DEFAULT_MAX_PENDING_FETCHES,
+                 clock: Callable[[], float] = time.time):
+        self.skill_id = skill_id
+        self.cert_fetcher = cert_fetcher or fetch_certificate_chain
+        self.timestamp_tolerance = timestamp_tolerance
+        self.max_cache_ttl = max_cache_ttl
+        self.failure_ttl = failure_ttl
+        self.max_urls = max_urls
+        self.max_pending_fetches = max_pending_fetches
+        self.clock = clock
+        self._trusted_roots = trusted_roots
+        self._store: Optional[Store] = None
+        # URL -> (chave pública, instante de expiração)
+        self._certificates: Dict[str, Tuple[Any, float]] = {}
+        # URL -> (erro, instante até o qual a URL é recusada sem nova tentativa)
+        self._failures: Dict[str, Tuple[str, float]] = {}
+        # URL -> [trava do download, requisições usando a trava]
+        self._fetches: Dict[str, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def validate_cert_url(url: str):
+        """Valida o formato da SignatureCertChainUrl exigido pela Alexa"""
+        try:
+            parts = urlsplit(url)
+            port = parts.port
+        except ValueError:
+            raise AlexaVerificationError("URL do certificado inválida")
+
+        # O caminho é comparado já normalizado ("/echo.api/../x" não é aceito)
+        path = posixpath.normpath(parts.path or "/")
+        if (parts.scheme.lower() != "https"
+                or (parts.hostname or "").lower() != ALEXA_CERT_HOST
+                or not path.startswith(ALEXA_CERT_PATH_PREFIX)
+                or port not in (None, 443)):
+            raise AlexaVerificationError("URL do certificado não pertence à Alexa")
+
+    def check_timestamp(self, timestamp: Optional[str]):
+        """Rejeita requisições antigas (replay) ou com data no futuro"""
+        if not timestamp:
+            raise AlexaVerificationError("Timestamp ausente")
+        try:
+            sent_at = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+        except ValueError:
+            raise AlexaVerificationError("Timestamp inválido")
+        if sent_at.tzinfo is None:
+            sent_at = sent_at.replace(tzinfo=timezone.utc)
+        if abs(self.clock() - sent_at.timestamp()) > self.timestamp_tolerance:
+            raise AlexaVerificationError("Timestamp fora da janela permitida")
+
+    def check_application_id(self, application_id: Optional[str]):
+        """Garante que a requisição é destinada à nossa skill (se ALEXA_SKILL_ID estiver configurado)"""
+        if self.skill_id and application_id != self.skill_id:
+            raise AlexaVerificationError("ID da skill não corresponde")
+
+    def cached_public_key(self, url: str) -> Optional[Any]:
+        """Chave pública em cache para a URL, se ainda válida"""
+        cached = self._certificates.get(url)
+        if cached and cached[1] > self.clock():
+            return cached[0]
+        return None
+
+    def check_recent_failure(self, url: str):
+        """Recusa sem rede uma URL cujo certificado falhou há menos de failure_ttl segundos"""
+        failure = self._failures.get(url)
+        if failure and failure[1] > self.clock():
+            raise AlexaVerificationError(failure[0])
+
+    def load_public_key(self, url: str) -> Any:
+        """
+        Baixa e valida a cadeia de certificados, armazenando a chave pública em cache
+
+        Args:
+            url: SignatureCertChainUrl já validada
+
+        Returns:
+            Chave pública do certificado de assinatura
+        """
+        public_key = self.cached_public_key(url)
+        if public_key is not None:
+            return public_key
+        self.check_recent_failure(url)
+
+        with self._lock:
+            fetch = self._fetches.get(url)
+            if fetch is None:
+                if len(self._fetches) >= self.max_pending_fetches:
+                    raise AlexaVerificationError("Muitos certificados sendo baixados ao mesmo tempo")
+                fetch = self._fetches[url] = [threading.Lock(), 0]
+            fetch[1] += 1
+
+        try:
+            with fetch[0]:
+                # Quem esperou o download de outra requisição usa o resultado dela
+                public_key = self.cached_public_key(url)
+                if public_key is not None:
+                    return public_key
+                self.check_recent_failure(url)
+                try:
+                    public_key, expires_at = self._fetch_public_key(url)
+                except AlexaVerificationError as e:
+                    self._remember(self._failures, url, (str(e), self.clock() + self.failure_ttl))
+                    raise
+                self._remember(self._certificates, url, (public_key, expires_at))
+                logger.info(f"Certificado da Alexa armazenado em cache: {url}")
+                return public_key
+        finally:
+            with self._lock:
+                fetch[1] -= 1
+                if not fetch[1]:
+                    del self._fetches[url]
+
+    def _fetch_public_key(self, url: str) -> Tuple[Any, float]:
+        """Baixa e valida a cadeia; retorna (chave pública, instante de expiração do cache)"""
+        try:
+            chain = x509.load_pem_x509_certificates(self.cert_fetcher(url))
+        except Exception as e:
+            raise AlexaVerificationError(f"Não foi possível obter o certificado: {str(e)}")
+
+        leaf, intermediates = chain[0], chain[1:]
+        now = datetime.fromtimestamp(self.clock(), tz=timezone.utc)
+        try:
+            # Valida datas, cadeia até uma CA confiável e o SAN echo-api.amazon.com
+            verifier = (
+                PolicyBuilder()
+                .store(self._trust_store())
+                .time(now)
+                .build_server_verifier(x509.DNSName(ALEXA_SIGNING_DOMAIN))
+            )
+            verifier.verify(leaf, intermediates)
+        except VerificationError as e:
+            raise AlexaVerificationError(f"Cadeia de certificados inválida: {str(e)}")
+
+        expires_at = min(leaf.not_valid_after_utc.timestamp(), self.clock() + self.max_cache_ttl)
+        return leaf.public_key(), expires_at
+
+    def _remember(self, cache: Dict[str, Tuple[Any, float]], url: str, entry: Tuple[Any, float]):
+        """Guarda a entrada no cache, limitado a max_urls URLs (sai a expirada ou a mais antiga)"""
+        with self._lock:
+            cache.pop(url, None)
+            if len(cache) >= self.max_urls:
+                now = self.clock()
+                for expired in [key for key, (_, until) in cache.items() if until <= now]:
+                    del cache[expired]
+                if len(cache) >= self.max_urls:
+                    del cache[next(iter(cache))]
+            cache[url] = entry
+
+    def _trust_store(self) -> Store:
+        if self._store is None:
+            self._store = Store(self._trusted_roots or load_default_trusted_roots())
+        return self._store
+
+    @staticmethod
+    def verify_signature(public_key: Any, body: bytes, signature: str, algorithm: hashes.HashAlgorithm):
+        """Confere a assinatura RSA do corpo bruto da requisição"""
+        try:
+            public_key.verify(base64.b64decode(signature), body, padding.PKCS1v15(), algorithm)
+        except (InvalidSignature, ValueError):
+            raise AlexaVerificationError("Assinatura inválida")
+
+    def precheck(self, headers: Headers, body: bytes) -> Tuple[str, str, hashes.HashAlgorithm, AlexaEnvelope]:
+        """
+        Verificações sem criptografia nem rede, feitas antes de tudo
+
+        Returns:
+            Tupla (URL do certificado, assinatura, algoritmo, envelope decodificado)
+        """
+        cert_url = headers.get("SignatureCertChainUrl")
+        signature = headers.get("Signature-256")
+        algorithm: hashes.HashAlgorithm = hashes.SHA256()
+        if not signature:
+            signature = headers.get("Signature")
+            algorithm = hashes.SHA1()
+        if not cert_url or not signature:
+            raise AlexaVerificationError("Cabeçalhos de assinatura ausentes")
+
+        self.validate_cert_url(cert_url)
+        self.check_recent_failure(cert_url)
+        try:
+            envelope = AlexaEnvelope.from_bytes(body)
+        except ValueError:
+            raise AlexaVerificationError("Corpo da requisição inválido")
+        self.check_timestamp(envelope.timestamp)
+        self.check_application_id(envelope.application_id)
+        return cert_url, signature, algorithm, envelope
+
+    def verify(self, headers: Headers, body: bytes) -> AlexaEnvelope:
+        """
+        Verificação completa (síncrona)
+
+        Raises:
+            AlexaVerificationError: Se a requisição não for válida
+        """
+        cert_url, signature, algorithm, envelope = self.precheck(headers, body)
+        self.verify_signature(self.load_public_key(cert_url), body, signature, algorithm)
+        return envelope
+
+    async def verify_async(self, headers: Headers, body: bytes) -> AlexaEnvelope:
+        """Verificação completa; o download do certificado (cache miss) roda fora do event loop"""
+        cert_url, signature, algorithm, envelope = self.precheck(headers, body)
+        public_key = self.cached_public_key(cert_url)
+        if public_key is None:
+            public_key = await run_in_threadpool(self.load_public_key, cert_url)
+        self.verify_signature(public_key, body, signature, algorithm)
+        return envelope
+
+
+class AlexaVerificationMiddleware:
+    """
+    Middleware ASGI que rejeita requisições não assinadas pela Alexa antes de chegarem ao handler
+
+    O envelope decodificado durante a verificação é repassado em request.state.alexa_envelope
+    para que o endpoint não precise decodificar o corpo novamente.
+    """
+
+    def __init__(self, app, verifier: AlexaRequestVerifier, path: str = "/alexa"):
+        self.app = app
+        self.verifier = verifier
+        self.path = path
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != self.path or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        body = b"".join(chunks)
+
+        try:
+            envelope = await self.verifier.verify_async(Headers(scope=scope), body)
+        except AlexaVerificationError as e:
+            logger.warning(f"Requisição rejeitada na verificação da Alexa: {str(e)}")
+            response = JSONResponse({"error": str(e)}, status_code=400)
+            await response(scope, receive, send)
+            return
+
+        scope.setdefault("state", {})["alexa_envelope"] = envelope
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        await self.app(scope, replay_receive, send)
@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+
+class TTLCache(Generic[V]):
+    """
+    Cache LRU em memória com tempo de vida, thread-safe
+
+    Entradas expiram após ttl segundos e as menos usadas são descartadas quando o
+    cache passa de max_size. get() aceita uma idade máxima menor que o ttl, o que
+    permite usar o mesmo cache como dado "fresco" (max_age curto) e como último
+    valor conhecido para respostas degradadas (até o ttl).
+    """
+
+    def __init__(self, max_size: int = 1000, ttl: float = 3600.0, clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[V, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, max_age: Optional[float] = None) -> Optional[V]:
+        """
+        Retorna o valor armazenado se não for mais antigo que max_age (padrão: ttl)
+
+        Args:
+            key: Chave da entrada
+            max_age: Idade máxima aceitável em segundos
+
+        Returns:
+            Valor ou None se ausente, expirado ou mais antigo que max_age
+        """
+        entry = self.get_entry(key)
+        if entry is None:
+            return None
+        value, age = entry
+        if max_age is not None and age > max_age:
+            return None
+        return value
+
+    def get_entry(self, key: Hashable) -> Optional[Tuple[V, float]]:
+        """Retorna (valor, idade em segundos) ou None se ausente ou expirado"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            age = self.clock() - stored_at
+            if age > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value, age
+
+    def set(self, key: Hashable, value: V):
+        """Armazena um valor, descartando as entradas menos usadas se necessário"""
+        with self._lock:
+            self._entries[key] = (value, self.clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        """Remove uma entrada, se existir"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """
+        Remove as entradas cujas chaves satisfazem o predicado (ex: todas de um usuário)
+
+        Returns:
+            Número de entradas removidas
+        """
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def clear(self):
+        """Remove todas as entradas"""
+        with self._lock:
+            self._entries.clear()
@@ -1,19 +1,77 @@
-from googleapiclient.discovery import build
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
 import logging
+import threading
 from typing import Dict, Any, Optional, List
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from zoneinfo import ZoneInfo
 import json
+from config.settings import config
+from services import ssml as ssml_markup
+from services.cache import TTLCache
+from services.circuit_breaker import circuit_breaker_for
+from services.date_resolver import MIDNIGHT, date_resolver, zone
+from services.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+
+def _http_status(error: Exception) -> Optional[int]:
+    """Status HTTP de um HttpError da API do Google (None para outros erros)"""
+    # googleapiclient já foi importado por quem levantou o erro: o import aqui é só uma consulta
+    from googleapiclient.errors import HttpError
+    
+    if isinstance(error, HttpError):
+        return error.resp.status
+    return None
+
+
+def _is_upstream_failure(error: Exception) -> bool:
+    """Erros HTTP 4xx (exceto 429) são do usuário/requisição e não abrem o circuito do Calendar"""
+    status = _http_status(error)
+    if status is not None:
+        return status >= 500 or status == 429
+    return True
+
+
+def _rfc3339_utc(value: datetime) -> str:
+    """Instante em RFC 3339 UTC ("2026-10-19T03:00:00Z"); datetimes sem fuso são tratados como UTC"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat() + 'Z'
+
+
 class CalendarService:
     """Serviço para integração com a API do Google Calendar"""
     
+    # Documento de descoberta da API do Calendar, carregado uma vez por processo
+    _discovery_document: Optional[Dict[str, Any]] = None
+    _discovery_lock = threading.Lock()
+    
     def __init__(self):
-        self.service = None
+        # Cada thread do pool de requisições usa o cliente autenticado do seu próprio usuário
+        self._local = threading.local()
         self.scopes = ['https://www.googleapis.com/auth/calendar']
+        
+        # Falha rápida quando o Calendar está fora do ar, servindo a última agenda conhecida
+        self.breaker = circuit_breaker_for(
+            "calendar",
+            failure_rate_threshold=config.CIRCUIT_FAILURE_RATE,
+            slow_call_threshold=config.CALENDAR_SLOW_CALL_SECONDS,
+            min_calls=config.CIRCUIT_MIN_CALLS,
+            open_duration=config.CIRCUIT_OPEN_SECONDS
+        )
+        # (user_id, calendar_id, início, fim, máximo) -> lista de eventos formatados (início e fim em UTC)
+        self.events_cache: TTLCache[List[Dict[str, Any]]] = TTLCache(max_size=10000, ttl=config.AGENDA_CACHE_TTL)
+        # user_id -> nome IANA do fuso configurado no Google Calendar do usuário
+        self.timezones: TTLCache[str] = TTLCache(max_size=10000, ttl=config.TIMEZONE_CACHE_TTL)
+    
+    @property
+    def service(self):
+        """Cliente da API do Calendar inicializado nesta thread (ou None)"""
+        return getattr(self._local, "service", None)
+    
+    @service.setter
+    def service(self, value):
+        self._local.service = value
     
     def initialize_service(self, access_token: str) -> bool:
         """
@@ -26,11 +84,18 @@ class CalendarService:
             True se inicializado com sucesso, False caso contrário
         """
         try:
+            from google.oauth2.credentials import Credentials
+            from googleapiclient.discovery import build, build_from_document
+            
             # Cria credenciais a partir do token de acesso
             credentials = Credentials(token=access_token)
             
-            # Constrói o serviço da API do Calendar
-            self.service = build('calendar', 'v3', credentials=credentials)
+            # Constrói o serviço da API do Calendar a partir do documento de descoberta em memória
+            document = self.discovery_document()
+            if document is not None:
+                self.service = build_from_document(document, credentials=credentials)
+            else:
+                self.service = build('calendar', 'v3', credentials=credentials)
             
             logger.info("Serviço do Google Calendar inicializado com sucesso")
             return True
@@ -40,8 +105,107 @@ class CalendarService:
             self.service = None
             return False
     
+    @classmethod
+    def load_client_libraries(cls):
+        """
+        Importa o cliente da API do Google e carrega o documento de descoberta
+        
+        Os imports ficam dentro dos métodos para não atrasar a inicialização do
+        processo; chamar esta função em segundo plano evita que a primeira
+        consulta à agenda pague o custo.
+        """
+        import google.oauth2.credentials  # noqa: F401
+        import googleapiclient.discovery  # noqa: F401
+        cls.discovery_document()
+    
+    @classmethod
+    def discovery_document(cls) -> Optional[Dict[str, Any]]:
+        """Documento de descoberta estático do Calendar v3 (None se indisponível nesta versão da lib)"""
+        if cls._discovery_document is None:
+            with cls._discovery_lock:
+                if cls._discovery_document is None:
+                    from googleapiclient import discovery_cache
+                    
+                    content = discovery_cache.get_static_doc('calendar', 'v3')
+                    if content:
+                        cls._discovery_document = json.loads(content)
+        return cls._discovery_document
+    
+    @staticmethod
+    def day_range(days_ahead: int = 0, now: Optional[datetime] = None, tz: Optional[tzinfo] = None):
+        """
+        Intervalo [início, fim) de um dia inteiro no fuso do usuário, relativo a hoje
+        
+        Args:
+            days_ahead: 0 para hoje, 1 para amanhã...
+            now: Instante de referência (padrão: agora)
+            tz: Fuso do usuário (padrão: DEFAULT_TIMEZONE)
+            
+        Returns:
+            Tupla (time_min, time_max) com fuso (meia-noite local, mesmo em dias com horário de verão)
+        """
+        tz = tz or date_resolver.default_timezone
+        now = now.astimezone(tz) if now is not None and now.tzinfo is not None else now or datetime.now(tz)
+        day = now.date() + timedelta(days=days_ahead)
+        return (datetime.combine(day, MIDNIGHT, tzinfo=tz),
+                datetime.combine(day + timedelta(days=1), MIDNIGHT, tzinfo=tz))
+    
+    def cached_timezone(self, user_id: str) -> Optional[tzinfo]:
+        """Fuso do usuário já conhecido (sem chamar a API)"""
+        return zone(self.timezones.get(user_id)) if user_id else None
+    
+    def user_timezone(self, user_id: str, fallback: Optional[tzinfo] = None) -> tzinfo:
+        """
+        Fuso do usuário: o configurado no Google Calendar (em cache por TIMEZONE_CACHE_TTL)
+        
+        Requer o serviço inicializado com o token do usuário quando o fuso não está em cache.
+        
+        Args:
+            user_id: ID do usuário
+            fallback: Fuso usado se o Calendar não informar (ex: fuso do dispositivo Alexa)
+            
+        Returns:
+            Fuso do usuário, o fallback ou DEFAULT_TIMEZONE
+        """
+        tz = self.cached_timezone(user_id)
+        if tz is not None:
+            return tz
+        
+        if self.service:
+            try:
+                with self.breaker.call(is_failure=_is_upstream_failure):
+                    setting = self.service.settings().get(setting='timezone').execute()
+                tz = zone(setting.get('value'))
+            except Exception as e:
+                logger.warning(f"Não foi possível obter o fuso do Calendar: {str(e)}")
+            if tz is not None:
+                self.timezones.set(user_id, str(tz))
+                return tz
+        return fallback or date_resolver.default_timezone
+    
+    def prefetch_day(self, user_id: str, access_token: str, days_ahead: int = 0) -> bool:
+        """
+        Busca a agenda de um dia e a deixa no cache, para a próxima consulta ser atendida sem a API
+        
+        Args:
+            user_id: Dono da agenda
+            access_token: Token de acesso do usuário
+            days_ahead: 0 para hoje, 1 para amanhã...
+            
+        Returns:
+            True se a agenda foi carregada
+        """
+        if not self.initialize_service(access_token):
+            return False
+        tz = self.user_timezone(user_id)
+        time_min, time_max = self.day_range(days_ahead, tz=tz)
+        result = self.get_events(time_min=time_min, time_max=time_max, user_id=user_id, time_zone=str(tz))
+        return result["success"] and not result.get("stale")
+    
     def get_events(self, calendar_id: str = 'primary', max_results: int = 10, 
-                   time_min: Optional[datetime] = None, time_max: Optional[datetime] = None) -> Dict[str, Any]:
+                   time_min: Optional[datetime] = None, time_max: Optional[datetime] = None,
+                   user_id: Optional[str] = None, max_age: Optional[float] = None,
+                   time_zone: Optional[str] = None) -> Dict[str, Any]:
         """
         Obtém eventos do calendário
         
@@ -50,6 +214,11 @@ class CalendarService:
             max_results: Número máximo de eventos a retornar
             time_min: Data/hora mínima para buscar eventos
             time_max: Data/hora máxima para buscar eventos
+            user_id: Dono da agenda; se informado, o resultado é guardado em cache e, caso o
+                Calendar falhe, a última agenda conhecida é devolvida com "stale": True
+            max_age: Se informado (com user_id), uma agenda em cache mais nova que isso é
+                devolvida sem chamar a API (ex: pré-carregada no início da sessão)
+            time_zone: Fuso (IANA) em que o Calendar devolve os horários dos eventos
             
         Returns:
             Dict contendo os eventos ou erro
@@ -64,25 +233,53 @@ class CalendarService:
         try:
             # Define período padrão se não especificado
             if not time_min:
-                time_min = datetime.utcnow()
+                time_min = datetime.now(timezone.utc)
             if not time_max:
                 time_max = time_min + timedelta(days=7)
             
-            # Converte para formato ISO
-            time_min_iso = time_min.isoformat() + 'Z'
-            time_max_iso = time_max.isoformat() + 'Z'
+            # Converte para RFC 3339 em UTC (a mesma chave de cache para o mesmo instante)
+            time_min_iso = _rfc3339_utc(time_min)
+            time_max_iso = _rfc3339_utc(time_max)
             
             logger.info(f"Buscando eventos de {time_min_iso} até {time_max_iso}")
+            cache_key = (user_id, calendar_id, time_min_iso, time_max_iso, max_results)
+            
+            # Agenda recente em cache (ex: pré-carregada no LaunchRequest) dispensa a API
+            if user_id and max_age is not None:
+                events = self.events_cache.get(cache_key, max_age=max_age)
+                if events is not None:
+                    metrics.increment("calendar.fresh_cache_hits")
+                    return {
+                        "success": True,
+                        "events": events,
+                        "count": len(events)
+                    }
             
             # Chama a API do Google Calendar
-            events_result = self.service.events().list(
-                calendarId=calendar_id,
-                timeMin=time_min_iso,
-                timeMax=time_max_iso,
-                maxResults=max_results,
-                singleEvents=True,
-                orderBy='startTime'
-            ).execute()
+            try:
+                with self.breaker.call(is_failure=_is_upstream_failure):
+                    events_result = self.service.events().list(
+                        calendarId=calendar_id,
+                        timeMin=time_min_iso,
+                        timeMax=time_max_iso,
+                        maxResults=max_results,
+                        singleEvents=True,
+                        orderBy='startTime',
+                        timeZone=time_zone
+                    ).execute()
+            except Exception as e:
+                cached = self.events_cache.get_entry(cache_key) if user_id else None
+                if cached is None:
+                    raise
+                events, age = cached
+                logger.warning(f"Calendar indisponível ({str(e)}); usando agenda em cache de {age:.0f}s atrás")
+                metrics.increment("calendar.stale_agendas")
+                return {
+                    "success": True,
+                    "events": events,
+                    "count": len(events),
+                    "stale": True
+                }
             
             events = events_result.get('items', [])
             
@@ -101,6 +298,8 @@ class CalendarService:
                 formatted_events.append(formatted_event)
             
             logger.info(f"Encontrados {len(formatted_events)} eventos")
+            if user_id:
+                self.events_cache.set(cache_key, formatted_events)
             
             return {
                 "success": True,
@@ -117,17 +316,19 @@ class CalendarService:
             }
     
     def create_event(self, summary: str, start_time: datetime, end_time: datetime,
-                     description: str = "", location: str = "", calendar_id: str = 'primary') -> Dict[str, Any]:
+                     description: str = "", location: str = "", calendar_id: str = 'primary',
+                     user_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Cria um novo evento no calendário
         
         Args:
             summary: Título do evento
-            start_time: Data/hora de início
+            start_time: Data/hora de início (sem fuso: horário local do usuário)
             end_time: Data/hora de fim
             description: Descrição do evento
             location: Local do evento
             calendar_id: ID do calendário
+            user_id: Dono da agenda (fuso do evento e invalidação do cache de agendas)
             
         Returns:
             Dict contendo informações do evento criado ou erro
@@ -139,17 +340,21 @@ class CalendarService:
             }
         
         try:
+            # Fuso do evento: o do próprio horário, o do usuário ou o padrão
+            tz = start_time.tzinfo if isinstance(start_time.tzinfo, ZoneInfo) else \
+                self.cached_timezone(user_id) or date_resolver.default_timezone
+            
             # Monta o evento
             event = {
                 'summary': summary,
                 'description': description,
                 'start': {
                     'dateTime': start_time.isoformat(),
-                    'timeZone': 'America/Sao_Paulo',
+                    'timeZone': str(tz),
                 },
                 'end': {
                     'dateTime': end_time.isoformat(),
-                    'timeZone': 'America/Sao_Paulo',
+                    'timeZone': str(tz),
                 },
             }
             
@@ -165,6 +370,8 @@ class CalendarService:
             ).execute()
             
             logger.info(f"Evento criado com ID: {created_event.get('id')}")
+            if user_id:
+                self.invalidate_user(user_id)
             
             return {
                 "success": True,
@@ -184,42 +391,131 @@ class CalendarService:
                 "error": str(e)
             }
     
-    def format_events_for_speech(self, events: List[Dict[str, Any]]) -> str:
+    def watch_events(self, channel_id: str, address: str, token: str, ttl: float,
+                     calendar_id: str = 'primary') -> Dict[str, Any]:
+        """
+        Abre um canal de notificações push (events.watch) para mudanças no calendário
+        
+        Args:
+            channel_id: ID único do canal (escolhido por nós)
+            address: URL HTTPS pública do webhook /calendar/notify
+            token: Segredo devolvido pelo Google no cabeçalho X-Goog-Channel-Token
+            ttl: Tempo de vida pedido para o canal, em segundos
+            calendar_id: ID do calendário
+            
+        Returns:
+            Dict com resource_id e expiration (epoch em segundos) ou erro
+        """
+        if not self.service:
+            return {
+                "success": False,
+                "error": "Serviço não inicializado"
+            }
+        
+        try:
+            with self.breaker.call(is_failure=_is_upstream_failure):
+                channel = self.service.events().watch(
+                    calendarId=calendar_id,
+                    body={
+                        'id': channel_id,
+                        'type': 'web_hook',
+                        'address': address,
+                        'token': token,
+                        'params': {'ttl': str(int(ttl))}
+                    }
+                ).execute()
+            
+            logger.info(f"Canal de notificações {channel_id} aberto para o calendário {calendar_id}")
+            return {
+                "success": True,
+                "resource_id": channel.get('resourceId'),
+                "expiration": int(channel.get('expiration', 0)) / 1000.0
+            }
+            
+        except Exception as e:
+            logger.error(f"Erro ao abrir canal de notificações: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e)
+            }
+    
+    def stop_channel(self, channel_id: str, resource_id: str) -> bool:
+        """
+        Encerra um canal de notificações push (channels.stop)
+        
+        Args:
+            channel_id: ID do canal
+            resource_id: resourceId devolvido pelo events.watch
+            
+        Returns:
+            True se o canal foi encerrado (ou já não existia)
+        """
+        if not self.service:
+            return False
+        
+        try:
+            with self.breaker.call(is_failure=_is_upstream_failure):
+                self.service.channels().stop(body={'id': channel_id, 'resourceId': resource_id}).execute()
+            logger.info(f"Canal de notificações {channel_id} encerrado")
+            return True
+            
+        except Exception as e:
+            if _http_status(e) == 404:
+                return True
+            logger.error(f"Erro ao encerrar canal de notificações: {str(e)}")
+            return False
+    
+    def invalidate_user(self, user_id: str) -> int:
+        """
+        Descarta as agendas em cache de um usuário (ex: notificação de mudança no Calendar)
+        
+        Returns:
+            Número de entradas removidas
+        """
+        return self.events_cache.invalidate(lambda key: key[0] == user_id)
+    
+    def format_events_for_speech(self, events: List[Dict[str, Any]], ssml: bool = False) -> str:
         """
         Formata uma lista de eventos para síntese de fala
         
         Args:
             events: Lista de eventos
+            ssml: Se True, retorna conteúdo SSML (texto escapado, datas com say-as e pausas entre eventos)
             
         Returns:
             Texto formatado para fala
         """
+        text = ssml_markup.text if ssml else str
+        
         if not events:
             return "Você não tem eventos marcados para este período."
         
         if len(events) == 1:
             event = events[0]
             start = event.get('start', {})
-            summary = event.get('summary', 'Evento sem título')
+            summary = text(event.get('summary', 'Evento sem título'))
             
             # Extrai informações de data/hora
             start_time = ""
             if 'dateTime' in start:
                 dt = datetime.fromisoformat(start['dateTime'].replace('Z', '+00:00'))
-                start_time = f"às {dt.strftime('%H:%M')}"
+                start_time = f"às {ssml_markup.say_as_time(dt) if ssml else dt.strftime('%H:%M')}"
             elif 'date' in start:
                 start_time = "dia todo"
+                if ssml:
+                    start_time += f", {ssml_markup.say_as_date(date.fromisoformat(start['date']))}"
             
             return f"Você tem um evento: {summary} {start_time}."
         
         # Múltiplos eventos
+        separator = f"{ssml_markup.ITEM_BREAK} " if ssml else ""
         speech = f"Você tem {len(events)} eventos marcados: "
         for i, event in enumerate(events[:5]):  # Limita a 5 eventos para não ficar muito longo
-            summary = event.get('summary', 'Evento sem título')
+            summary = text(event.get('summary', 'Evento sem título'))
             if i == len(events) - 1:
-                speech += f"e {summary}."
+                speech += f"{separator}e {summary}."
             else:
-                speech += f"{summary}, "
+                speech += f"{separator}{summary}, "
         
         if len(events) > 5:
             speech += f" E mais {len(events) - 5} outros eventos."
@@ -231,25 +527,18 @@ class CalendarService:
         Converte texto de data falado para datetime
         
         Args:
-            date_text: Texto da data (ex: "hoje", "amanhã", "2024-01-15")
+            date_text: Texto da data (ex: "hoje", "amanhã", "2024-01-15", "2024-W03")
             
         Returns:
             Objeto datetime ou None se não conseguir converter
         """
+        resolved = date_resolver.resolve_date(date_text)
+        if resolved is not None:
+            return resolved.start
+        
         try:
-            now = datetime.now()
-            
-            if date_text.lower() in ['hoje', 'today']:
-                return now.replace(hour=0, minute=0, second=0, microsecond=0)
-            elif date_text.lower() in ['amanhã', 'tomorrow']:
-                return (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
-            elif date_text.lower() in ['ontem', 'yesterday']:
-                return (now - timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
-            else:
-                # Tenta converter formato ISO
-                return datetime.fromisoformat(date_text)
-                
+            # Data e hora em formato ISO
+            return datetime.fromisoformat(date_text)
         except Exception as e:
             logger.error(f"Erro ao converter data '{date_text}': {str(e)}")
             return None
-
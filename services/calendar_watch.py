@@ -0,0 +1,288 @@
+import hmac
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config.settings import config
+from services.metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+# Resultado do tratamento de uma notificação recebida em /calendar/notify
+NOTIFY_CHANGED = "changed"
+NOTIFY_SYNC = "sync"
+NOTIFY_UNKNOWN = "unknown"
+
+
+class WatchChannel:
+    """Canal de notificações push aberto no Google Calendar para um usuário"""
+
+    __slots__ = ("user_id", "channel_id", "resource_id", "token", "expiration")
+
+    def __init__(self, user_id: str, channel_id: str, resource_id: str, token: str, expiration: float):
+        self.user_id = user_id
+        self.channel_id = channel_id
+        self.resource_id = resource_id
+        self.token = token
+        self.expiration = expiration
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "WatchChannel":
+        return cls(**{name: data[name] for name in cls.__slots__})
+
+
+class CalendarWatchManager:
+    """
+    Canais de notificação push do Calendar (events.watch) das contas vinculadas
+
+    Cada usuário vinculado ganha um canal que aponta para o webhook
+    /calendar/notify (CALENDAR_WATCH_ADDRESS). Quando o Google avisa que a agenda
+    mudou, as agendas do usuário em cache são descartadas e on_change é chamado
+    (ex: recálculo da agenda pré-calculada), sem precisar consultar o Calendar a
+    cada requisição nem fazer polling.
+
+    Um agendador abre canais para usuários recém-vinculados e renova os que vencem
+    em menos de CALENDAR_WATCH_RENEW_MARGIN (o Google não renova canais: abre-se um
+    novo e o antigo é encerrado). Os canais são salvos em arquivo para sobreviver a
+    reinícios, já que continuam ativos no Google.
+
+    Um usuário cujo canal não abre (ex: 403 de domínio não verificado ou escopo
+    ausente) só é tentado de novo depois de uma espera que começa em tick e dobra a
+    cada falha seguida, até max_backoff: cada tentativa renova o token e gasta cota.
+    """
+
+    def __init__(self, calendar_service, oauth, address: Optional[str] = config.CALENDAR_WATCH_ADDRESS,
+                 ttl: float = config.CALENDAR_WATCH_TTL, renew_margin: float = config.CALENDAR_WATCH_RENEW_MARGIN,
+                 tick: float = config.CALENDAR_WATCH_TICK,
+                 max_backoff: float = config.CALENDAR_WATCH_MAX_BACKOFF, on_change: Optional[Callable[[str], None]] = None,
+                 filepath: str = "calendar_channels.json", clock: Callable[[], float] = time.time,
+                 registry: MetricsRegistry = metrics):
+        self.calendar_service = calendar_service
+        self.oauth = oauth
+        self.address = address
+        self.ttl = ttl
+        self.renew_margin = renew_margin
+        self.tick = tick
+        self.max_backoff = max_backoff
+        self.on_change = on_change
+        self.filepath = filepath
+        self.clock = clock
+        self.registry = registry
+
+        self._channels: Dict[str, WatchChannel] = {}
+        self._by_user: Dict[str, str] = {}
+        # user_id -> (falhas seguidas, instante a partir do qual pode tentar de novo)
+        self._failures: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        """Notificações push exigem um endereço HTTPS público configurado"""
+        return bool(self.address)
+
+    def channel_for(self, user_id: str) -> Optional[WatchChannel]:
+        """Canal ativo do usuário, se houver"""
+        with self._lock:
+            channel_id = self._by_user.get(user_id)
+            return self._channels.get(channel_id) if channel_id else None
+
+    def watch_user(self, user_id: str) -> bool:
+        """
+        Abre (ou renova) o canal de notificações do usuário
+
+        O canal anterior só é encerrado depois que o novo foi aberto, para não perder
+        notificações durante a troca.
+
+        Args:
+            user_id: ID do usuário
+
+        Returns:
+            True se o canal foi aberto
+        """
+        access_token = self.oauth.get_user_access_token(user_id)
+        if not access_token or not self.calendar_service.initialize_service(access_token):
+            self.registry.increment("calendar.watch.failures")
+            return False
+
+        channel_id = uuid.uuid4().hex
+        token = secrets.token_urlsafe(24)
+        result = self.calendar_service.watch_events(channel_id, self.address, token, self.ttl)
+        if not result["success"]:
+            self.registry.increment("calendar.watch.failures")
+            return False
+
+        channel = WatchChannel(user_id, channel_id, result["resource_id"], token,
+                               result["expiration"] or self.clock() + self.ttl)
+        with self._lock:
+            previous = self._channels.pop(self._by_user.get(user_id, ""), None)
+            self._channels[channel_id] = channel
+            self._by_user[user_id] = channel_id
+            self._failures.pop(user_id, None)
+        if previous is not None:
+            self.calendar_service.stop_channel(previous.channel_id, previous.resource_id)
+            self.registry.increment("calendar.watch.renewed")
+        else:
+            self.registry.increment("calendar.watch.opened")
+        self.save_channels()
+        return True
+
+    def unwatch_user(self, user_id: str) -> bool:
+        """
+        Encerra o canal do usuário (ex: antes de revogar o acesso, enquanto o token ainda vale)
+
+        Returns:
+            True se havia um canal
+        """
+        with self._lock:
+            channel = self._channels.pop(self._by_user.pop(user_id, ""), None)
+            self._failures.pop(user_id, None)
+        if channel is None:
+            return False
+
+        access_token = self.oauth.get_user_access_token(user_id)
+        if access_token and self.calendar_service.initialize_service(access_token):
+            self.calendar_service.stop_channel(channel.channel_id, channel.resource_id)
+        self.registry.increment("calendar.watch.stopped")
+        self.save_channels()
+        return True
+
+    def handle_notification(self, channel_id: str, token: str, resource_id: str, resource_state: str) -> str:
+        """
+        Trata uma notificação push do Google (cabeçalhos X-Goog-*)
+
+        Só consulta e altera estruturas em memória: pode rodar no event loop.
+
+        Args:
+            channel_id: X-Goog-Channel-ID
+            token: X-Goog-Channel-Token
+            resource_id: X-Goog-Resource-ID
+            resource_state: X-Goog-Resource-State ("sync", "exists" ou "not_exists")
+
+        Returns:
+            NOTIFY_CHANGED, NOTIFY_SYNC ou NOTIFY_UNKNOWN (canal desconhecido ou token inválido)
+        """
+        with self._lock:
+            channel = self._channels.get(channel_id)
+        if (channel is None or not hmac.compare_digest(channel.token.encode(), (token or "").encode())
+                or channel.resource_id != resource_id):
+            self.registry.increment("calendar.watch.rejected")
+            return NOTIFY_UNKNOWN
+
+        # Mensagem enviada na abertura do canal, sem mudança na agenda
+        if resource_state == "sync":
+            return NOTIFY_SYNC
+
+        removed = self.calendar_service.invalidate_user(channel.user_id)
+        if self.on_change is not None:
+            self.on_change(channel.user_id)
+        self.registry.increment("calendar.watch.notifications")
+        logger.info(f"Agenda de {channel.user_id} alterada: {removed} entradas descartadas do cache")
+        return NOTIFY_CHANGED
+
+    def due_users(self) -> List[str]:
+        """Usuários vinculados sem canal ou com canal perto de vencer, fora da espera após falhas"""
+        now = self.clock()
+        renew_before = now + self.renew_margin
+        with self._lock:
+            due = []
+            for user_id in list(self.oauth.user_tokens):
+                failure = self._failures.get(user_id)
+                if failure is not None and failure[1] > now:
+                    continue
+                channel = self._channels.get(self._by_user.get(user_id, ""))
+                if channel is None or channel.expiration < renew_before:
+                    due.append(user_id)
+            return due
+
+    def run_once(self) -> int:
+        """
+        Abre e renova os canais pendentes
+
+        Returns:
+            Número de canais abertos ou renovados
+        """
+        if not self.enabled:
+            return 0
+        return sum(1 for user_id in self.due_users() if self._watch_safely(user_id))
+
+    def start(self):
+        """Carrega os canais salvos e inicia o agendador (não faz nada sem CALENDAR_WATCH_ADDRESS)"""
+        if not self.enabled or self._thread is not None:
+            return
+        self.load_channels()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="calendar-watch-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Interrompe o agendador (os canais continuam ativos no Google)"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def save_channels(self):
+        """Salva os canais em arquivo (para persistência)"""
+        with self._lock:
+            data = [channel.to_dict() for channel in self._channels.values()]
+        try:
+            with open(self.filepath, 'w') as f:
+                json.dump(data, f, indent=2)
+        except Exception as e:
+            logger.error(f"Erro ao salvar canais de notificação: {str(e)}")
+
+    def load_channels(self):
+        """Carrega os canais salvos, descartando os já vencidos"""
+        try:
+            if not os.path.exists(self.filepath):
+                return
+            with open(self.filepath, 'r') as f:
+                data = json.load(f)
+            now = self.clock()
+            with self._lock:
+                for item in data:
+                    channel = WatchChannel.from_dict(item)
+                    if channel.expiration > now:
+                        self._channels[channel.channel_id] = channel
+                        self._by_user[channel.user_id] = channel.channel_id
+            logger.info(f"{len(self._channels)} canais de notificação carregados de {self.filepath}")
+        except Exception as e:
+            logger.error(f"Erro ao carregar canais de notificação: {str(e)}")
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Erro no agendador de canais de notificação: {str(e)}")
+            self._stop.wait(self.tick)
+
+    def _watch_safely(self, user_id: str) -> bool:
+        try:
+            if self.watch_user(user_id):
+                return True
+        except Exception as e:
+            logger.warning(f"Falha ao abrir canal de notificações de {user_id}: {str(e)}")
+            self.registry.increment("calendar.watch.failures")
+        self._back_off(user_id)
+        return False
+
+    def _back_off(self, user_id: str):
+        """Adia a próxima tentativa do usuário: tick, depois o dobro a cada falha seguida"""
+        with self._lock:
+            failures = self._failures.get(user_id, (0, 0.0))[0] + 1
+            delay = min(self.max_backoff, self.tick * 2 ** min(failures - 1, 32))
+            self._failures[user_id] = (failures, self.clock() + delay)
+        self.registry.increment("calendar.watch.backoff")
+        logger.info(f"Canal de notificações de {user_id}: {failures} falhas seguidas, "
+                    f"nova tentativa em {delay:.0f}s")
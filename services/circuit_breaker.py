@@ -0,0 +1,188 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterator, Optional
+
+from services.metrics import MetricsRegistry, metrics
+from services.traffic_recorder import record_upstream
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+# Valor numérico do estado publicado nas métricas
+_STATE_GAUGE = {STATE_CLOSED: 0, STATE_HALF_OPEN: 1, STATE_OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Chamada recusada porque o circuito do upstream está aberto"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuito {name} aberto (nova tentativa em {retry_after:.0f}s)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por upstream, baseado na taxa de falhas de uma janela deslizante
+
+    Chamadas com erro e chamadas mais lentas que slow_call_threshold contam como
+    falha. Com pelo menos min_calls na janela e taxa de falhas acima de
+    failure_rate_threshold o circuito abre: as chamadas falham imediatamente com
+    CircuitOpenError durante open_duration segundos. Depois disso o circuito fica
+    meio aberto e deixa passar até half_open_max_calls chamadas de teste; se todas
+    derem certo ele fecha, e qualquer falha o abre novamente.
+    """
+
+    def __init__(self, name: str, failure_rate_threshold: float = 0.5, slow_call_threshold: float = 5.0,
+                 window_size: int = 20, min_calls: int = 5, open_duration: float = 30.0,
+                 half_open_max_calls: int = 2, clock: Callable[[], float] = time.monotonic,
+                 registry: MetricsRegistry = metrics):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_threshold = slow_call_threshold
+        self.min_calls = min_calls
+        self.open_duration = open_duration
+        self.half_open_max_calls = half_open_max_calls
+        self.clock = clock
+        self.registry = registry
+
+        self.state = STATE_CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=window_size)
+        self._opened_at = 0.0
+        self._trials = 0
+        self._trial_successes = 0
+        self._lock = threading.Lock()
+        self._publish()
+
+    @property
+    def failure_rate(self) -> float:
+        """Fração de falhas na janela atual"""
+        return sum(self._outcomes) / len(self._outcomes) if self._outcomes else 0.0
+
+    def check(self):
+        """
+        Verificação barata, sem reservar chamada de teste: falha se o circuito estiver aberto
+
+        Raises:
+            CircuitOpenError: Se o circuito estiver aberto
+        """
+        if self.state == STATE_OPEN:
+            remaining = self._opened_at + self.open_duration - self.clock()
+            if remaining > 0:
+                self.registry.increment(f"{self.name}.circuit.rejected")
+                raise CircuitOpenError(self.name, remaining)
+
+    def before_call(self):
+        """
+        Autoriza uma chamada ao upstream (no estado meio aberto, reserva uma chamada de teste)
+
+        Toda chamada autorizada deve ser seguida de record_success() ou record_failure().
+
+        Raises:
+            CircuitOpenError: Se o circuito estiver aberto ou sem vagas de teste
+        """
+        with self._lock:
+            if self.state == STATE_OPEN:
+                remaining = self._opened_at + self.open_duration - self.clock()
+                if remaining > 0:
+                    self.registry.increment(f"{self.name}.circuit.rejected")
+                    raise CircuitOpenError(self.name, remaining)
+                self._transition(STATE_HALF_OPEN)
+
+            if self.state == STATE_HALF_OPEN:
+                if self._trials >= self.half_open_max_calls:
+                    self.registry.increment(f"{self.name}.circuit.rejected")
+                    raise CircuitOpenError(self.name, 0)
+                self._trials += 1
+
+    def record_success(self, latency: float = 0.0):
+        """Registra uma chamada concluída (chamadas lentas contam como falha)"""
+        if latency > self.slow_call_threshold:
+            self.registry.increment(f"{self.name}.circuit.slow_calls")
+            self.record_failure()
+            return
+
+        with self._lock:
+            if self.state == STATE_HALF_OPEN:
+                self._trial_successes += 1
+                if self._trial_successes >= self.half_open_max_calls:
+                    self._transition(STATE_CLOSED)
+            else:
+                self._outcomes.append(False)
+
+    def record_failure(self):
+        """Registra uma chamada com falha"""
+        with self._lock:
+            self.registry.increment(f"{self.name}.circuit.failures")
+            if self.state == STATE_HALF_OPEN:
+                self._transition(STATE_OPEN)
+                return
+
+            self._outcomes.append(True)
+            if (self.state == STATE_CLOSED and len(self._outcomes) >= self.min_calls
+                    and self.failure_rate >= self.failure_rate_threshold):
+                self._transition(STATE_OPEN)
+
+    @contextmanager
+    def call(self, is_failure: Optional[Callable[[Exception], bool]] = None) -> Iterator[None]:
+        """
+        Context manager: autoriza a chamada e registra sucesso (com latência) ou falha
+
+        Args:
+            is_failure: Decide se uma exceção indica problema no upstream (padrão: todas);
+                as demais (ex: token inválido de um usuário) não afetam o circuito
+        """
+        self.before_call()
+        start = self.clock()
+        try:
+            yield
+        except Exception as e:
+            record_upstream(self.name, self.clock() - start, ok=False)
+            if is_failure is None or is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success(self.clock() - start)
+            raise
+        latency = self.clock() - start
+        record_upstream(self.name, latency)
+        self.record_success(latency)
+
+    def _transition(self, state: str):
+        previous, self.state = self.state, state
+        self._trials = 0
+        self._trial_successes = 0
+        if state == STATE_OPEN:
+            self._opened_at = self.clock()
+            logger.warning(f"Circuito {self.name} aberto (taxa de falhas {self.failure_rate:.0%}); "
+                           f"chamadas recusadas por {self.open_duration:.0f}s")
+        elif state == STATE_CLOSED:
+            self._outcomes.clear()
+            logger.info(f"Circuito {self.name} fechado novamente")
+        self.registry.increment(f"{self.name}.circuit.transitions.{previous}_to_{state}")
+        self._publish()
+
+    def _publish(self):
+        self.registry.set_gauge(f"{self.name}.circuit.state", _STATE_GAUGE[self.state])
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def circuit_breaker_for(name: str, **kwargs) -> CircuitBreaker:
+    """
+    Retorna o circuit breaker compartilhado de um upstream ("gemini", "calendar", "oauth")
+
+    Os parâmetros só são usados na primeira chamada para o nome.
+    """
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name, **kwargs)
+        return breaker
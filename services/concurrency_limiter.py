@@ -0,0 +1,260 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Optional
+
+from services.metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+# Prioridades da fila de espera (menor valor é atendido primeiro). Trabalho em segundo
+# plano é o primeiro a ser descartado: com a fila cheia, perde o lugar para uma chamada
+# de maior prioridade
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BACKGROUND = 2
+
+# Resultado de uma chamada, usado para ajustar o limite (abandonada: só devolve a vaga)
+OUTCOME_SUCCESS = "success"
+OUTCOME_OVERLOAD = "overload"
+OUTCOME_ERROR = "error"
+OUTCOME_ABANDONED = "abandoned"
+
+
+class LoadShedError(Exception):
+    """Chamada descartada pelo limitador (fila cheia ou prazo da Alexa insuficiente)"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class Permit:
+    """Vaga concedida pelo limitador; o resultado da chamada é informado em outcome"""
+
+    __slots__ = ("started_at", "outcome")
+
+    def __init__(self, started_at: float):
+        self.started_at = started_at
+        self.outcome = OUTCOME_SUCCESS
+
+
+class _Waiter:
+    __slots__ = ("priority", "event", "granted", "cancelled")
+
+    def __init__(self, priority: int):
+        self.priority = priority
+        self.event = threading.Event()
+        self.granted = False
+        self.cancelled = False
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Limitador de concorrência adaptativo (AIMD guiado por latência)
+
+    O limite cresce de forma aditiva (+1/limite por chamada bem-sucedida com o
+    limitador cheio) e cai de forma multiplicativa quando a latência passa de
+    latency_tolerance vezes a latência base observada, ou bem mais forte quando o
+    upstream sinaliza sobrecarga (429/503/timeout).
+
+    Chamadas acima do limite aguardam numa fila limitada, ordenada por prioridade.
+    Se a espera estimada não couber no prazo da requisição, a chamada é descartada
+    imediatamente (LoadShedError) para que a Alexa receba a fala de contingência a
+    tempo, em vez de uma resposta lenta que falharia de qualquer forma. Com a fila
+    cheia, uma chamada ao vivo descarta a chamada PRIORITY_BACKGROUND mais recente
+    da fila e fica com o lugar dela.
+    """
+
+    def __init__(self, name: str, initial_limit: int = 4, min_limit: int = 1, max_limit: int = 32,
+                 max_queue: int = 64, latency_tolerance: float = 2.0, backoff_ratio: float = 0.9,
+                 overload_backoff_ratio: float = 0.5, initial_latency: float = 1.0,
+                 clock: Callable[[], float] = time.monotonic, registry: MetricsRegistry = metrics):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.latency_tolerance = latency_tolerance
+        self.backoff_ratio = backoff_ratio
+        self.overload_backoff_ratio = overload_backoff_ratio
+        self.clock = clock
+        self.registry = registry
+
+        self.limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self.in_flight = 0
+        # Média móvel da latência (estimativa de espera) e latência base sem carga
+        self.latency_estimate = initial_latency
+        self.baseline_latency: Optional[float] = None
+        self._decreased_at = float("-inf")
+
+        self._lock = threading.Lock()
+        self._waiters: List[tuple] = []
+        self._queued = 0
+        self._sequence = itertools.count()
+        self._publish()
+
+    @property
+    def queued(self) -> int:
+        """Número de chamadas aguardando vaga"""
+        return self._queued
+
+    def acquire(self, priority: int = PRIORITY_NORMAL, deadline: Optional[float] = None) -> Permit:
+        """
+        Obtém uma vaga para chamar o upstream
+
+        Args:
+            priority: PRIORITY_HIGH, PRIORITY_NORMAL ou PRIORITY_BACKGROUND
+            deadline: Instante (no relógio do limitador) até o qual a resposta precisa estar pronta
+
+        Returns:
+            Permit a ser devolvido com release()
+
+        Raises:
+            LoadShedError: Se a fila estiver cheia ou a espera não couber no prazo
+        """
+        with self._lock:
+            if self.in_flight < int(self.limit) and not self._queued:
+                return self._grant()
+
+            if self._queued >= self.max_queue and not self._evict_background(priority):
+                self._shed("fila cheia")
+            if deadline is not None:
+                ahead = sum(1 for _, _, w in self._waiters if not w.cancelled and w.priority <= priority)
+                if self.clock() + self._estimated_wait(ahead) + self.latency_estimate > deadline:
+                    self._shed("prazo insuficiente")
+
+            waiter = _Waiter(priority)
+            heapq.heappush(self._waiters, (priority, next(self._sequence), waiter))
+            self._queued += 1
+            self._publish()
+            wait_timeout = None if deadline is None else max(0.0, deadline - self.clock() - self.latency_estimate)
+
+        queued_at = self.clock()
+        waiter.event.wait(wait_timeout)
+
+        with self._lock:
+            self.registry.observe(f"{self.name}.limiter.queue_wait_seconds", self.clock() - queued_at)
+            if waiter.granted:
+                return Permit(self.clock())
+            if waiter.cancelled:
+                self._shed("lugar na fila cedido a chamada prioritária")
+            # Prazo esgotado na fila: a vaga não será mais concedida a este waiter
+            waiter.cancelled = True
+            self._queued -= 1
+            self._shed("prazo esgotado na fila")
+
+    def try_acquire(self) -> Optional[Permit]:
+        """
+        Obtém uma vaga só se houver uma livre agora, sem entrar na fila (ex: cópia de hedge,
+        que não deve tirar a vez de chamadas aguardando)
+
+        Returns:
+            Permit a ser devolvido com release(), ou None se o limitador estiver cheio
+        """
+        with self._lock:
+            if self.in_flight < int(self.limit) and not self._queued:
+                return self._grant()
+            return None
+
+    def release(self, permit: Permit):
+        """Devolve a vaga e ajusta o limite de acordo com a latência e o resultado da chamada"""
+        latency = self.clock() - permit.started_at
+        with self._lock:
+            self.in_flight -= 1
+
+            if permit.outcome == OUTCOME_OVERLOAD:
+                self._decrease(self.overload_backoff_ratio)
+                self.registry.increment(f"{self.name}.limiter.overload")
+            elif permit.outcome == OUTCOME_SUCCESS:
+                self.registry.observe(f"{self.name}.latency_seconds", latency)
+                self.latency_estimate += 0.2 * (latency - self.latency_estimate)
+                if self.baseline_latency is None or latency < self.baseline_latency:
+                    self.baseline_latency = latency
+                else:
+                    # A base acompanha lentamente mudanças permanentes do upstream
+                    self.baseline_latency += 0.01 * (latency - self.baseline_latency)
+
+                if latency > self.baseline_latency * self.latency_tolerance:
+                    self._decrease(self.backoff_ratio)
+                elif self.in_flight + 1 >= int(self.limit):
+                    # Só cresce quando o limite atual está de fato sendo usado
+                    self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+            self._grant_waiters()
+            self._publish()
+
+    @contextmanager
+    def slot(self, priority: int = PRIORITY_NORMAL, deadline: Optional[float] = None) -> Iterator[Permit]:
+        """
+        Context manager em torno de acquire()/release()
+
+        Exceções não tratadas dentro do bloco contam como erro (não ajustam o limite),
+        a menos que o chamador já tenha marcado permit.outcome como sobrecarga.
+        """
+        permit = self.acquire(priority, deadline)
+        try:
+            yield permit
+        except BaseException:
+            if permit.outcome == OUTCOME_SUCCESS:
+                permit.outcome = OUTCOME_ERROR
+            raise
+        finally:
+            self.release(permit)
+
+    def _grant(self) -> Permit:
+        self.in_flight += 1
+        self._publish()
+        return Permit(self.clock())
+
+    def _grant_waiters(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            _, _, waiter = heapq.heappop(self._waiters)
+            if waiter.cancelled:
+                continue
+            waiter.granted = True
+            self._queued -= 1
+            self.in_flight += 1
+            waiter.event.set()
+
+    def _evict_background(self, priority: int) -> bool:
+        """Tira da fila a chamada em segundo plano mais recente para dar lugar a uma de maior prioridade"""
+        if priority >= PRIORITY_BACKGROUND:
+            return False
+        queued = [(sequence, waiter) for waiter_priority, sequence, waiter in self._waiters
+                  if waiter_priority >= PRIORITY_BACKGROUND and not waiter.cancelled]
+        if not queued:
+            return False
+        _, waiter = max(queued, key=lambda entry: entry[0])
+        waiter.cancelled = True
+        self._queued -= 1
+        waiter.event.set()
+        return True
+
+    def _decrease(self, ratio: float):
+        # No máximo uma redução por janela de latência: várias falhas da mesma
+        # rajada refletem um único episódio de sobrecarga (como no TCP, uma vez por RTT)
+        now = self.clock()
+        if now - self._decreased_at < self.latency_estimate:
+            return
+        self._decreased_at = now
+        self.limit = max(float(self.min_limit), self.limit * ratio)
+
+    def _estimated_wait(self, ahead: int) -> float:
+        """Tempo estimado até a vaga de quem tem `ahead` chamadas na frente"""
+        return (ahead // max(1, int(self.limit)) + (1 if self.in_flight >= int(self.limit) else 0)) \
+            * self.latency_estimate
+
+    def _shed(self, reason: str):
+        self.registry.increment(f"{self.name}.limiter.shed")
+        self._publish()
+        logger.warning(f"Chamada ao {self.name} descartada pelo limitador: {reason} "
+                       f"(limite={int(self.limit)}, em andamento={self.in_flight}, fila={self._queued})")
+        raise LoadShedError(reason)
+
+    def _publish(self):
+        self.registry.set_gauge(f"{self.name}.limiter.limit", int(self.limit))
+        self.registry.set_gauge(f"{self.name}.limiter.in_flight", self.in_flight)
+        self.registry.set_gauge(f"{self.name}.limiter.queued", self._queued)
@@ -0,0 +1,283 @@
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta, tzinfo
+from typing import Callable, Dict, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from config.settings import config
+
+logger = logging.getLogger(__name__)
+
+# Palavras relativas ao dia de hoje (valores falados e sinônimos)
+RELATIVE_DAYS: Dict[str, int] = {
+    "hoje": 0, "today": 0, "hj": 0,
+    "amanhã": 1, "amanha": 1, "tomorrow": 1,
+    "depois de amanhã": 2, "depois de amanha": 2,
+    "ontem": -1, "yesterday": -1,
+}
+
+# Valores do PeriodoSlot (e sinônimos): (unidade, deslocamento a partir da atual)
+PERIODS: Dict[str, Tuple[str, int]] = {
+    "esta semana": ("week", 0), "essa semana": ("week", 0), "semana": ("week", 0),
+    "próxima semana": ("week", 1), "proxima semana": ("week", 1), "semana que vem": ("week", 1),
+    "este mês": ("month", 0), "esse mês": ("month", 0), "este mes": ("month", 0), "mês": ("month", 0),
+    "próximo mês": ("month", 1), "proximo mes": ("month", 1), "mês que vem": ("month", 1),
+    "fim de semana": ("weekend", 0), "este fim de semana": ("weekend", 0),
+    "próximo fim de semana": ("weekend", 1), "fim de semana que vem": ("weekend", 1),
+}
+
+# Estações do AMAZON.DATE ("2026-WI"), em meses de início e duração (hemisfério norte, como a Alexa)
+SEASONS: Dict[str, Tuple[int, int]] = {"SP": (3, 3), "SU": (6, 3), "FA": (9, 3), "WI": (12, 3)}
+
+MIDNIGHT = datetime.min.time()
+
+# Entradas memorizadas por tabela diária (valores distintos pedidos num mesmo dia)
+MAX_TABLE_ENTRIES = 512
+
+
+class DateRange:
+    """Intervalo [start, end) de datas locais do usuário (meia-noite no fuso do usuário, com fuso)"""
+
+    __slots__ = ("start", "end", "label", "days_ahead")
+
+    def __init__(self, start: datetime, end: datetime, label: str, days_ahead: Optional[int] = None):
+        self.start = start
+        self.end = end
+        # Trecho da fala ("para hoje", "para esta semana")
+        self.label = label
+        # Para um único dia: distância em dias a partir de hoje (0 hoje, 1 amanhã)
+        self.days_ahead = days_ahead
+
+    def __repr__(self) -> str:
+        return f"DateRange({self.start.isoformat()}, {self.end.isoformat()}, {self.label!r})"
+
+
+def _month_start(year: int, month: int) -> date:
+    """Primeiro dia do mês, aceitando meses fora de 1..12 (ex: 13 = janeiro do ano seguinte)"""
+    year += (month - 1) // 12
+    return date(year, (month - 1) % 12 + 1, 1)
+
+
+def parse_amazon_date(value: str, today: date) -> Optional[Tuple[date, date, bool]]:
+    """
+    Converte um valor do slot AMAZON.DATE em (início, fim exclusivo, é um único dia)
+
+    Formatos: "2026-10-19", "2026-W42", "2026-W42-WE", "2026-WE", "2026-10", "2026-10-XX",
+    "2026", "202X" (década), "2026-WI" (estação), "XXXX-10-19" (próxima ocorrência)
+    e "PRESENT_REF".
+
+    Returns:
+        Tupla ou None se o valor não pertencer à gramática
+    """
+    if value == "PRESENT_REF":
+        return today, today + timedelta(days=1), True
+
+    parts = value.split("-")
+    year_text = parts[0]
+    try:
+        if len(year_text) != 4:
+            return None
+        if year_text == "XXXX":
+            year = None
+        elif year_text.endswith("X"):
+            # Década ("202X")
+            if len(parts) != 1:
+                return None
+            decade = int(year_text[:3]) * 10
+            return date(decade, 1, 1), date(decade + 10, 1, 1), False
+        else:
+            year = int(year_text)
+
+        if len(parts) == 1:
+            if year is None:
+                return None
+            return date(year, 1, 1), date(year + 1, 1, 1), False
+
+        unit = parts[1]
+        if unit == "WE" and len(parts) == 2:
+            # Fim de semana sem semana indicada: o desta semana (ou o próximo, se já passou)
+            weekend = today + timedelta(days=5 - today.weekday())
+            if weekend.year != year:
+                return None
+            return weekend, weekend + timedelta(days=2), False
+        if unit.startswith("W") and len(unit) > 1 and unit[1:].isdigit():
+            week_start = date.fromisocalendar(year or today.isocalendar()[0], int(unit[1:]), 1)
+            if len(parts) == 3 and parts[2] == "WE":
+                weekend = week_start + timedelta(days=5)
+                return weekend, weekend + timedelta(days=2), False
+            if len(parts) == 2:
+                return week_start, week_start + timedelta(days=7), False
+            return None
+
+        if unit in SEASONS:
+            if len(parts) != 2:
+                return None
+            month, length = SEASONS[unit]
+            start = _month_start(year or today.year, month)
+            return start, _month_start(start.year, month + length), False
+
+        month = int(unit)
+        if len(parts) == 2 or (len(parts) == 3 and parts[2] == "XX"):
+            start = _month_start(year or today.year, month)
+            return start, _month_start(start.year, month + 1), False
+
+        if len(parts) == 3:
+            day = date(year or today.year, month, int(parts[2]))
+            if year is None and day < today:
+                # Sem ano: a próxima ocorrência da data
+                day = day.replace(year=day.year + 1)
+            return day, day + timedelta(days=1), True
+    except ValueError:
+        return None
+    return None
+
+
+class _DayTable:
+    """Intervalos já resolvidos para um fuso num dia (recriada na virada do dia)"""
+
+    __slots__ = ("today", "tz", "midnight", "expires_at", "entries")
+
+    def __init__(self, today: date, tz: tzinfo):
+        self.today = today
+        self.tz = tz
+        self.midnight = datetime.combine(today, MIDNIGHT, tzinfo=tz)
+        # Próxima meia-noite no fuso (epoch): até lá a tabela vale sem consultar o relógio do fuso
+        self.expires_at = datetime.combine(today + timedelta(days=1), MIDNIGHT, tzinfo=tz).timestamp()
+        self.entries: Dict[str, Optional[DateRange]] = {}
+
+
+class DateResolver:
+    """
+    Resolve os slots de data (AMAZON.DATE) e período (PeriodoSlot) em intervalos de consulta
+
+    Para cada fuso é mantida uma tabela do dia atual com os valores relativos
+    ("hoje", "amanhã", "esta semana"...) já calculados; valores do AMAZON.DATE
+    são calculados na primeira vez e memorizados na mesma tabela. Resolver um
+    slot é uma consulta a dicionário; a tabela é recriada na virada do dia.
+
+    Intervalos de várias datas que contêm hoje começam hoje: "o que tenho esta
+    semana" não precisa dos compromissos que já passaram.
+    """
+
+    def __init__(self, default_timezone: str = config.DEFAULT_TIMEZONE,
+                 now: Callable[[tzinfo], datetime] = datetime.now):
+        self.default_timezone = zone(default_timezone)
+        self.now = now
+        self._tables: Dict[str, _DayTable] = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, data: Optional[str], periodo: Optional[str], tz: Optional[tzinfo] = None) -> DateRange:
+        """
+        Intervalo da consulta à agenda a partir dos slots data e periodo (padrão: hoje)
+
+        Args:
+            data: Valor do slot AMAZON.DATE
+            periodo: Valor (resolvido) do PeriodoSlot
+            tz: Fuso do usuário (padrão: DEFAULT_TIMEZONE)
+
+        Returns:
+            Intervalo resolvido
+        """
+        table = self._table(tz)
+        if data:
+            resolved = self._lookup(table, data, f"para {data}")
+            if resolved is not None:
+                return resolved
+        if periodo:
+            resolved = self._lookup(table, periodo, f"para {periodo}")
+            if resolved is not None:
+                return resolved
+            # Período desconhecido: os próximos 7 dias
+            end = datetime.combine(table.today + timedelta(days=7), MIDNIGHT, tzinfo=table.tz)
+            return DateRange(table.midnight, end, f"para {periodo}")
+        return table.entries["hoje"]
+
+    def resolve_date(self, value: str, tz: Optional[tzinfo] = None) -> Optional[DateRange]:
+        """Intervalo de um único valor de data ("amanhã", "2026-W42"...) ou None se não reconhecido"""
+        return self._lookup(self._table(tz), value, f"para {value}")
+
+    def today(self, tz: Optional[tzinfo] = None) -> date:
+        """Data de hoje no fuso"""
+        return self._table(tz).today
+
+    def _lookup(self, table: _DayTable, value: str, label: str) -> Optional[DateRange]:
+        entries = table.entries
+        resolved = entries.get(value)
+        if resolved is not None or value in entries:
+            return resolved
+
+        key = " ".join(value.lower().split())
+        resolved = entries.get(key)
+        if resolved is None and key not in entries:
+            parsed = parse_amazon_date(value.strip(), table.today)
+            resolved = self._range(table, parsed, label) if parsed else None
+        if len(entries) < MAX_TABLE_ENTRIES:
+            entries[value] = resolved
+        return resolved
+
+    def _table(self, tz: Optional[tzinfo]) -> _DayTable:
+        tz = tz or self.default_timezone
+        key = str(tz)
+        table = self._tables.get(key)
+        if table is None or time.time() >= table.expires_at:
+            today = self.now(tz).date()
+            if table is None or table.today != today:
+                table = self._build_table(today, tz)
+                with self._lock:
+                    self._tables[key] = table
+        return table
+
+    def _build_table(self, today: date, tz: tzinfo) -> _DayTable:
+        table = _DayTable(today, tz)
+        labels = {0: "para hoje", 1: "para amanhã", -1: "para ontem", 2: "para depois de amanhã"}
+        for word, offset in RELATIVE_DAYS.items():
+            day = today + timedelta(days=offset)
+            table.entries[word] = self._range(table, (day, day + timedelta(days=1), True), labels[offset])
+
+        week_start = today - timedelta(days=today.weekday())
+        month_start = today.replace(day=1)
+        for word, (unit, offset) in PERIODS.items():
+            if unit == "week":
+                start = week_start + timedelta(weeks=offset)
+                end = start + timedelta(days=7)
+            elif unit == "weekend":
+                start = week_start + timedelta(weeks=offset, days=5)
+                end = start + timedelta(days=2)
+            else:
+                start = _month_start(month_start.year, month_start.month + offset)
+                end = _month_start(start.year, start.month + 1)
+            table.entries[word] = self._range(table, (start, end, False), f"para {word}")
+        return table
+
+    @staticmethod
+    def _range(table: _DayTable, parsed: Tuple[date, date, bool], label: str) -> DateRange:
+        start, end, single_day = parsed
+        if not single_day and start < table.today < end:
+            start = table.today
+        return DateRange(
+            datetime.combine(start, MIDNIGHT, tzinfo=table.tz),
+            datetime.combine(end, MIDNIGHT, tzinfo=table.tz),
+            label,
+            days_ahead=(start - table.today).days if single_day else None
+        )
+
+
+_zones: Dict[str, tzinfo] = {}
+
+
+def zone(name: Optional[str]) -> Optional[tzinfo]:
+    """ZoneInfo pelo nome IANA ("America/Sao_Paulo"), ou None se o nome for inválido"""
+    if not name:
+        return None
+    tz = _zones.get(name)
+    if tz is None:
+        try:
+            tz = _zones[name] = ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            logger.warning(f"Fuso horário desconhecido: {name}")
+            return None
+    return tz
+
+
+date_resolver = DateResolver()
@@ -0,0 +1,232 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime, tzinfo
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from config.settings import config
+from services.metrics import MetricsRegistry, metrics
+from services.semantic_cache import fold_words
+
+logger = logging.getLogger(__name__)
+
+# Palavras sem conteúdo para o casamento com o FAQ (artigos, preposições, vocativos)
+FAQ_STOPWORDS = frozenset(
+    "a o as os um uma de do da dos das no na nos nas em e ao aos por favor alexa me diga fala".split()
+)
+
+WEEKDAYS = ("segunda-feira", "terça-feira", "quarta-feira", "quinta-feira", "sexta-feira", "sábado", "domingo")
+MONTHS = ("janeiro", "fevereiro", "março", "abril", "maio", "junho", "julho", "agosto", "setembro",
+          "outubro", "novembro", "dezembro")
+
+
+def faq_terms(text: str) -> List[str]:
+    """Termos de uma pergunta para o índice do FAQ"""
+    return [word for word in fold_words(text) if word not in FAQ_STOPWORDS]
+
+
+def render_answer(template: str, now: datetime) -> str:
+    """Preenche {hora}, {data} e {dia_semana} de uma resposta do FAQ"""
+    return template.format(
+        hora=f"{now:%H:%M}",
+        data=f"{now.day} de {MONTHS[now.month - 1]} de {now.year}",
+        dia_semana=WEEKDAYS[now.weekday()]
+    )
+
+
+class FaqEntry:
+    """Pergunta frequente: variações da pergunta e a resposta (com marcadores opcionais)"""
+
+    __slots__ = ("id", "questions", "answer", "dynamic", "vocabulary")
+
+    def __init__(self, id: str, questions: List[str], answer: str):
+        self.id = id
+        self.questions = questions
+        self.answer = answer
+        # Respostas com {hora}/{data}/{dia_semana} são preenchidas a cada pergunta
+        self.dynamic = "{" in answer
+        # Termos das variações: perguntas dinâmicas com qualquer outro termo não casam
+        self.vocabulary = frozenset(term for question in questions for term in faq_terms(question))
+
+
+class FaqIndex:
+    """
+    Índice TF-IDF das variações de pergunta do FAQ
+
+    Perguntas idênticas a uma variação (depois da normalização) são uma consulta a
+    dicionário; as demais somam os pesos do índice invertido só dos termos da
+    pergunta e usam similaridade de cosseno. Termos desconhecidos pesam como os mais
+    raros do índice, para que "o que é esta skill de culinária" não case com "o que
+    é esta skill". Respostas dinâmicas (hora, data) exigem que todos os termos da
+    pergunta estejam nas variações da entrada: "que horas são em tóquio" ou "qual
+    o horário do jogo" perguntam outra coisa e seguem ao Gemini.
+    """
+
+    def __init__(self, entries: List[FaqEntry], min_score: float = 0.7):
+        self.entries = entries
+        self.min_score = min_score
+        self.exact: Dict[str, FaqEntry] = {}
+        # termo -> [(índice da variação, peso normalizado)]
+        self.postings: Dict[str, List[Tuple[int, float]]] = {}
+        self.variants: List[FaqEntry] = []
+
+        documents = []
+        for entry in entries:
+            for question in entry.questions:
+                terms = faq_terms(question)
+                if terms:
+                    self.exact.setdefault(" ".join(terms), entry)
+                    documents.append(terms)
+                    self.variants.append(entry)
+
+        frequency: Dict[str, int] = {}
+        for terms in documents:
+            for term in set(terms):
+                frequency[term] = frequency.get(term, 0) + 1
+        count = len(documents)
+        self.idf = {term: math.log((1 + count) / (1 + df)) + 1.0 for term, df in frequency.items()}
+        self.unknown_idf = math.log(1 + count) + 1.0
+
+        for index, terms in enumerate(documents):
+            weights = self._weights(terms)
+            norm = math.sqrt(sum(w * w for w in weights.values()))
+            for term, weight in weights.items():
+                self.postings.setdefault(term, []).append((index, weight / norm))
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _weights(self, terms: List[str]) -> Dict[str, float]:
+        weights: Dict[str, float] = {}
+        for term in terms:
+            weights[term] = weights.get(term, 0.0) + self.idf.get(term, self.unknown_idf)
+        return weights
+
+    def match(self, question: str) -> Optional[Tuple[FaqEntry, float]]:
+        """
+        Pergunta do FAQ equivalente à do usuário
+
+        Args:
+            question: Pergunta do usuário
+
+        Returns:
+            (entrada, similaridade) ou None se nenhuma passar de min_score
+        """
+        terms = faq_terms(question)
+        if not terms:
+            return None
+        entry = self.exact.get(" ".join(terms))
+        if entry is not None:
+            return entry, 1.0
+
+        weights = self._weights(terms)
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        scores: Dict[int, float] = {}
+        for term, weight in weights.items():
+            for index, doc_weight in self.postings.get(term, ()):
+                scores[index] = scores.get(index, 0.0) + weight * doc_weight
+        if not scores:
+            return None
+        index = max(scores, key=scores.get)
+        score = scores[index] / norm
+        if score < self.min_score:
+            return None
+        entry = self.variants[index]
+        if entry.dynamic and not entry.vocabulary.issuperset(terms):
+            return None
+        return entry, score
+
+    @classmethod
+    def load(cls, filepath: str, min_score: float = 0.7) -> "FaqIndex":
+        """Lê o arquivo do FAQ (lista de {"id", "questions", "answer"}) e monta o índice"""
+        with open(filepath, encoding="utf-8") as f:
+            items: List[Dict[str, Any]] = json.load(f)
+        entries = [FaqEntry(item.get("id", str(i)), list(item["questions"]), item["answer"])
+                   for i, item in enumerate(items)]
+        return cls(entries, min_score)
+
+
+class FaqService:
+    """
+    Respostas locais para perguntas frequentes, antes de chamar o Gemini
+
+    O índice é montado na inicialização e remontado quando o arquivo muda (a data
+    de modificação é verificada no máximo a cada reload_interval segundos, durante
+    as consultas): basta editar o arquivo, sem reiniciar o serviço. Um arquivo
+    inválido mantém o índice anterior.
+    """
+
+    def __init__(self, filepath: str = config.FAQ_FILE, min_score: float = config.FAQ_MIN_SCORE,
+                 reload_interval: float = config.FAQ_RELOAD_INTERVAL, clock: Callable[[], float] = time.monotonic,
+                 registry: MetricsRegistry = metrics):
+        self.filepath = filepath
+        self.min_score = min_score
+        self.reload_interval = reload_interval
+        self.clock = clock
+        self.metrics = registry
+        self.index = FaqIndex([], min_score)
+        self._mtime: Optional[float] = None
+        self._checked_at = -math.inf
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self) -> bool:
+        """
+        Remonta o índice se o arquivo mudou desde a última carga
+
+        Returns:
+            True se um novo índice foi carregado
+        """
+        with self._lock:
+            self._checked_at = self.clock()
+            try:
+                mtime = os.stat(self.filepath).st_mtime
+            except OSError:
+                if self._mtime is None:
+                    logger.warning(f"Arquivo do FAQ não encontrado: {self.filepath}")
+                    self._mtime = -math.inf
+                return False
+            if mtime == self._mtime:
+                return False
+            try:
+                index = FaqIndex.load(self.filepath, self.min_score)
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logger.error(f"Erro ao carregar o FAQ de {self.filepath}: {str(e)}")
+                self._mtime = mtime
+                return False
+            self.index = index
+            self._mtime = mtime
+            self.metrics.set_gauge("faq.entries", len(index))
+            logger.info(f"FAQ carregado de {self.filepath}: {len(index)} perguntas")
+            return True
+
+    def answer(self, question: str, tz: Union[tzinfo, Callable[[], tzinfo], None] = None) -> Optional[str]:
+        """
+        Resposta do FAQ para a pergunta, ou None para seguir ao Gemini
+
+        Args:
+            question: Pergunta do usuário
+            tz: Fuso (ou função que o obtém, chamada só para respostas com data/hora)
+
+        Returns:
+            Texto da resposta ou None
+        """
+        if self.clock() - self._checked_at >= self.reload_interval:
+            self.reload()
+
+        match = self.index.match(question)
+        if match is None:
+            self.metrics.increment("faq.misses")
+            return None
+        entry, score = match
+        self.metrics.increment("faq.hits")
+        self.metrics.observe("faq.match_score", score)
+        self.metrics.increment(f"faq.hits.{entry.id}")
+        if not entry.dynamic:
+            return entry.answer
+        if callable(tz):
+            tz = tz()
+        return render_answer(entry.answer, datetime.now(tz))
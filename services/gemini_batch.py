@@ -0,0 +1,90 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# Estados de um job em lote (os mesmos nomes da Batch API do Gemini)
+BATCH_PENDING = "BATCH_STATE_PENDING"
+BATCH_RUNNING = "BATCH_STATE_RUNNING"
+BATCH_SUCCEEDED = "BATCH_STATE_SUCCEEDED"
+BATCH_FAILED = "BATCH_STATE_FAILED"
+BATCH_CANCELLED = "BATCH_STATE_CANCELLED"
+BATCH_EXPIRED = "BATCH_STATE_EXPIRED"
+TERMINAL_STATES = frozenset((BATCH_SUCCEEDED, BATCH_FAILED, BATCH_CANCELLED, BATCH_EXPIRED))
+
+# Como o job é executado: um job da Batch API ou chamadas concorrentes limitadas
+MODE_BATCH = "batch"
+MODE_PIPELINE = "pipeline"
+
+
+class BatchItem:
+    """Pergunta de um job em lote (mesmos parâmetros de generate_content)"""
+
+    __slots__ = ("prompt", "context", "max_speech_chars")
+
+    def __init__(self, prompt: str, context: Optional[str] = None, max_speech_chars: Optional[int] = None):
+        self.prompt = prompt
+        self.context = context
+        self.max_speech_chars = max_speech_chars
+
+
+class BatchJob:
+    """
+    Job de geração em segundo plano (resumos da agenda, perguntas em alta, aquecimento do cache)
+
+    results[i] recebe o resultado de items[i], no mesmo formato de generate_content,
+    assim que ele fica pronto; o job termina em um dos TERMINAL_STATES. Um job
+    concluído (BATCH_SUCCEEDED) pode ter itens com erro: o job falha só quando
+    nenhum resultado pôde ser obtido.
+    """
+
+    def __init__(self, name: str, items: List[BatchItem], mode: str, model: str):
+        self.name = name
+        self.items = items
+        self.mode = mode
+        self.model = model
+        self.state = BATCH_PENDING
+        self.error: Optional[str] = None
+        self.results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        self.created_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self._finished = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.state in TERMINAL_STATES
+
+    @property
+    def completed(self) -> int:
+        """Itens com resultado (sucesso ou erro)"""
+        return sum(result is not None for result in self.results)
+
+    @property
+    def succeeded(self) -> int:
+        """Itens respondidos pelo Gemini"""
+        return sum(result is not None and result["success"] for result in self.results)
+
+    def finish(self, state: str, error: Optional[str] = None):
+        """Marca o job como terminado"""
+        self.state = state
+        self.error = error
+        self.finished_at = time.monotonic()
+        self._finished.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Espera o job terminar (True se terminou dentro do prazo)"""
+        return self._finished.wait(timeout)
+
+    def status(self) -> Dict[str, Any]:
+        """Resumo do job para logs e monitoração"""
+        elapsed = (self.finished_at or time.monotonic()) - self.created_at
+        return {
+            "name": self.name,
+            "mode": self.mode,
+            "model": self.model,
+            "state": self.state,
+            "total": len(self.items),
+            "completed": self.completed,
+            "succeeded": self.succeeded,
+            "elapsed_seconds": round(elapsed, 3),
+            "error": self.error
+        }
@@ -1,33 +1,556 @@
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import logging
-from typing import Dict, Any, Optional, List
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
+from typing import Dict, Any, Optional, List, Sequence, Union
 from config.settings import config
+from services.concurrency_limiter import (
+    AdaptiveConcurrencyLimiter, LoadShedError, OUTCOME_ABANDONED, OUTCOME_ERROR, OUTCOME_OVERLOAD,
+    PRIORITY_BACKGROUND, PRIORITY_NORMAL, Permit
+)
+from services.cache import TTLCache
+from services.circuit_breaker import STATE_CLOSED, CircuitOpenError, circuit_breaker_for
+from services.gemini_batch import (
+    BATCH_FAILED, BATCH_PENDING, BATCH_RUNNING, BATCH_SUCCEEDED, MODE_BATCH, MODE_PIPELINE, TERMINAL_STATES,
+    BatchItem, BatchJob
+)
+from services.metrics import metrics
+from services.model_router import ModelRouter, TIER_DEFAULT, TIER_DETAILED, TIER_FAST
+from services.rate_limiter import parse_retry_after, token_bucket_for
+from services.semantic_cache import HashingEmbedder, SemanticAnswerCache
+from services.traffic_recorder import upstream_timer
+from services.speech_formatter import speech_formatter
 
 logger = logging.getLogger(__name__)
 
+# Fala de contingência quando a chamada é descartada por excesso de carga
+OVERLOAD_RESPONSE = "Estou recebendo muitas perguntas agora. Tente novamente em alguns instantes."
+
+# Fala quando o circuito do Gemini está aberto e não há resposta em cache
+UNAVAILABLE_RESPONSE = "O Gemini está indisponível no momento. Tente novamente em alguns minutos."
+
+# Status HTTP com que o Gemini sinaliza sobrecarga
+OVERLOAD_STATUS_CODES = (429, 503)
+
+# Status HTTP transitórios que valem uma nova tentativa
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# Tempo mínimo restante para que uma nova tentativa seja feita
+MIN_ATTEMPT_TIMEOUT = 0.5
+
+# Menor orçamento de saída pedido ao Gemini, mesmo para falas muito curtas
+MIN_OUTPUT_TOKENS = 64
+
+# Instrução de brevidade enviada como systemInstruction quando há limite de fala
+BREVITY_INSTRUCTION = (
+    "Sua resposta será lida em voz alta pela Alexa. Responda em português, em texto corrido, "
+    "sem markdown, listas, tabelas ou emojis, com no máximo {sentences} frases curtas "
+    "e cerca de {max_chars} caracteres no total."
+)
+
+# Status HTTP indicando que a URL base não oferece a Batch API (jobs passam para o modo pipeline)
+BATCH_UNSUPPORTED_STATUS_CODES = (404, 405, 501)
+
+# Jobs em lote terminados mantidos em batch_jobs para consulta
+MAX_TRACKED_BATCH_JOBS = 100
+
+_SSML_TAG_PATTERN = re.compile(r"<[^>]+>")
+
+
+def _supports_thinking(model: str) -> bool:
+    """Modelos 2.5 Flash: o raciocínio interno é configurável por thinkingBudget (0 desliga)"""
+    return "2.5-flash" in model
+
+
+def _is_upstream_failure(error: Exception) -> bool:
+    """Erros HTTP 4xx (exceto 429) são da requisição e não abrem o circuito do Gemini"""
+    response = getattr(error, "response", None)
+    if response is not None:
+        return response.status_code in RETRYABLE_STATUS_CODES
+    return True
+
+
 class GeminiService:
     """Serviço para integração com a API do Google Gemini"""
     
     def __init__(self):
         self.api_key = config.GEMINI_API_KEY
-        self.base_url = "https://generativelanguage.googleapis.com/v1beta"
-        self.model = "gemini-2.0-flash-exp"
+        self.base_url = config.GEMINI_BASE_URL
+        self.model = config.GEMINI_MODEL
+        self.request_timeout = config.GEMINI_REQUEST_TIMEOUT
         
         if not self.api_key:
             logger.warning("GEMINI_API_KEY não configurada. Serviço do Gemini não funcionará.")
+        
+        # Limita quantas chamadas ao Gemini rodam ao mesmo tempo (compartilhado por todas as threads).
+        # Quem espera na fila bloqueia uma thread do pool: a fila é limitada para que o Gemini
+        # ocupe no máximo metade do pool e não deixe o Calendar e a agenda sem threads
+        max_queue = min(config.GEMINI_MAX_QUEUE,
+                        max(0, config.THREADPOOL_SIZE // 2 - config.GEMINI_MAX_CONCURRENCY))
+        if max_queue < config.GEMINI_MAX_QUEUE:
+            logger.warning(f"GEMINI_MAX_QUEUE reduzido para {max_queue} (THREADPOOL_SIZE={config.THREADPOOL_SIZE}, "
+                           f"GEMINI_MAX_CONCURRENCY={config.GEMINI_MAX_CONCURRENCY})")
+        self.limiter = AdaptiveConcurrencyLimiter(
+            "gemini",
+            initial_limit=config.GEMINI_INITIAL_CONCURRENCY,
+            max_limit=config.GEMINI_MAX_CONCURRENCY,
+            max_queue=max_queue
+        )
+        
+        # Cota da chave de API (requisições por minuto), compartilhada por todas as instâncias
+        self.rate_limiter = token_bucket_for(
+            self.api_key or "",
+            rate=config.GEMINI_RATE_LIMIT_RPM / 60.0,
+            capacity=config.GEMINI_RATE_LIMIT_BURST
+        )
+        
+        # Novas tentativas (backoff com jitter decorrelacionado) e requisições de hedge
+        self.max_attempts = config.GEMINI_RETRY_MAX_ATTEMPTS
+        self.retry_base_delay = config.GEMINI_RETRY_BASE_DELAY
+        self.retry_max_delay = config.GEMINI_RETRY_MAX_DELAY
+        self.hedge_delay = config.GEMINI_HEDGE_DELAY
+        self.chars_per_token = config.GEMINI_CHARS_PER_TOKEN
+        self.output_token_margin = config.GEMINI_OUTPUT_TOKEN_MARGIN
+        self.detailed_speech_chars = config.SPEECH_MAX_CHARS_DETAILED
+        self.detailed_thinking_budget = config.GEMINI_DETAILED_THINKING_BUDGET
+        self.sleep = time.sleep
+        self.random = random.Random()
+        
+        # Escolha de modelo e orçamento de saída por pergunta
+        self.router = ModelRouter(
+            models={
+                TIER_FAST: config.GEMINI_FAST_MODEL,
+                TIER_DEFAULT: self.model,
+                TIER_DETAILED: config.GEMINI_DETAILED_MODEL
+            },
+            output_tokens={
+                TIER_FAST: config.GEMINI_FAST_MAX_OUTPUT_TOKENS,
+                TIER_DEFAULT: config.GEMINI_MAX_OUTPUT_TOKENS,
+                TIER_DETAILED: config.GEMINI_DETAILED_MAX_OUTPUT_TOKENS
+            }
+        )
+        
+        # Falha rápida quando o Gemini está fora do ar e últimas respostas conhecidas por pergunta
+        self.breaker = circuit_breaker_for(
+            "gemini",
+            failure_rate_threshold=config.CIRCUIT_FAILURE_RATE,
+            slow_call_threshold=config.GEMINI_SLOW_CALL_SECONDS,
+            min_calls=config.CIRCUIT_MIN_CALLS,
+            open_duration=config.CIRCUIT_OPEN_SECONDS
+        )
+        self.answer_cache: TTLCache[str] = TTLCache(
+            max_size=config.ANSWER_CACHE_SIZE,
+            ttl=config.ANSWER_CACHE_TTL
+        )
+        
+        # Sessão HTTP única com pool de conexões do tamanho da concorrência máxima (mais hedges):
+        # uma conexão aquecida por qualquer thread é reaproveitada pelas demais
+        pool_size = config.GEMINI_MAX_CONCURRENCY * 2
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "x-goog-api-key": self.api_key or ""
+        })
+        self._hedge_executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="gemini-hedge")
+        
+        # Respostas servidas para perguntas equivalentes ("o que é IA" / "me explica inteligência artificial")
+        self.embedding_model = config.GEMINI_EMBEDDING_MODEL
+        self.semantic_cache: Optional[SemanticAnswerCache] = None
+        embedder = config.SEMANTIC_CACHE_EMBEDDER.lower()
+        if embedder in ("gemini", "local") and config.SEMANTIC_CACHE_SIZE > 0:
+            self.semantic_cache = SemanticAnswerCache(
+                self.embed_content if embedder == "gemini" else HashingEmbedder(),
+                threshold=config.SEMANTIC_CACHE_THRESHOLD,
+                max_size=config.SEMANTIC_CACHE_SIZE,
+                ttl=config.SEMANTIC_CACHE_TTL
+            )
+        
+        # Jobs em lote de trabalho em segundo plano (Batch API ou chamadas concorrentes limitadas)
+        self.batch_mode = config.GEMINI_BATCH_MODE.lower()
+        self.batch_concurrency = config.GEMINI_BATCH_CONCURRENCY
+        self.batch_poll_interval = config.GEMINI_BATCH_POLL_INTERVAL
+        self.batch_item_timeout = config.GEMINI_BATCH_ITEM_TIMEOUT
+        self.batch_jobs: "OrderedDict[str, BatchJob]" = OrderedDict()
+        self._batch_lock = threading.Lock()
+        self._batch_supported = True
+    
+    def _send(self, url: str, payload: Dict[str, Any], timeout: float, stream: bool = False) -> requests.Response:
+        response = self.session.post(url, json=payload, timeout=timeout, stream=stream)
+        response.raise_for_status()
+        return response
+    
+    def close(self):
+        """Fecha o pool de conexões e o pool de requisições paralelas (encerramento da aplicação)"""
+        self._hedge_executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+    
+    def warm_up(self, timeout: float = 2.0) -> bool:
+        """
+        Abre (ou renova) uma conexão TLS com o Gemini antes da primeira pergunta
+        
+        Usa a consulta de metadados do modelo, que não gera tokens nem consome a cota
+        de geração; a conexão fica no pool da sessão para a próxima chamada.
+        
+        Args:
+            timeout: Tempo máximo da requisição de aquecimento
+            
+        Returns:
+            True se o Gemini respondeu
+        """
+        if not self.api_key:
+            return False
+        start = time.monotonic()
+        try:
+            response = self.session.get(f"{self.base_url}/models/{self.model}", timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            logger.debug(f"Aquecimento da conexão com o Gemini falhou: {str(e)}")
+            metrics.increment("gemini.warmup.failures")
+            return False
+        metrics.observe("gemini.warmup.latency_seconds", time.monotonic() - start)
+        return response.status_code < 500
+    
+    def embed_content(self, text: str) -> Optional[List[float]]:
+        """
+        Embedding do texto pela API do Gemini (embedContent), usado no cache semântico
+        
+        Uma única tentativa com prazo curto (GEMINI_EMBEDDING_TIMEOUT) e fora da cota de
+        geração: se falhar, a pergunta segue direto para o Gemini. Com o circuit breaker
+        aberto (ou testando a volta do Gemini) não há chamada: a pergunta falharia rápido
+        de qualquer forma e não deve esperar pelo embedding.
+        
+        Args:
+            text: Texto a converter
+            
+        Returns:
+            Vetor do embedding ou None em caso de erro
+        """
+        if not self.api_key or self.breaker.state != STATE_CLOSED:
+            return None
+        url = f"{self.base_url}/models/{self.embedding_model}:embedContent"
+        payload = {"content": {"parts": [{"text": text}]}, "taskType": "SEMANTIC_SIMILARITY"}
+        start = time.monotonic()
+        try:
+            with upstream_timer("gemini.embed"):
+                response = self._send(url, payload, timeout=config.GEMINI_EMBEDDING_TIMEOUT)
+            values = response.json()["embedding"]["values"]
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            logger.warning(f"Erro ao obter embedding do Gemini: {str(e)}")
+            return None
+        metrics.observe("gemini.embedding.latency_seconds", time.monotonic() - start)
+        return values
+    
+    def _send_hedged(self, url: str, payload: Dict[str, Any], timeout: float) -> requests.Response:
+        """
+        Envia a requisição e, se ela não responder em hedge_delay segundos, dispara uma
+        segunda cópia e usa a primeira resposta bem-sucedida
+        
+        A cópia só sai com cota e com uma vaga livre no limitador de concorrência, que ela
+        ocupa até as duas terminarem. As respostas são lidas em streaming: a da cópia
+        mais lenta é fechada sem baixar o corpo.
+        """
+        if self.hedge_delay <= 0 or timeout <= self.hedge_delay:
+            return self._send(url, payload, timeout)
+        
+        primary = self._hedge_executor.submit(self._send, url, payload, timeout, True)
+        try:
+            return primary.result(timeout=self.hedge_delay)
+        except FutureTimeoutError:
+            pass
+        
+        permit = self.limiter.try_acquire() if self.rate_limiter.try_acquire() else None
+        if permit is None:
+            metrics.increment("gemini.hedges_skipped")
+            return primary.result()
+        
+        metrics.increment("gemini.hedged_requests")
+        hedge = self._hedge_executor.submit(self._send, url, payload, timeout - self.hedge_delay, True)
+        error: Optional[Exception] = None
+        winner: Optional[Future] = None
+        for future in as_completed((primary, hedge)):
+            try:
+                response = future.result()
+            except Exception as e:
+                error = error or e
+                continue
+            winner = future
+            break
+        
+        # A vaga extra fica ocupada até a cópia perdedora terminar (sem resposta a aproveitar)
+        loser = primary if winner is hedge else hedge
+        loser.add_done_callback(lambda future: self._abandon(future, permit))
+        if winner is None:
+            raise error
+        if winner is hedge:
+            metrics.increment("gemini.hedge_wins")
+        return response
     
-    def generate_content(self, prompt: str, context: Optional[str] = None) -> Dict[str, Any]:
+    def _abandon(self, future: Future, permit: Permit):
+        """Fecha a resposta da cópia que perdeu a corrida e devolve a vaga do hedge"""
+        if not future.cancelled() and future.exception() is None:
+            future.result().close()
+        permit.outcome = OUTCOME_ABANDONED
+        self.limiter.release(permit)
+    
+    def _backoff_delay(self, previous: float) -> float:
+        """Próximo atraso com jitter decorrelacionado: aleatório entre a base e 3x o anterior"""
+        return min(self.retry_max_delay, self.random.uniform(self.retry_base_delay, previous * 3))
+    
+    def _post_generate(self, payload: Dict[str, Any], priority: int = PRIORITY_NORMAL,
+                       deadline: Optional[float] = None, model: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Envia uma requisição generateContent respeitando a cota, o limitador de concorrência
+        e o prazo, com novas tentativas para erros transitórios
+        
+        Args:
+            payload: Corpo da requisição
+            priority: Prioridade na fila do limitador
+            deadline: Instante (time.monotonic) até o qual a resposta precisa estar pronta
+            model: Modelo a usar (padrão: self.model)
+            
+        Returns:
+            JSON da resposta do Gemini
+            
+        Raises:
+            CircuitOpenError: Se o circuito do Gemini estiver aberto
+            LoadShedError: Se a chamada for descartada (limitador, cota ou prazo)
+            requests.exceptions.RequestException: Em erros de comunicação ou HTTP
+        """
+        model = model or self.model
+        url = f"{self.base_url}/models/{model}:generateContent"
+        delay = self.retry_base_delay
+        
+        for attempt in range(1, self.max_attempts + 1):
+            # Falha imediata com o circuito aberto, antes de gastar cota ou esperar na fila
+            self.breaker.check()
+            if not self.rate_limiter.acquire(deadline if deadline is not None
+                                             else time.monotonic() + self.request_timeout):
+                metrics.increment("gemini.rate_limited")
+                raise LoadShedError("cota local esgotada")
+            
+            timeout = self.request_timeout
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.monotonic())
+                if timeout < MIN_ATTEMPT_TIMEOUT:
+                    raise LoadShedError("prazo insuficiente")
+            
+            retry_after: Optional[float] = None
+            with self.limiter.slot(priority, deadline) as permit:
+                self.breaker.before_call()
+                started_at = time.monotonic()
+                try:
+                    with upstream_timer("gemini"):
+                        result = self._send_hedged(url, payload, timeout).json()
+                except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                    self.breaker.record_failure()
+                    self.router.tracker.record_failure(model)
+                    permit.outcome = OUTCOME_OVERLOAD if isinstance(e, requests.exceptions.Timeout) else OUTCOME_ERROR
+                    if attempt == self.max_attempts:
+                        raise
+                    error = e
+                except requests.exceptions.HTTPError as e:
+                    status_code = e.response.status_code if e.response is not None else None
+                    permit.outcome = OUTCOME_OVERLOAD if status_code in OVERLOAD_STATUS_CODES else OUTCOME_ERROR
+                    if status_code in RETRYABLE_STATUS_CODES:
+                        self.breaker.record_failure()
+                        self.router.tracker.record_failure(model)
+                    else:
+                        # Erros 4xx são da requisição, não indicam upstream com problema
+                        self.breaker.record_success(time.monotonic() - started_at)
+                    if status_code not in RETRYABLE_STATUS_CODES or attempt == self.max_attempts:
+                        raise
+                    retry_after = parse_retry_after(e.response.headers.get("Retry-After"))
+                    error = e
+                except Exception:
+                    self.breaker.record_failure()
+                    raise
+                else:
+                    latency = time.monotonic() - started_at
+                    self.breaker.record_success(latency)
+                    self.router.tracker.record_success(model, latency, result.get("usageMetadata"))
+                    return result
+            
+            if retry_after is not None:
+                # O servidor informou quando voltar: vale para todas as chamadas com esta chave
+                self.rate_limiter.pause_until(time.monotonic() + retry_after)
+                delay = retry_after
+            else:
+                delay = self._backoff_delay(delay)
+            
+            # A espera (inclusive a pedida em Retry-After) fica dentro do prazo da requisição;
+            # sem prazo, no máximo request_timeout
+            remaining = deadline - time.monotonic() if deadline is not None else self.request_timeout
+            if delay + MIN_ATTEMPT_TIMEOUT > remaining:
+                logger.warning(f"Sem tempo para nova tentativa no Gemini: {str(error)}")
+                raise error
+            
+            metrics.increment("gemini.retries")
+            logger.warning(f"Erro transitório no Gemini (tentativa {attempt}): {str(error)}. "
+                           f"Nova tentativa em {delay:.2f}s")
+            self.sleep(delay)
+    
+    @staticmethod
+    def _answer_key(prompt: str, context: Optional[str] = None) -> str:
+        """Chave do cache de respostas: pergunta normalizada (caixa e espaços)"""
+        key = " ".join(prompt.lower().split())
+        if context:
+            key = f"{' '.join(context.lower().split())}\n{key}"
+        return key
+    
+    def output_budget(self, max_chars: int) -> int:
+        """
+        maxOutputTokens suficiente para uma fala de max_chars caracteres
+        
+        Inclui uma folga para o markdown removido pela formatação e para que o corte
+        por parágrafo tenha de onde escolher.
+        """
+        return max(MIN_OUTPUT_TOKENS, math.ceil(max_chars / self.chars_per_token * self.output_token_margin))
+    
+    def speech_limit(self, prompt: str, max_chars: int) -> int:
+        """
+        Tamanho da fala para a pergunta: pedidos explícitos de detalhes (nível "detailed"
+        do roteador) ganham pelo menos SPEECH_MAX_CHARS_DETAILED caracteres
+        
+        Args:
+            prompt: Pergunta do usuário
+            max_chars: Limite da fala para o dispositivo e o intent
+            
+        Returns:
+            Limite a usar em generate_content(max_speech_chars=...) e em format_for_speech
+        """
+        if self.router.classify(prompt) == TIER_DETAILED:
+            return max(max_chars, self.detailed_speech_chars)
+        return max_chars
+    
+    @staticmethod
+    def brevity_instruction(max_chars: int) -> str:
+        """Instrução de sistema pedindo uma resposta do tamanho da fala"""
+        return BREVITY_INSTRUCTION.format(sentences=max(1, max_chars // 120), max_chars=max_chars)
+    
+    def generate_content(self, prompt: str, context: Optional[str] = None,
+                         priority: int = PRIORITY_NORMAL, deadline: Optional[float] = None,
+                         max_speech_chars: Optional[int] = None) -> Dict[str, Any]:
         """
         Gera conteúdo usando a API do Gemini
         
+        Perguntas sem contexto passam antes pelo cache semântico: se uma pergunta
+        equivalente já foi respondida, a resposta é devolvida com "cached": True sem
+        chamar o Gemini. Respostas bem-sucedidas são guardadas no cache de respostas;
+        se o Gemini falhar (ou o circuito estiver aberto) e a mesma pergunta já tiver
+        sido respondida, a última resposta conhecida é devolvida com "degraded": True.
+        
         Args:
             prompt: A pergunta ou prompt do usuário
             context: Contexto adicional da conversa (opcional)
+            priority: Prioridade na fila do limitador de concorrência
+            deadline: Instante (time.monotonic) limite para a resposta; sem ele a chamada nunca é
+                descartada por prazo
+            max_speech_chars: Tamanho da fala que será gerada a partir da resposta; define o
+                maxOutputTokens e a instrução de brevidade (sem ele, vale o orçamento do modelo)
             
         Returns:
             Dict contendo a resposta do Gemini ou erro
         """
+        embedding = None
+        if self.semantic_cache is not None and not context and self.api_key:
+            embedding, cached_answer = self.semantic_cache.lookup(prompt)
+            if cached_answer is not None:
+                return {
+                    "success": True,
+                    "response": cached_answer,
+                    "cached": True
+                }
+        
+        result = self._generate_content(prompt, context, priority, deadline, max_speech_chars)
+        
+        cache_key = self._answer_key(prompt, context)
+        if result["success"]:
+            self.answer_cache.set(cache_key, result["response"])
+            if embedding is not None:
+                self.semantic_cache.add(embedding, result["response"], prompt)
+        elif self.api_key:
+            cached_answer = self.answer_cache.get(cache_key)
+            if cached_answer is not None:
+                logger.warning(f"Gemini indisponível ({result['error']}); usando resposta em cache")
+                metrics.increment("gemini.degraded_answers")
+                return {
+                    "success": True,
+                    "response": cached_answer,
+                    "degraded": True
+                }
+        
+        return result
+    
+    def _generate_payload(self, prompt: str, context: Optional[str], model: str, max_output_tokens: int,
+                          max_speech_chars: Optional[int] = None, thinking_budget: int = 0) -> Dict[str, Any]:
+        """
+        Corpo da requisição generateContent (também usado em cada item dos jobs em lote)
+        
+        thinking_budget só vale com max_speech_chars: sem orçamento de fala, o modelo usa
+        o raciocínio padrão dele.
+        """
+        # Prepara o prompt com contexto se fornecido
+        full_prompt = prompt
+        if context:
+            full_prompt = f"Contexto: {context}\n\nPergunta: {prompt}"
+        
+        # Monta a requisição para a API do Gemini
+        payload = {
+            "contents": [
+                {
+                    "parts": [
+                        {
+                            "text": full_prompt
+                        }
+                    ]
+                }
+            ],
+            "generationConfig": {
+                "temperature": 0.7,
+                "topK": 40,
+                "topP": 0.95,
+                "maxOutputTokens": max_output_tokens,
+            }
+        }
+        if max_speech_chars:
+            payload["systemInstruction"] = {
+                "parts": [{"text": self.brevity_instruction(max_speech_chars)}]
+            }
+            if _supports_thinking(model):
+                # Nos modelos 2.5 o raciocínio interno consome maxOutputTokens; com um
+                # orçamento do tamanho da fala ele fica limitado a thinking_budget (somado ao
+                # maxOutputTokens por quem chama) para não esvaziar a resposta
+                payload["generationConfig"]["thinkingConfig"] = {"thinkingBudget": thinking_budget}
+        return payload
+    
+    @staticmethod
+    def _parse_answer(result: Dict[str, Any], model: str) -> Optional[Dict[str, Any]]:
+        """Resultado de sucesso a partir do JSON de generateContent, ou None se o formato for inesperado"""
+        # Extrai o texto da resposta
+        if "candidates" in result and len(result["candidates"]) > 0:
+            candidate = result["candidates"][0]
+            if "content" in candidate and "parts" in candidate["content"]:
+                return {
+                    "success": True,
+                    "response": candidate["content"]["parts"][0].get("text", ""),
+                    "model": model,
+                    "output_tokens": result.get("usageMetadata", {}).get("candidatesTokenCount"),
+                    "raw_response": result
+                }
+        return None
+    
+    def _generate_content(self, prompt: str, context: Optional[str], priority: int,
+                          deadline: Optional[float], max_speech_chars: Optional[int] = None) -> Dict[str, Any]:
+        """Chamada ao Gemini propriamente dita (ver generate_content)"""
         if not self.api_key:
             return {
                 "success": False,
@@ -35,57 +558,29 @@ class GeminiService:
                 "response": "Desculpe, a integração com o Gemini não está configurada corretamente."
             }
         
+        # Modelo e orçamento de saída conforme a pergunta e o tempo restante
+        time_budget = deadline - time.monotonic() if deadline is not None else None
+        route = self.router.route(prompt, time_budget)
+        max_output_tokens = route.max_output_tokens
+        thinking_budget = 0
+        if max_speech_chars:
+            # Pedidos de detalhes mantêm o raciocínio, em tokens além dos da fala
+            if route.tier == TIER_DETAILED and _supports_thinking(route.model):
+                thinking_budget = self.detailed_thinking_budget
+            max_output_tokens = min(max_output_tokens, self.output_budget(max_speech_chars) + thinking_budget)
+        
         try:
-            # Prepara o prompt com contexto se fornecido
-            full_prompt = prompt
-            if context:
-                full_prompt = f"Contexto: {context}\n\nPergunta: {prompt}"
-            
-            # Monta a requisição para a API do Gemini
-            url = f"{self.base_url}/models/{self.model}:generateContent"
-            headers = {
-                "Content-Type": "application/json",
-                "x-goog-api-key": self.api_key
-            }
-            
-            payload = {
-                "contents": [
-                    {
-                        "parts": [
-                            {
-                                "text": full_prompt
-                            }
-                        ]
-                    }
-                ],
-                "generationConfig": {
-                    "temperature": 0.7,
-                    "topK": 40,
-                    "topP": 0.95,
-                    "maxOutputTokens": 1024,
-                }
-            }
+            payload = self._generate_payload(prompt, context, route.model, max_output_tokens, max_speech_chars,
+                                             thinking_budget)
             
-            logger.info(f"Enviando requisição para Gemini: {prompt[:100]}...")
-            
-            response = requests.post(url, headers=headers, json=payload, timeout=30)
-            response.raise_for_status()
+            logger.info(f"Enviando requisição para Gemini ({route.model}): {prompt[:100]}...")
             
-            result = response.json()
+            result = self._post_generate(payload, priority, deadline, model=route.model)
             
-            # Extrai o texto da resposta
-            if "candidates" in result and len(result["candidates"]) > 0:
-                candidate = result["candidates"][0]
-                if "content" in candidate and "parts" in candidate["content"]:
-                    text_response = candidate["content"]["parts"][0].get("text", "")
-                    
-                    logger.info(f"Resposta do Gemini recebida: {text_response[:100]}...")
-                    
-                    return {
-                        "success": True,
-                        "response": text_response,
-                        "raw_response": result
-                    }
+            answer = self._parse_answer(result, route.model)
+            if answer is not None:
+                logger.info(f"Resposta do Gemini recebida: {answer['response'][:100]}...")
+                return answer
             
             # Se não conseguiu extrair o texto
             logger.error(f"Formato de resposta inesperado do Gemini: {result}")
@@ -94,7 +589,31 @@ class GeminiService:
                 "error": "Formato de resposta inesperado",
                 "response": "Desculpe, não consegui processar a resposta do Gemini."
             }
-            
+        
+        except CircuitOpenError as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "response": UNAVAILABLE_RESPONSE
+            }
+        
+        except LoadShedError as e:
+            return {
+                "success": False,
+                "error": f"Sobrecarga: {e.reason}",
+                "response": OVERLOAD_RESPONSE
+            }
+        
+        except requests.exceptions.HTTPError as e:
+            status_code = e.response.status_code if e.response is not None else None
+            logger.error(f"Erro HTTP do Gemini após novas tentativas: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e),
+                "response": OVERLOAD_RESPONSE if status_code in OVERLOAD_STATUS_CODES
+                else "Desculpe, ocorreu um erro ao comunicar com o Gemini."
+            }
+        
         except requests.exceptions.Timeout:
             logger.error("Timeout na requisição para o Gemini")
             return {
@@ -102,7 +621,7 @@ class GeminiService:
                 "error": "Timeout",
                 "response": "Desculpe, o Gemini demorou muito para responder. Tente novamente."
             }
-            
+        
         except requests.exceptions.RequestException as e:
             logger.error(f"Erro na requisição para o Gemini: {str(e)}")
             return {
@@ -110,7 +629,7 @@ class GeminiService:
                 "error": str(e),
                 "response": "Desculpe, ocorreu um erro ao comunicar com o Gemini."
             }
-            
+        
         except Exception as e:
             logger.error(f"Erro inesperado no serviço do Gemini: {str(e)}")
             return {
@@ -119,13 +638,251 @@ class GeminiService:
                 "response": "Desculpe, ocorreu um erro interno no serviço do Gemini."
             }
     
-    def generate_with_functions(self, prompt: str, available_functions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def submit_batch(self, items: Sequence[Union[str, BatchItem]], display_name: str = "alexa-gemini",
+                     model: Optional[str] = None) -> BatchJob:
+        """
+        Envia várias perguntas de trabalho em segundo plano como um único job
+        
+        No modo "batch" as perguntas vão em um job da Batch API do Gemini
+        (batchGenerateContent: uma requisição da cota, processado de forma assíncrona
+        pelo Google); se o endpoint não existir (ex: proxy ou URL sem suporte), ou no
+        modo "pipeline", elas são enviadas por generateContent em uma thread de fundo,
+        com no máximo GEMINI_BATCH_CONCURRENCY chamadas ao mesmo tempo. Em ambos os
+        casos as respostas vão para o cache de respostas (e para o cache semântico,
+        de onde perguntas equivalentes passam a ser servidas).
+        
+        Args:
+            items: Perguntas (texto ou BatchItem com contexto e tamanho da fala)
+            display_name: Nome do job na Batch API
+            model: Modelo a usar (padrão: self.model)
+        
+        Returns:
+            BatchJob para acompanhar com poll_batch()/wait_batch()
+        """
+        items = [item if isinstance(item, BatchItem) else BatchItem(item) for item in items]
+        model = model or self.model
+        
+        if not self.api_key:
+            return self._failed_batch(items, model, "API key do Gemini não configurada")
+        
+        if self.batch_mode == MODE_BATCH and self._batch_supported and items:
+            try:
+                job = self._create_batch_job(items, display_name, model)
+            except requests.exceptions.HTTPError as e:
+                status_code = e.response.status_code if e.response is not None else None
+                if status_code not in BATCH_UNSUPPORTED_STATUS_CODES:
+                    return self._failed_batch(items, model, f"Erro ao criar job em lote: {str(e)}")
+                logger.warning(f"Batch API indisponível em {self.base_url} ({status_code}); "
+                               f"usando chamadas concorrentes")
+                self._batch_supported = False
+            except (CircuitOpenError, LoadShedError, requests.exceptions.RequestException, ValueError, KeyError) as e:
+                return self._failed_batch(items, model, f"Erro ao criar job em lote: {str(e)}")
+            else:
+                self._track_batch(job)
+                return job
+        
+        job = BatchJob(f"pipeline/{uuid.uuid4().hex[:12]}", items, MODE_PIPELINE, model)
+        self._track_batch(job)
+        threading.Thread(target=self._run_pipeline, args=(job,), name="gemini-batch", daemon=True).start()
+        return job
+    
+    def poll_batch(self, job: BatchJob) -> BatchJob:
+        """
+        Atualiza o estado de um job da Batch API; quando ele termina, guarda os
+        resultados em job.results e nos caches
+        
+        Jobs no modo pipeline são atualizados pela própria thread e voltam sem consulta.
+        Erros na consulta são registrados no log e o job fica no estado anterior.
+        
+        Args:
+            job: Job devolvido por submit_batch
+        
+        Returns:
+            O mesmo job
+        """
+        if job.mode != MODE_BATCH or job.done:
+            return job
+        try:
+            response = self.session.get(f"{self.base_url}/{job.name}", timeout=self.request_timeout)
+            response.raise_for_status()
+            operation = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.warning(f"Erro ao consultar o job em lote {job.name}: {str(e)}")
+            return job
+        
+        state = operation.get("metadata", {}).get("state", job.state)
+        if state not in TERMINAL_STATES and operation.get("done"):
+            state = BATCH_FAILED if "error" in operation else BATCH_SUCCEEDED
+        if state not in TERMINAL_STATES:
+            job.state = state
+            return job
+        
+        if state == BATCH_SUCCEEDED:
+            inlined = operation.get("response", {}).get("inlinedResponses", {}).get("inlinedResponses", [])
+            self._store_batch_responses(job, inlined)
+        error = operation.get("error", {}).get("message")
+        if state == BATCH_SUCCEEDED and job.items and job.completed == 0:
+            state, error = BATCH_FAILED, "Job concluído sem resultados"
+        self._finish_batch(job, state, error)
+        return job
+    
+    def wait_batch(self, job: BatchJob, timeout: Optional[float] = None,
+                   poll_interval: Optional[float] = None) -> bool:
+        """
+        Espera um job terminar, consultando a Batch API a cada poll_interval segundos
+        
+        Args:
+            job: Job devolvido por submit_batch
+            timeout: Tempo máximo de espera (None espera até o fim)
+            poll_interval: Intervalo entre consultas (padrão: GEMINI_BATCH_POLL_INTERVAL)
+        
+        Returns:
+            True se o job terminou dentro do prazo
+        """
+        if job.mode == MODE_PIPELINE:
+            return job.wait(timeout)
+        poll_interval = poll_interval or self.batch_poll_interval
+        give_up_at = time.monotonic() + timeout if timeout is not None else None
+        while not self.poll_batch(job).done:
+            delay = poll_interval
+            if give_up_at is not None:
+                delay = min(delay, give_up_at - time.monotonic())
+                if delay <= 0:
+                    return False
+            self.sleep(delay)
+        return True
+    
+    def _create_batch_job(self, items: List[BatchItem], display_name: str, model: str) -> BatchJob:
+        """Cria o job na Batch API (batchGenerateContent) com as requisições embutidas"""
+        requests_ = []
+        for index, item in enumerate(items):
+            max_output_tokens = config.GEMINI_MAX_OUTPUT_TOKENS
+            if item.max_speech_chars:
+                max_output_tokens = min(max_output_tokens, self.output_budget(item.max_speech_chars))
+            requests_.append({
+                "request": self._generate_payload(item.prompt, item.context, model, max_output_tokens,
+                                                  item.max_speech_chars),
+                "metadata": {"key": str(index)}
+            })
+        payload = {
+            "batch": {
+                "displayName": display_name,
+                "inputConfig": {"requests": {"requests": requests_}}
+            }
+        }
+        
+        # Um único envio: conta uma vez na cota, fora do limitador de concorrência
+        self.breaker.check()
+        if not self.rate_limiter.acquire(time.monotonic() + self.request_timeout):
+            raise LoadShedError("cota local esgotada")
+        with self.breaker.call(_is_upstream_failure):
+            operation = self._send(f"{self.base_url}/models/{model}:batchGenerateContent", payload,
+                                   timeout=self.request_timeout).json()
+        
+        job = BatchJob(operation["name"], items, MODE_BATCH, model)
+        job.state = operation.get("metadata", {}).get("state", BATCH_PENDING)
+        metrics.increment("gemini.batch.jobs")
+        metrics.increment("gemini.batch.requests", len(items))
+        logger.info(f"Job em lote {job.name} criado com {len(items)} perguntas ({model})")
+        return job
+    
+    def _store_batch_responses(self, job: BatchJob, inlined: List[Dict[str, Any]]):
+        """Resultados de um job concluído da Batch API, na ordem dos itens (pela chave do metadata)"""
+        for position, entry in enumerate(inlined):
+            try:
+                index = int(entry.get("metadata", {}).get("key", position))
+                item = job.items[index]
+            except (ValueError, IndexError):
+                continue
+            answer = None
+            if "response" in entry:
+                answer = self._parse_answer(entry["response"], job.model)
+            if answer is None:
+                error = entry.get("error", {}).get("message", "Formato de resposta inesperado")
+                job.results[index] = {
+                    "success": False,
+                    "error": error,
+                    "response": "Desculpe, ocorreu um erro ao comunicar com o Gemini."
+                }
+                continue
+            job.results[index] = answer
+            self._store_answer(item, answer["response"])
+    
+    def _run_pipeline(self, job: BatchJob):
+        """
+        Executa um job no modo pipeline: generateContent com concorrência limitada
+
+        As perguntas entram no limitador com PRIORITY_BACKGROUND e prazo de
+        batch_item_timeout segundos: cedem a vez (e o lugar na fila) às perguntas
+        da Alexa e são descartadas se a espera não couber no prazo.
+        """
+        job.state = BATCH_RUNNING
+        metrics.increment("gemini.batch.jobs")
+        metrics.increment("gemini.batch.requests", len(job.items))
+    
+        def generate(index: int):
+            item = job.items[index]
+            deadline = time.monotonic() + self.batch_item_timeout
+            result = self._generate_content(item.prompt, item.context, PRIORITY_BACKGROUND, deadline,
+                                            item.max_speech_chars)
+            if result["success"]:
+                self._store_answer(item, result["response"])
+            job.results[index] = result
+        
+        try:
+            with ThreadPoolExecutor(max_workers=self.batch_concurrency, thread_name_prefix="gemini-batch") as executor:
+                list(executor.map(generate, range(len(job.items))))
+        except Exception as e:
+            logger.error(f"Erro inesperado no job em lote {job.name}: {str(e)}")
+            self._finish_batch(job, BATCH_FAILED, str(e))
+            return
+        if job.items and job.succeeded == 0:
+            self._finish_batch(job, BATCH_FAILED, job.results[0]["error"])
+        else:
+            self._finish_batch(job, BATCH_SUCCEEDED)
+    
+    def _store_answer(self, item: BatchItem, answer: str):
+        """Guarda uma resposta gerada em segundo plano nos caches usados pelas perguntas da Alexa"""
+        self.answer_cache.set(self._answer_key(item.prompt, item.context), answer)
+        if self.semantic_cache is not None and not item.context:
+            embedding = self.semantic_cache.embed(item.prompt)
+            if embedding is not None and self.semantic_cache.nearest(embedding, item.prompt) is None:
+                self.semantic_cache.add(embedding, answer, item.prompt)
+    
+    def _failed_batch(self, items: List[BatchItem], model: str, error: str) -> BatchJob:
+        logger.error(error)
+        job = BatchJob(f"failed/{uuid.uuid4().hex[:12]}", items, self.batch_mode, model)
+        self._track_batch(job)
+        self._finish_batch(job, BATCH_FAILED, error)
+        return job
+    
+    def _finish_batch(self, job: BatchJob, state: str, error: Optional[str] = None):
+        job.finish(state, error)
+        failed = len(job.items) - job.succeeded
+        if failed:
+            metrics.increment("gemini.batch.failed_requests", failed)
+        metrics.observe("gemini.batch.duration_seconds", job.finished_at - job.created_at)
+        logger.info(f"Job em lote {job.name} terminou ({state}): {job.succeeded}/{len(job.items)} respostas")
+    
+    def _track_batch(self, job: BatchJob):
+        """Registra o job em batch_jobs, descartando os terminados mais antigos"""
+        with self._batch_lock:
+            self.batch_jobs[job.name] = job
+            for name in [name for name, tracked in self.batch_jobs.items() if tracked.done]:
+                if len(self.batch_jobs) <= MAX_TRACKED_BATCH_JOBS:
+                    break
+                del self.batch_jobs[name]
+    
+    def generate_with_functions(self, prompt: str, available_functions: List[Dict[str, Any]],
+                                priority: int = PRIORITY_NORMAL, deadline: Optional[float] = None) -> Dict[str, Any]:
         """
         Gera conteúdo com capacidade de chamar funções (Function Calling)
         
         Args:
             prompt: A pergunta ou prompt do usuário
             available_functions: Lista de funções disponíveis para o Gemini chamar
+            priority: Prioridade na fila do limitador de concorrência
+            deadline: Instante (time.monotonic) limite para a resposta
             
         Returns:
             Dict contendo a resposta do Gemini e possíveis chamadas de função
@@ -138,12 +895,6 @@ class GeminiService:
             }
         
         try:
-            url = f"{self.base_url}/models/{self.model}:generateContent"
-            headers = {
-                "Content-Type": "application/json",
-                "x-goog-api-key": self.api_key
-            }
-            
             payload = {
                 "contents": [
                     {
@@ -169,10 +920,7 @@ class GeminiService:
             
             logger.info(f"Enviando requisição com funções para Gemini: {prompt[:100]}...")
             
-            response = requests.post(url, headers=headers, json=payload, timeout=30)
-            response.raise_for_status()
-            
-            result = response.json()
+            result = self._post_generate(payload, priority, deadline)
             
             # Processa a resposta que pode conter chamadas de função
             if "candidates" in result and len(result["candidates"]) > 0:
@@ -201,6 +949,20 @@ class GeminiService:
                 "response": "Desculpe, não consegui processar a resposta do Gemini."
             }
             
+        except CircuitOpenError as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "response": UNAVAILABLE_RESPONSE
+            }
+            
+        except LoadShedError as e:
+            return {
+                "success": False,
+                "error": f"Sobrecarga: {e.reason}",
+                "response": OVERLOAD_RESPONSE
+            }
+            
         except Exception as e:
             logger.error(f"Erro no Function Calling do Gemini: {str(e)}")
             return {
@@ -209,32 +971,27 @@ class GeminiService:
                 "response": "Desculpe, ocorreu um erro ao processar sua solicitação."
             }
     
-    def format_for_speech(self, text: str) -> str:
+    def format_for_speech(self, text: str, ssml: bool = False, max_chars: Optional[int] = None,
+                          output_tokens: Optional[int] = None) -> str:
         """
         Formata o texto do Gemini para ser mais adequado para síntese de fala
         
         Args:
             text: Texto original do Gemini
+            ssml: Se True, retorna o conteúdo escapado para SSML
+            max_chars: Limite de caracteres da fala (padrão do formatador se None)
+            output_tokens: Tokens gerados pelo Gemini para o texto; se informado, registra
+                nas métricas quantos deles chegaram a ser falados
             
         Returns:
             Texto formatado para fala
         """
-        # Remove markdown e formatação
-        formatted = text.replace("**", "").replace("*", "")
-        formatted = formatted.replace("#", "")
-        
-        # Substitui quebras de linha por pausas
-        formatted = formatted.replace("\n\n", ". ")
-        formatted = formatted.replace("\n", " ")
-        
-        # Limita o tamanho para evitar respostas muito longas
-        if len(formatted) > 500:
-            # Encontra o último ponto antes do limite
-            truncate_point = formatted.rfind(".", 0, 500)
-            if truncate_point > 200:  # Garante que não seja muito curto
-                formatted = formatted[:truncate_point + 1]
-            else:
-                formatted = formatted[:500] + "..."
-        
-        return formatted.strip()
-
+        speech = speech_formatter.format(text, ssml=ssml, max_chars=max_chars)
+        if output_tokens and text:
+            spoken_chars = len(_SSML_TAG_PATTERN.sub("", speech)) if ssml else len(speech)
+            # Estimativa proporcional: fração do texto gerado que sobreviveu à formatação e ao corte
+            spoken_tokens = min(output_tokens, round(output_tokens * spoken_chars / len(text)))
+            metrics.increment("gemini.tokens.generated", output_tokens)
+            metrics.increment("gemini.tokens.spoken", spoken_tokens)
+            metrics.observe("gemini.tokens.discarded_ratio", 1 - spoken_tokens / output_tokens)
+        return speech
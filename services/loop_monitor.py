@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from config.settings import config
+from services.metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+# Raiz do projeto: frames fora dela (bibliotecas, stdlib) não identificam o ponto bloqueante
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class EventLoopBlockedError(Exception):
+    """O event loop ficou bloqueado além do limite (modo estrito)"""
+
+    def __init__(self, reports: List["BlockReport"]):
+        details = "\n\n".join(report.describe() for report in reports)
+        super().__init__(f"Event loop bloqueado {len(reports)} vez(es):\n\n{details}")
+        self.reports = reports
+
+
+class BlockReport:
+    """Bloqueio do event loop: duração, ponto no código do projeto e pilha capturada"""
+
+    __slots__ = ("duration", "site", "stack")
+
+    def __init__(self, duration: float, site: str, stack: str):
+        self.duration = duration
+        self.site = site
+        self.stack = stack
+
+    def describe(self) -> str:
+        return f"{self.duration * 1000:.0f} ms em {self.site}\n{self.stack}"
+
+
+def _project_site(frames: List[traceback.FrameSummary]) -> str:
+    """Frame mais interno do código do projeto (arquivo:linha função)"""
+    for frame in reversed(frames):
+        if frame.filename.startswith(_PROJECT_ROOT) and "site-packages" not in frame.filename:
+            return f"{os.path.relpath(frame.filename, _PROJECT_ROOT)}:{frame.lineno} {frame.name}"
+    if frames:
+        return f"{frames[-1].filename}:{frames[-1].lineno} {frames[-1].name}"
+    return "desconhecido"
+
+
+class EventLoopMonitor:
+    """
+    Mede o atraso do event loop e identifica chamadas que o bloqueiam
+
+    Uma tarefa no loop acorda a cada `interval` segundos e mede o atraso em relação
+    ao previsto (event_loop.lag_seconds). Uma thread de vigia confere os batimentos;
+    se o loop passar de `threshold` segundos sem bater, captura a pilha da thread do
+    loop enquanto ele ainda está bloqueado (ex: requests.post dentro de um endpoint
+    async). Quando o loop volta, o bloqueio é contado (event_loop.blocked,
+    event_loop.blocked_seconds) e registrado no log com o ponto do projeto e a pilha;
+    em produção o log de um mesmo ponto é limitado a um por `report_interval`.
+
+    No modo estrito (testes e benchmarks) todos os bloqueios são guardados e
+    check() levanta EventLoopBlockedError.
+    """
+
+    def __init__(self, threshold: float = config.EVENT_LOOP_BLOCK_THRESHOLD,
+                 interval: float = config.EVENT_LOOP_MONITOR_INTERVAL, strict: bool = config.EVENT_LOOP_STRICT,
+                 report_interval: float = 60.0, registry: MetricsRegistry = metrics):
+        self.threshold = threshold
+        self.interval = interval
+        self.strict = strict
+        self.report_interval = report_interval
+        self.metrics = registry
+        self.reports: Deque[BlockReport] = deque(maxlen=None if strict else 50)
+        self.blocked = 0
+
+        self._beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._stack: Optional[List[traceback.FrameSummary]] = None
+        self._reported_at: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def start(self):
+        """Inicia a medição no event loop em execução (chamar de dentro do loop)"""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="event-loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        """Interrompe a medição"""
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+
+    def check(self):
+        """
+        Falha se houve bloqueios (modo estrito)
+
+        Raises:
+            EventLoopBlockedError: Com os bloqueios registrados desde o início
+        """
+        if self.reports and self.strict:
+            raise EventLoopBlockedError(list(self.reports))
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._beat = now
+            lag = max(0.0, now - expected)
+            self.metrics.observe("event_loop.lag_seconds", lag)
+            if lag >= self.threshold:
+                self._record_block(lag)
+            else:
+                self._stack = None
+
+    def _watch(self):
+        # Confere os batimentos 4 vezes por limite, para pegar o loop ainda bloqueado
+        period = max(0.005, self.threshold / 4)
+        while not self._stop.wait(period):
+            silence = time.monotonic() - self._beat - self.interval
+            if silence >= self.threshold and self._stack is None:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    self._stack = traceback.extract_stack(frame)
+
+    def _record_block(self, duration: float):
+        stack, self._stack = self._stack, None
+        self.blocked += 1
+        self.metrics.increment("event_loop.blocked")
+        self.metrics.observe("event_loop.blocked_seconds", duration)
+        if stack is None:
+            report = BlockReport(duration, "desconhecido (pilha não capturada)", "")
+        else:
+            report = BlockReport(duration, _project_site(stack), "".join(traceback.format_list(stack)))
+        self.reports.append(report)
+
+        now = time.monotonic()
+        if self.strict or now - self._reported_at.get(report.site, -self.report_interval) >= self.report_interval:
+            self._reported_at[report.site] = now
+            logger.warning(f"Event loop bloqueado por {duration * 1000:.0f} ms em {report.site}\n{report.stack}")
@@ -0,0 +1,83 @@
+import threading
+from collections import deque
+from typing import Any, Deque, Dict
+
+
+class _Histogram:
+    """Distribuição de valores observados (mantém apenas uma janela recente para os percentis)"""
+
+    __slots__ = ("count", "total", "max", "window")
+
+    def __init__(self, window_size: int):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.window: Deque[float] = deque(maxlen=window_size)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+        self.window.append(value)
+
+    def summary(self) -> Dict[str, float]:
+        ordered = sorted(self.window)
+        summary = {"count": self.count, "sum": round(self.total, 6), "max": round(self.max, 6)}
+        for label, quantile in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            summary[label] = round(ordered[int(quantile * (len(ordered) - 1))], 6) if ordered else 0.0
+        return summary
+
+
+class MetricsRegistry:
+    """
+    Registro de métricas em memória do processo (contadores, medidores e histogramas)
+
+    Os nomes seguem o padrão "<componente>.<métrica>" (ex: "gemini.limiter.shed").
+    Todas as operações são protegidas por lock, pois os handlers rodam em threads.
+    """
+
+    def __init__(self, window_size: int = 1024):
+        self.window_size = window_size
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._histograms: Dict[str, _Histogram] = {}
+
+    def increment(self, name: str, value: float = 1):
+        """Incrementa um contador"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float):
+        """Define o valor atual de um medidor"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float):
+        """Registra um valor em um histograma (ex: latência em segundos)"""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = _Histogram(self.window_size)
+            histogram.observe(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Retorna uma cópia de todas as métricas, pronta para serialização em JSON"""
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "histograms": {name: histogram.summary() for name, histogram in self._histograms.items()},
+            }
+
+    def reset(self):
+        """Remove todas as métricas registradas"""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+# Instância global do registro de métricas
+metrics = MetricsRegistry()
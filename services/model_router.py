@@ -0,0 +1,227 @@
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.metrics import MetricsRegistry, metrics
+
+# Níveis de modelo, do mais leve ao mais capaz
+TIER_FAST = "fast"
+TIER_DEFAULT = "default"
+TIER_DETAILED = "detailed"
+TIERS = (TIER_FAST, TIER_DEFAULT, TIER_DETAILED)
+
+# Preço de referência (USD por milhão de tokens: entrada, saída); ajuste conforme a tabela vigente
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.0-flash-exp": (0.10, 0.40),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-pro": (1.25, 10.00),
+}
+
+# Pedidos explícitos de resposta longa ou elaborada (só as formas do pedido: "compare", não
+# "compartilhar" ou "comparecer"; "explique" sozinho é uma pergunta comum)
+_DETAILED_PATTERN = re.compile(
+    r"\b(?:em detalhes?|com detalhes|detalhad[oa]s?|detalhadamente|explica(?:r)? melhor|explique melhor|"
+    r"aprofund(?:e|ar|ando)|passo a passo|compar(?:e|ar|ação|ando)|diferenças? entre|vantagens e desvantagens)\b"
+)
+# Perguntas factuais curtas ("quem", "quando", "quanto"...)
+_FACTUAL_PATTERN = re.compile(
+    r"^(?:quem|quando|onde|qual|quais|quanto|quantos|quantas|que horas|que dia|o que é|o que significa)\b"
+)
+SHORT_QUERY_WORDS = 8
+
+
+class ModelRoute:
+    """Modelo e orçamento de saída escolhidos para uma requisição"""
+
+    __slots__ = ("tier", "model", "max_output_tokens")
+
+    def __init__(self, tier: str, model: str, max_output_tokens: int):
+        self.tier = tier
+        self.model = model
+        self.max_output_tokens = max_output_tokens
+
+    def __repr__(self) -> str:
+        return f"ModelRoute(tier={self.tier!r}, model={self.model!r}, max_output_tokens={self.max_output_tokens})"
+
+
+class _ModelStats:
+    __slots__ = ("calls", "errors", "latency", "error_rate", "last_failure_at", "input_tokens",
+                 "output_tokens", "cost")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.last_failure_at = float("-inf")
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost = 0.0
+
+
+class ModelStatsTracker:
+    """
+    Latência, taxa de erro, tokens e custo estimado por modelo
+
+    Latência e taxa de erro são médias móveis exponenciais, para que o roteador
+    reaja a mudanças recentes de cada modelo.
+    """
+
+    def __init__(self, smoothing: float = 0.2, registry: MetricsRegistry = metrics,
+                 clock: Callable[[], float] = time.monotonic):
+        self.smoothing = smoothing
+        self.registry = registry
+        self.clock = clock
+        self._stats: Dict[str, _ModelStats] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, model: str) -> _ModelStats:
+        stats = self._stats.get(model)
+        if stats is None:
+            stats = self._stats[model] = _ModelStats()
+        return stats
+
+    def record_success(self, model: str, latency: float, usage: Optional[Dict[str, Any]] = None):
+        """
+        Registra uma chamada bem-sucedida
+
+        Args:
+            model: Nome do modelo
+            latency: Duração da chamada em segundos
+            usage: usageMetadata da resposta do Gemini (contagem de tokens)
+        """
+        usage = usage or {}
+        input_tokens = usage.get("promptTokenCount", 0) or 0
+        output_tokens = usage.get("candidatesTokenCount", 0) or 0
+        input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+        cost = (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+        with self._lock:
+            stats = self._get(model)
+            stats.calls += 1
+            stats.latency = latency if stats.latency is None else \
+                stats.latency + self.smoothing * (latency - stats.latency)
+            stats.error_rate -= self.smoothing * stats.error_rate
+            stats.input_tokens += input_tokens
+            stats.output_tokens += output_tokens
+            stats.cost += cost
+
+        self.registry.observe(f"gemini.model.{model}.latency_seconds", latency)
+        self.registry.increment(f"gemini.model.{model}.output_tokens", output_tokens)
+        self.registry.increment(f"gemini.model.{model}.cost_usd", cost)
+
+    def record_failure(self, model: str):
+        """Registra uma chamada com falha"""
+        with self._lock:
+            stats = self._get(model)
+            stats.calls += 1
+            stats.errors += 1
+            stats.error_rate += self.smoothing * (1 - stats.error_rate)
+            stats.last_failure_at = self.clock()
+        self.registry.increment(f"gemini.model.{model}.errors")
+
+    def latency(self, model: str) -> Optional[float]:
+        """Latência média recente do modelo (None se ainda não houve chamadas)"""
+        stats = self._stats.get(model)
+        return stats.latency if stats else None
+
+    def error_rate(self, model: str) -> float:
+        """Taxa de erro recente do modelo (0 a 1)"""
+        stats = self._stats.get(model)
+        return stats.error_rate if stats else 0.0
+
+    def is_failing(self, model: str, max_error_rate: float, cooldown: float) -> bool:
+        """
+        Indica se o modelo deve ser evitado: taxa de erro acima do limite e falha recente
+
+        Passado o cooldown sem falhas o modelo volta a ser tentado, para que a taxa de
+        erro possa se recuperar.
+        """
+        stats = self._stats.get(model)
+        return (stats is not None and stats.error_rate > max_error_rate
+                and self.clock() - stats.last_failure_at < cooldown)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Resumo por modelo"""
+        with self._lock:
+            return {
+                model: {
+                    "calls": stats.calls,
+                    "errors": stats.errors,
+                    "latency": round(stats.latency, 4) if stats.latency is not None else None,
+                    "error_rate": round(stats.error_rate, 4),
+                    "input_tokens": stats.input_tokens,
+                    "output_tokens": stats.output_tokens,
+                    "cost_usd": round(stats.cost, 6),
+                }
+                for model, stats in self._stats.items()
+            }
+
+
+class ModelRouter:
+    """
+    Escolhe modelo e orçamento de saída por requisição
+
+    Perguntas factuais curtas vão para o modelo mais leve, pedidos explícitos de
+    detalhes ("explique em detalhes", "compare") vão para o modelo maior e o resto
+    usa o modelo padrão. As estatísticas de cada modelo corrigem a escolha: um
+    nível com taxa de erro alta, ou cuja latência recente não cabe no tempo que
+    resta até o prazo da Alexa, é trocado por outro.
+    """
+
+    def __init__(self, models: Dict[str, str], output_tokens: Dict[str, int],
+                 tracker: Optional[ModelStatsTracker] = None, max_error_rate: float = 0.5,
+                 failure_cooldown: float = 60.0):
+        self.models = models
+        self.output_tokens = output_tokens
+        self.tracker = tracker or ModelStatsTracker()
+        self.max_error_rate = max_error_rate
+        self.failure_cooldown = failure_cooldown
+
+    @staticmethod
+    def classify(prompt: str) -> str:
+        """Nível de modelo indicado apenas pelo texto da pergunta"""
+        text = " ".join(prompt.lower().split())
+        if _DETAILED_PATTERN.search(text):
+            return TIER_DETAILED
+        if len(text.split()) <= SHORT_QUERY_WORDS and _FACTUAL_PATTERN.match(text):
+            return TIER_FAST
+        return TIER_DEFAULT
+
+    def route(self, prompt: str, time_budget: Optional[float] = None) -> ModelRoute:
+        """
+        Escolhe o modelo para a pergunta
+
+        Args:
+            prompt: Pergunta do usuário
+            time_budget: Segundos restantes até o prazo da resposta (None: sem prazo)
+
+        Returns:
+            Rota com nível, modelo e maxOutputTokens
+        """
+        tier = self.classify(prompt)
+        for candidate in self._candidates(tier):
+            model = self.models[candidate]
+            if self.tracker.is_failing(model, self.max_error_rate, self.failure_cooldown):
+                continue
+            latency = self.tracker.latency(model)
+            if time_budget is not None and latency is not None and latency > time_budget:
+                continue
+            tier = candidate
+            break
+
+        route = ModelRoute(tier, self.models[tier], self.output_tokens[tier])
+        self.tracker.registry.increment(f"gemini.router.{route.tier}")
+        return route
+
+    @staticmethod
+    def _candidates(tier: str) -> List[str]:
+        """Ordem de preferência: o nível pedido, depois os mais leves, depois os mais capazes"""
+        index = TIERS.index(tier)
+        lighter = list(reversed(TIERS[:index]))
+        heavier = list(TIERS[index + 1:])
+        return [tier] + lighter + heavier
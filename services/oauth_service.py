@@ -1,15 +1,92 @@
-from google_auth_oauthlib.flow import Flow
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
+import asyncio
+import functools
 import json
 import logging
-from typing import Dict, Any, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Dict, Any, Optional, Sequence, Tuple
 from config.settings import config
+from services.circuit_breaker import STATE_CLOSED, circuit_breaker_for
 import secrets
 import os
+import sys
+
+if TYPE_CHECKING:
+    import httpx
 
 logger = logging.getLogger(__name__)
 
+TOKEN_URI = "https://oauth2.googleapis.com/token"
+REVOKE_URI = "https://oauth2.googleapis.com/revoke"
+
+
+# Renova tokens que expiram em menos que isso (mesma margem da biblioteca de autenticação do Google)
+REFRESH_MARGIN = 225.0
+
+
+class UserToken:
+    """
+    Tokens OAuth de um usuário
+    
+    Só os dados por usuário: token_uri, client_id e client_secret são os do
+    serviço, e os escopos apontam para uma tupla compartilhada entre os usuários
+    com o mesmo conjunto. Registros não são alterados: uma renovação troca o
+    registro inteiro, então uma cópia rasa do dicionário é um retrato consistente.
+    """
+    
+    __slots__ = ("access_token", "refresh_token", "expiry", "scopes")
+    
+    def __init__(self, access_token: str, refresh_token: Optional[str], expiry: Optional[float],
+                 scopes: Tuple[str, ...]):
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        # Expiração em segundos desde a época (UTC) ou None se não expira
+        self.expiry = expiry
+        self.scopes = scopes
+    
+    def expires_within(self, seconds: float) -> bool:
+        """True se o token expira em menos de `seconds` segundos"""
+        return self.expiry is not None and self.expiry - time.time() < seconds
+    
+    def expiry_datetime(self) -> Optional[datetime]:
+        """Expiração em UTC sem fuso (formato usado pela biblioteca do Google e pelo arquivo)"""
+        if self.expiry is None:
+            return None
+        return datetime.fromtimestamp(self.expiry, timezone.utc).replace(tzinfo=None)
+
+
+def _parse_expiry(value: Optional[str]) -> Optional[float]:
+    """Expiração do arquivo (ISO em UTC, sem fuso) em segundos desde a época"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp()
+
+
+def _is_upstream_failure(error: Exception) -> bool:
+    """Só erros de rede e 5xx/429 abrem o circuito; código ou token inválido é problema do usuário"""
+    response = getattr(error, "response", None)
+    if response is not None:
+        return response.status_code >= 500 or response.status_code == 429
+    return True
+
+
+def _is_refresh_failure(error: Exception) -> bool:
+    """
+    Só falhas transitórias do servidor OAuth abrem o circuito na renovação
+
+    A biblioteca do Google levanta RefreshError sem resposta HTTP e marca como
+    retryable os 5xx/429 e erros temporários; invalid_grant e os demais 4xx (token
+    revogado ou expirado de um usuário) não indicam problema no upstream.
+    """
+    from google.auth.exceptions import RefreshError
+    
+    if isinstance(error, RefreshError):
+        return error.retryable
+    return _is_upstream_failure(error)
+
+
 class OAuthService:
     """Serviço para gerenciar autenticação OAuth com Google"""
     
@@ -21,11 +98,79 @@ class OAuthService:
         
         # Armazenamento temporário de estados OAuth (em produção, usar Redis ou banco de dados)
         self.oauth_states = {}
-        self.user_tokens = {}
+        self.user_tokens: Dict[str, UserToken] = {}
+        # Conjuntos de escopos compartilhados entre os registros de tokens
+        self._scope_sets: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+        self.default_scopes = self.intern_scopes(self.scopes)
+        
+        # Cliente HTTP assíncrono com conexões reaproveitadas (criado na pré-carga ou no primeiro uso)
+        self._http: Optional["httpx.AsyncClient"] = None
+        self._http_lock = threading.Lock()
+        # Trabalho bloqueante da vinculação de contas, isolado do pool que atende a Alexa
+        self.executor = ThreadPoolExecutor(max_workers=max(1, config.OAUTH_WORKERS), thread_name_prefix="oauth")
+        # Gravações do arquivo de tokens em série; pedidos enquanto uma grava são agrupados
+        self._save_lock = asyncio.Lock()
+        self._save_pending = False
+        # Mudanças nos tokens em memória (ex: renovações) e a última já gravada no arquivo
+        self._changes = 0
+        self._saved_changes = 0
+        self._file_lock = threading.Lock()
+        self._flush_stop = threading.Event()
+        self._flush_thread: Optional[threading.Thread] = None
+        
+        # Falha rápida na renovação de tokens quando o servidor OAuth do Google está fora do ar
+        self.refresh_breaker = circuit_breaker_for(
+            "oauth",
+            failure_rate_threshold=config.CIRCUIT_FAILURE_RATE,
+            min_calls=config.CIRCUIT_MIN_CALLS,
+            open_duration=config.CIRCUIT_OPEN_SECONDS
+        )
         
         if not all([self.client_id, self.client_secret, self.redirect_uri]):
             logger.warning("Configurações OAuth não completas. Serviço OAuth não funcionará.")
     
+    def intern_scopes(self, scopes: Sequence[str]) -> Tuple[str, ...]:
+        """Tupla compartilhada com os escopos (a mesma para todos os usuários com o mesmo conjunto)"""
+        key = tuple(sys.intern(scope) for scope in scopes)
+        return self._scope_sets.setdefault(key, key)
+    
+    def set_user_token(self, user_id: str, access_token: str, refresh_token: Optional[str] = None,
+                       expiry: Optional[float] = None, scopes: Optional[Sequence[str]] = None) -> UserToken:
+        """
+        Armazena (ou substitui) os tokens de um usuário
+        
+        Args:
+            user_id: ID do usuário
+            access_token: Token de acesso
+            refresh_token: Token de renovação
+            expiry: Expiração em segundos desde a época (UTC)
+            scopes: Escopos concedidos (padrão: os do serviço)
+            
+        Returns:
+            Registro armazenado
+        """
+        record = UserToken(access_token, refresh_token, expiry,
+                           self.default_scopes if scopes is None else self.intern_scopes(scopes))
+        self.user_tokens[user_id] = record
+        self.mark_dirty()
+        return record
+    
+    def load_client_libraries(self):
+        """
+        Importa as bibliotecas OAuth do Google e cria o cliente HTTP assíncrono
+        
+        Os imports ficam dentro dos métodos para não atrasar a inicialização do
+        processo; chamar esta função em segundo plano evita que a primeira
+        vinculação ou renovação de token pague o custo.
+        """
+        import google_auth_oauthlib.flow  # noqa: F401
+        import google.auth.transport.requests  # noqa: F401
+        import google.oauth2.credentials  # noqa: F401
+        # Backend asyncio do anyio, importado pelo httpx na primeira requisição (dentro do event loop)
+        import anyio._backends._asyncio  # noqa: F401
+        # O cliente carrega os certificados de CA ao ser criado (~100 ms que travariam o event loop)
+        self.http_client()
+    
     def create_authorization_url(self, user_id: str) -> Dict[str, Any]:
         """
         Cria URL de autorização OAuth para o usuário
@@ -43,13 +188,15 @@ class OAuthService:
             }
         
         try:
+            from google_auth_oauthlib.flow import Flow
+            
             # Cria configuração do cliente OAuth
             client_config = {
                 "web": {
                     "client_id": self.client_id,
                     "client_secret": self.client_secret,
                     "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                    "token_uri": "https://oauth2.googleapis.com/token",
+                    "token_uri": TOKEN_URI,
                     "redirect_uris": [self.redirect_uri]
                 }
             }
@@ -71,10 +218,10 @@ class OAuthService:
                 state=state
             )
             
-            # Armazena o estado e flow para validação posterior
+            # Armazena o estado e o code_verifier (PKCE) para a troca do código no callback
             self.oauth_states[state] = {
                 "user_id": user_id,
-                "flow": flow
+                "code_verifier": flow.code_verifier
             }
             
             logger.info(f"URL de autorização criada para usuário {user_id}")
@@ -92,7 +239,34 @@ class OAuthService:
                 "error": str(e)
             }
     
-    def handle_oauth_callback(self, authorization_code: str, state: str) -> Dict[str, Any]:
+    def http_client(self) -> "httpx.AsyncClient":
+        """Cliente HTTP assíncrono compartilhado (pool de conexões com o servidor OAuth do Google)"""
+        if self._http is None:
+            # Criado pela pré-carga em segundo plano ou, se ela ainda não rodou, no primeiro uso
+            with self._http_lock:
+                if self._http is None:
+                    import httpx
+                    
+                    self._http = httpx.AsyncClient(
+                        timeout=config.OAUTH_REQUEST_TIMEOUT,
+                        limits=httpx.Limits(max_connections=config.OAUTH_MAX_CONNECTIONS,
+                                            max_keepalive_connections=config.OAUTH_MAX_CONNECTIONS)
+                    )
+        return self._http
+    
+    async def aclose(self):
+        """Fecha o cliente HTTP e o pool de trabalho (encerramento da aplicação)"""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+        self.executor.shutdown(wait=False)
+    
+    async def run_blocking(self, func, *args, **kwargs):
+        """Executa uma função bloqueante no pool do OAuth, sem ocupar o event loop nem o pool da Alexa"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+    
+    async def handle_oauth_callback(self, authorization_code: str, state: str) -> Dict[str, Any]:
         """
         Processa o callback OAuth e obtém tokens de acesso
         
@@ -103,43 +277,53 @@ class OAuthService:
         Returns:
             Dict contendo informações do usuário e tokens
         """
-        if state not in self.oauth_states:
+        # O código só pode ser trocado uma vez: o estado é consumido já na chegada
+        oauth_data = self.oauth_states.pop(state, None)
+        if oauth_data is None:
             return {
                 "success": False,
                 "error": "Estado OAuth inválido"
             }
         
         try:
-            oauth_data = self.oauth_states[state]
-            flow = oauth_data["flow"]
             user_id = oauth_data["user_id"]
+            data = {
+                "code": authorization_code,
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "redirect_uri": self.redirect_uri,
+                "grant_type": "authorization_code"
+            }
+            if oauth_data.get("code_verifier"):
+                data["code_verifier"] = oauth_data["code_verifier"]
             
             # Troca o código de autorização por tokens
-            flow.fetch_token(code=authorization_code)
+            with self.refresh_breaker.call(is_failure=_is_upstream_failure):
+                response = await self.http_client().post(TOKEN_URI, data=data)
+                response.raise_for_status()
+            token = response.json()
             
-            # Obtém as credenciais
-            credentials = flow.credentials
+            # Sem prompt de consentimento o Google não reenvia o refresh token: mantém o anterior
+            previous = self.user_tokens.get(user_id)
+            refresh_token = token.get("refresh_token") or (previous.refresh_token if previous else None)
+            expires_in = token.get("expires_in")
             
             # Armazena os tokens do usuário
-            self.user_tokens[user_id] = {
-                "access_token": credentials.token,
-                "refresh_token": credentials.refresh_token,
-                "token_uri": credentials.token_uri,
-                "client_id": credentials.client_id,
-                "client_secret": credentials.client_secret,
-                "scopes": credentials.scopes
-            }
-            
-            # Remove o estado usado
-            del self.oauth_states[state]
+            self.set_user_token(
+                user_id,
+                token["access_token"],
+                refresh_token,
+                expiry=time.time() + int(expires_in) if expires_in else None,
+                scopes=token["scope"].split() if token.get("scope") else None
+            )
             
             logger.info(f"OAuth concluído com sucesso para usuário {user_id}")
             
             return {
                 "success": True,
                 "user_id": user_id,
-                "access_token": credentials.token,
-                "refresh_token": credentials.refresh_token
+                "access_token": token["access_token"],
+                "refresh_token": refresh_token
             }
             
         except Exception as e:
@@ -149,50 +333,56 @@ class OAuthService:
                 "error": str(e)
             }
     
-    def get_user_access_token(self, user_id: str) -> Optional[str]:
+    def get_user_access_token(self, user_id: str, min_validity: float = 0) -> Optional[str]:
         """
         Obtém token de acesso válido para o usuário
         
         Args:
             user_id: ID do usuário
+            min_validity: Renova antecipadamente se o token expirar em menos de tantos segundos
             
         Returns:
             Token de acesso válido ou None
         """
-        if user_id not in self.user_tokens:
+        record = self.user_tokens.get(user_id)
+        if record is None:
             return None
         
+        # Caminho comum: token ainda válido, sem criar credenciais nem alocar
+        if not record.refresh_token or not record.expires_within(max(min_validity, REFRESH_MARGIN)):
+            return record.access_token
+        
         try:
-            token_data = self.user_tokens[user_id]
+            from google.oauth2.credentials import Credentials
+            from google.auth.transport.requests import Request
             
-            # Cria credenciais a partir dos dados armazenados
             credentials = Credentials(
-                token=token_data["access_token"],
-                refresh_token=token_data["refresh_token"],
-                token_uri=token_data["token_uri"],
-                client_id=token_data["client_id"],
-                client_secret=token_data["client_secret"],
-                scopes=token_data["scopes"]
+                token=record.access_token,
+                refresh_token=record.refresh_token,
+                token_uri=TOKEN_URI,
+                client_id=self.client_id,
+                client_secret=self.client_secret,
+                scopes=list(record.scopes),
+                expiry=record.expiry_datetime()
             )
-            
-            # Verifica se o token precisa ser atualizado
-            if credentials.expired and credentials.refresh_token:
+            with self.refresh_breaker.call(is_failure=_is_refresh_failure):
                 credentials.refresh(Request())
-                
-                # Atualiza os tokens armazenados
-                self.user_tokens[user_id]["access_token"] = credentials.token
-                
-                logger.info(f"Token atualizado para usuário {user_id}")
             
+            # Atualiza os tokens armazenados (registro novo: leitores concorrentes veem o antigo ou o novo)
+            expiry = credentials.expiry.replace(tzinfo=timezone.utc).timestamp() if credentials.expiry else None
+            self.user_tokens[user_id] = UserToken(credentials.token, record.refresh_token, expiry, record.scopes)
+            self.mark_dirty()
+            
+            logger.info(f"Token atualizado para usuário {user_id}")
             return credentials.token
             
         except Exception as e:
             logger.error(f"Erro ao obter token de acesso para usuário {user_id}: {str(e)}")
             return None
     
-    def revoke_user_access(self, user_id: str) -> bool:
+    async def revoke_user_access(self, user_id: str) -> bool:
         """
-        Revoga acesso do usuário (remove tokens armazenados)
+        Revoga acesso do usuário no Google e remove os tokens armazenados
         
         Args:
             user_id: ID do usuário
@@ -200,16 +390,25 @@ class OAuthService:
         Returns:
             True se revogado com sucesso
         """
-        try:
-            if user_id in self.user_tokens:
-                del self.user_tokens[user_id]
-                logger.info(f"Acesso revogado para usuário {user_id}")
-                return True
-            return False
-            
-        except Exception as e:
-            logger.error(f"Erro ao revogar acesso para usuário {user_id}: {str(e)}")
+        token_data = self.user_tokens.pop(user_id, None)
+        if token_data is None:
             return False
+        self.mark_dirty()
+        logger.info(f"Acesso revogado para usuário {user_id}")
+        
+        # Revogar o refresh token invalida também os tokens de acesso emitidos a partir dele
+        token = token_data.refresh_token or token_data.access_token
+        if token:
+            try:
+                with self.refresh_breaker.call(is_failure=_is_upstream_failure):
+                    response = await self.http_client().post(REVOKE_URI, data={"token": token})
+                # 400 (invalid_token): o token já estava revogado ou expirado no Google
+                if response.status_code not in (200, 400):
+                    response.raise_for_status()
+            except Exception as e:
+                # Os tokens já foram descartados localmente; o usuário pode remover o acesso na conta Google
+                logger.warning(f"Não foi possível revogar o token no Google para usuário {user_id}: {str(e)}")
+        return True
     
     def is_user_authenticated(self, user_id: str) -> bool:
         """
@@ -223,20 +422,127 @@ class OAuthService:
         """
         return user_id in self.user_tokens and self.get_user_access_token(user_id) is not None
     
-    def save_tokens_to_file(self, filepath: str = "user_tokens.json"):
+    def refresh_unavailable(self, user_id: str) -> bool:
+        """
+        Verifica se o usuário está vinculado mas o token não pode ser renovado agora
+        porque o circuito do servidor OAuth do Google está aberto
+        
+        Args:
+            user_id: ID do usuário
+            
+        Returns:
+            True se a falha é temporária (não é preciso vincular a conta de novo)
+        """
+        return user_id in self.user_tokens and self.refresh_breaker.state != STATE_CLOSED
+    
+    def mark_dirty(self):
+        """Registra uma mudança nos tokens em memória, a gravar na próxima flush_tokens()"""
+        self._changes += 1
+    
+    @property
+    def dirty(self) -> bool:
+        """Há mudanças nos tokens ainda não gravadas no arquivo"""
+        return self._changes != self._saved_changes
+    
+    def flush_tokens(self, filepath: str = "user_tokens.json") -> bool:
+        """
+        Grava os tokens se houver mudanças desde a última gravação
+        
+        As renovações feitas por get_user_access_token só marcam os tokens como
+        alterados; esta função grava todas de uma vez (periodicamente e no encerramento).
+        
+        Args:
+            filepath: Caminho do arquivo para salvar
+            
+        Returns:
+            True se o arquivo foi gravado
+        """
+        if not self.dirty:
+            return False
+        return self._write_snapshot(filepath)
+    
+    def _write_snapshot(self, filepath: str) -> bool:
+        with self._file_lock:
+            changes = self._changes
+            if not self.save_tokens_to_file(filepath, dict(self.user_tokens)):
+                return False
+            self._saved_changes = max(self._saved_changes, changes)
+            return True
+    
+    def start_token_flusher(self, interval: float = config.TOKEN_FLUSH_INTERVAL, filepath: str = "user_tokens.json"):
+        """Inicia a gravação periódica dos tokens alterados (não faz nada com interval <= 0)"""
+        if interval <= 0 or self._flush_thread is not None:
+            return
+        self._flush_stop.clear()
+        
+        def loop():
+            while not self._flush_stop.wait(interval):
+                self.flush_tokens(filepath)
+        
+        self._flush_thread = threading.Thread(target=loop, name="oauth-token-flusher", daemon=True)
+        self._flush_thread.start()
+    
+    def stop_token_flusher(self, timeout: Optional[float] = None):
+        """Interrompe a gravação periódica"""
+        self._flush_stop.set()
+        if self._flush_thread is not None:
+            self._flush_thread.join(timeout)
+            self._flush_thread = None
+    
+    async def persist_tokens(self, filepath: str = "user_tokens.json"):
+        """
+        Salva os tokens no pool do OAuth, sem bloquear o event loop
+        
+        Pedidos feitos enquanto uma gravação está em andamento são atendidos por
+        uma única gravação seguinte, com o estado mais recente.
+        
+        Args:
+            filepath: Caminho do arquivo para salvar
+        """
+        self._save_pending = True
+        async with self._save_lock:
+            if not self._save_pending:
+                return
+            self._save_pending = False
+            await self.run_blocking(self._write_snapshot, filepath)
+    
+    def _token_dict(self, record: UserToken) -> Dict[str, Any]:
+        # Formato do arquivo com todos os campos, legível por versões anteriores
+        expiry = record.expiry_datetime()
+        return {
+            "access_token": record.access_token,
+            "refresh_token": record.refresh_token,
+            "token_uri": TOKEN_URI,
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "scopes": list(record.scopes),
+            "expiry": expiry.isoformat() if expiry else None
+        }
+    
+    def save_tokens_to_file(self, filepath: str = "user_tokens.json", tokens: Optional[Dict[str, UserToken]] = None) -> bool:
         """
         Salva tokens em arquivo (para persistência)
         
         Args:
             filepath: Caminho do arquivo para salvar
+            tokens: Tokens a salvar (padrão: os atuais)
+            
+        Returns:
+            True se gravado com sucesso
         """
         try:
-            with open(filepath, 'w') as f:
-                json.dump(self.user_tokens, f, indent=2)
+            tokens = dict(self.user_tokens) if tokens is None else tokens
+            # Grava num arquivo temporário e substitui: uma falha no meio não corrompe os tokens salvos
+            temp_path = f"{filepath}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump({user_id: self._token_dict(record) for user_id, record in tokens.items()}, f, indent=2)
+            os.replace(temp_path, filepath)
             logger.info(f"Tokens salvos em {filepath}")
+            return True
             
         except Exception as e:
             logger.error(f"Erro ao salvar tokens: {str(e)}")
+            return False
     
     def load_tokens_from_file(self, filepath: str = "user_tokens.json"):
         """
@@ -248,8 +554,15 @@ class OAuthService:
         try:
             if os.path.exists(filepath):
                 with open(filepath, 'r') as f:
-                    self.user_tokens = json.load(f)
-                logger.info(f"Tokens carregados de {filepath}")
+                    data = json.load(f)
+                # Só os campos por usuário; token_uri, client_id e client_secret são os do serviço
+                self.user_tokens = {
+                    user_id: UserToken(item["access_token"], item.get("refresh_token"),
+                                       _parse_expiry(item.get("expiry")),
+                                       self.intern_scopes(item.get("scopes") or self.scopes))
+                    for user_id, item in data.items()
+                }
+                logger.info(f"Tokens carregados de {filepath}: {len(self.user_tokens)} usuários")
             
         except Exception as e:
             logger.error(f"Erro ao carregar tokens: {str(e)}")
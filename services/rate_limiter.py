@@ -0,0 +1,122 @@
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional, Tuple
+
+
+class TokenBucket:
+    """
+    Token bucket thread-safe para respeitar a cota de requisições de uma API
+
+    rate tokens são repostos por segundo até o limite de capacity (rajada
+    permitida); com rate <= 0 não há cota local. pause_until() suspende a
+    reposição até um instante informado pelo servidor (cabeçalho Retry-After),
+    valendo para todas as threads, também sem cota local.
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = capacity
+        self.paused_until = 0.0
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        start = max(self._updated_at, self.paused_until)
+        if now > start:
+            self.tokens = min(self.capacity, self.tokens + (now - start) * self.rate)
+        self._updated_at = max(now, self._updated_at)
+
+    def _reserve(self) -> float:
+        """Consome um token se disponível; senão retorna quantos segundos faltam para o próximo"""
+        now = self.clock()
+        if self.rate <= 0:
+            return max(0.0, self.paused_until - now)
+        self._refill(now)
+        if now < self.paused_until:
+            return self.paused_until - now + max(0.0, 1 - self.tokens) / self.rate
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def try_acquire(self) -> bool:
+        """Consome um token sem esperar"""
+        with self._lock:
+            return self._reserve() == 0.0
+
+    def acquire(self, deadline: Optional[float] = None) -> bool:
+        """
+        Aguarda até haver um token disponível
+
+        Args:
+            deadline: Instante (no relógio do bucket) após o qual não vale mais a pena esperar
+
+        Returns:
+            True se o token foi obtido, False se ele só estaria disponível após o prazo
+        """
+        while True:
+            with self._lock:
+                wait = self._reserve()
+            if wait == 0.0:
+                return True
+            if deadline is not None and self.clock() + wait > deadline:
+                return False
+            self.sleep(wait)
+
+    def pause_until(self, instant: float):
+        """Suspende a liberação de tokens até o instante informado (ex: Retry-After de um 429)"""
+        with self._lock:
+            self._refill(self.clock())
+            if instant > self.paused_until:
+                self.paused_until = instant
+                self.tokens = 0.0
+
+
+_buckets: Dict[Tuple[str, float, float], TokenBucket] = {}
+_buckets_lock = threading.Lock()
+
+
+def token_bucket_for(key: str, rate: float, capacity: float) -> TokenBucket:
+    """
+    Retorna o bucket compartilhado de uma chave de API
+
+    Todas as instâncias de serviço que usam a mesma chave consomem a mesma cota.
+    rate <= 0 desativa a cota local (só as pausas pedidas pelo servidor valem).
+    """
+    rate = max(0.0, rate)
+    with _buckets_lock:
+        bucket = _buckets.get((key, rate, capacity))
+        if bucket is None:
+            bucket = _buckets[(key, rate, capacity)] = TokenBucket(rate, capacity)
+        return bucket
+
+
+def parse_retry_after(value: Optional[str], now: Optional[datetime] = None) -> Optional[float]:
+    """
+    Interpreta o cabeçalho Retry-After
+
+    Args:
+        value: Segundos ("12") ou data HTTP ("Wed, 21 Oct 2026 07:28:00 GMT")
+        now: Instante atual (UTC), para o formato de data
+
+    Returns:
+        Segundos a aguardar, ou None se o valor estiver ausente ou inválido
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - (now or datetime.now(timezone.utc))).total_seconds())
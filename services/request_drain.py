@@ -0,0 +1,84 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Iterable
+
+from services.metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+_DRAINING_BODY = json.dumps({"detail": "Serviço em encerramento"}).encode("utf-8")
+
+
+class RequestDrain:
+    """
+    Requisições em andamento e estado de encerramento do serviço
+
+    Depois de start_draining(), novas requisições são recusadas com 503 (exceto os
+    caminhos liberados, como /health, que passa a indicar o encerramento) e
+    wait_idle() espera as que já estavam em andamento terminarem.
+    """
+
+    def __init__(self, registry: MetricsRegistry = metrics):
+        self.metrics = registry
+        self.in_flight = 0
+        self.draining = False
+
+    def start_draining(self):
+        """Passa a recusar novas requisições"""
+        if not self.draining:
+            self.draining = True
+            logger.info(f"Encerrando: novas requisições recusadas, {self.in_flight} em andamento")
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """
+        Espera as requisições em andamento terminarem
+
+        Args:
+            timeout: Tempo máximo de espera, em segundos
+
+        Returns:
+            True se todas terminaram dentro do prazo
+        """
+        start = time.monotonic()
+        # Consulta periódica: não prende o estado a um event loop específico
+        while self.in_flight > 0:
+            if time.monotonic() - start >= timeout:
+                logger.warning(f"Encerrando com {self.in_flight} requisições ainda em andamento após {timeout:.1f}s")
+                self.metrics.increment("shutdown.abandoned_requests", self.in_flight)
+                return False
+            await asyncio.sleep(0.05)
+        self.metrics.observe("shutdown.drain_seconds", time.monotonic() - start)
+        return True
+
+
+class RequestDrainMiddleware:
+    """Middleware ASGI que conta as requisições em andamento e recusa novas durante o encerramento"""
+
+    def __init__(self, app, drain: RequestDrain, exempt_paths: Iterable[str] = ("/health",)):
+        self.app = app
+        self.drain = drain
+        self.exempt_paths = frozenset(exempt_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        if self.drain.draining:
+            self.drain.metrics.increment("shutdown.rejected_requests")
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [(b"content-type", b"application/json"), (b"connection", b"close"),
+                            (b"retry-after", b"1"), (b"content-length", str(len(_DRAINING_BODY)).encode())],
+            })
+            await send({"type": "http.response.body", "body": _DRAINING_BODY})
+            return
+
+        self.drain.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.drain.in_flight -= 1
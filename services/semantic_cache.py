@@ -0,0 +1,292 @@
+import logging
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from typing import Callable, FrozenSet, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+# Palavras que não mudam o assunto da pergunta ("me explica", "o que é", "por favor").
+# Negações ("não", "nunca", "nem") mudam o sentido e não podem entrar aqui
+STOPWORDS = frozenset(
+    "a o as os um uma uns umas de do da dos das no na nos nas em e ou que qual quais "
+    "me te se eu voce sabe sobre pra para por favor fale fala falar diga dizer conte contar "
+    "explica explique explicar significa isso alexa gemini quero saber".split()
+)
+
+# Siglas faladas expandidas para o termo completo
+ABBREVIATIONS = {
+    "ia": "inteligencia artificial",
+    "eua": "estados unidos",
+    "onu": "organizacao das nacoes unidas",
+}
+
+# Perguntas cuja resposta muda com o tempo: nunca servidas do cache
+VOLATILE_WORDS = frozenset(
+    "hoje agora amanha ontem hora horas horario clima previsao noticia noticias "
+    "placar cotacao dolar preco".split()
+)
+
+# Palavras que invertem ou trocam a resposta de perguntas quase iguais ("quantos gols Pelé
+# fez" e "não fez", "maior rio" e "menor rio", "primeiro presidente" e "segundo"). Nenhum
+# embedding separa bem esses pares: as duas perguntas precisam ter as mesmas
+NEGATIONS = frozenset("nao nunca nem jamais nenhum nada ninguem sem".split())
+NUMBERS = frozenset(
+    "zero dois tres quatro cinco seis sete oito nove dez onze doze treze catorze quatorze quinze "
+    "dezesseis dezessete dezoito dezenove vinte trinta quarenta cinquenta sessenta setenta oitenta "
+    "noventa cem cento duzentos trezentos mil milhao milhoes bilhao bilhoes".split()
+)
+ORDINALS = frozenset(
+    "primeiro segundo terceiro quarto quinto sexto setimo oitavo nono decimo penultimo ultimo".split()
+)
+ANTONYMS = [
+    ("maior", "menor"), ("mais", "menos"), ("melhor", "pior"), ("antes", "depois"), ("alto", "baixo"),
+    ("grande", "pequeno"), ("quente", "frio"), ("longe", "perto"), ("cedo", "tarde"), ("caro", "barato"),
+    ("rapido", "lento"), ("forte", "fraco"), ("facil", "dificil"), ("certo", "errado"), ("novo", "velho"),
+    ("rico", "pobre"), ("vivo", "morto"), ("cheio", "vazio"), ("dentro", "fora"), ("acima", "abaixo"),
+    ("inicio", "fim"), ("comeco", "fim"), ("norte", "sul"), ("leste", "oeste"), ("ganhar", "perder"),
+    ("comprar", "vender"), ("abrir", "fechar"), ("entrar", "sair"), ("subir", "descer"), ("ligar", "desligar"),
+    ("positivo", "negativo"), ("minimo", "maximo"),
+]
+MEANING_WORDS = NEGATIONS | NUMBERS | ORDINALS | frozenset(word for pair in ANTONYMS for word in pair)
+# Prefixos que negam o radical ("ligar" e "desligar", "possível" e "impossível")
+NEGATING_PREFIXES = ("des", "anti", "contra", "in", "im", "ir")
+_STEM = 4
+
+_NON_WORD = re.compile(r"[^a-z0-9 ]+")
+
+
+def fold_words(text: str) -> List[str]:
+    """Palavras do texto sem acentos, caixa nem pontuação ("Que horas são?" -> ["que", "horas", "sao"])"""
+    text = unicodedata.normalize("NFKD", text.lower()).encode("ascii", "ignore").decode("ascii")
+    return _NON_WORD.sub(" ", text).split()
+
+
+def normalize_question(text: str) -> List[str]:
+    """
+    Palavras significativas da pergunta: sem acentos, caixa, pontuação nem palavras de
+    preenchimento, com siglas expandidas ("Me explica IA?" -> ["inteligencia", "artificial"])
+    """
+    words = []
+    for word in fold_words(text):
+        word = ABBREVIATIONS.get(word, word)
+        words.extend(w for w in word.split() if w not in STOPWORDS)
+    return words
+
+
+def is_volatile(words: Sequence[str]) -> bool:
+    """A resposta depende do momento da pergunta (hora, clima, notícias...)"""
+    return any(word in VOLATILE_WORDS for word in words)
+
+
+def _meaning_word(word: str) -> Optional[str]:
+    """Forma base de uma palavra de MEANING_WORDS (sem plural nem feminino), ou None"""
+    if word.isdigit():
+        return word
+    for candidate in (word, word[:-1], word[:-2]):
+        if candidate.endswith("a") and candidate[:-1] + "o" in MEANING_WORDS:
+            return candidate[:-1] + "o"
+        if candidate in MEANING_WORDS:
+            return candidate
+    return None
+
+
+def _negated_stems(words: FrozenSet[str]) -> FrozenSet[str]:
+    """Radicais das palavras com prefixo de negação ("desligar" -> "liga")"""
+    stems = set()
+    for word in words:
+        for prefix in NEGATING_PREFIXES:
+            if word.startswith(prefix) and len(word) - len(prefix) >= _STEM:
+                stems.add(word[len(prefix):len(prefix) + _STEM])
+    return frozenset(stems)
+
+
+def same_meaning(first: FrozenSet[str], second: FrozenSet[str]) -> bool:
+    """
+    Duas perguntas parecidas (palavras de normalize_question) podem dividir a resposta:
+    mesmos números, negações, ordinais e palavras de pares de antônimos, e nenhuma
+    palavra com prefixo de negação cujo radical aparece sem o prefixo só na outra
+
+    Args:
+        first: Palavras da primeira pergunta
+        second: Palavras da segunda pergunta
+
+    Returns:
+        False se as perguntas provavelmente pedem respostas diferentes
+    """
+    if first == second:
+        return True
+    markers = [{_meaning_word(word) for word in words} - {None} for words in (first, second)]
+    if markers[0] != markers[1]:
+        return False
+    only_first, only_second = first - second, second - first
+    for words, others in ((only_first, only_second), (only_second, only_first)):
+        stems = _negated_stems(words)
+        if any(word[:_STEM] in stems for word in others):
+            return False
+    return True
+
+
+class HashingEmbedder:
+    """
+    Embedding local em CPU, sem modelo nem rede: palavras e trigramas de caracteres
+    da pergunta normalizada, projetados por hashing em um vetor de dimensão fixa
+
+    Pega variações de transcrição, ordem, plural e palavras de preenchimento; não pega
+    sinônimos (para isso, use os embeddings do Gemini). Perguntas longas de sentido
+    oposto passam de 0.9 ("ligar" e "desligar o modo avião no celular": 0.93): o
+    cache só as separa pela verificação de same_meaning.
+    """
+
+    def __init__(self, dimensions: int = 1024):
+        self.dimensions = dimensions
+
+    def __call__(self, text: str) -> Optional[np.ndarray]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in normalize_question(text):
+            padded = f"#{word}#"
+            features = [word] * 2 + [padded[i:i + 3] for i in range(len(padded) - 2)]
+            for feature in features:
+                digest = zlib.crc32(feature.encode("utf-8"))
+                vector[digest % self.dimensions] += 1.0 if digest & 0x80000000 else -1.0
+        return vector
+
+
+class SemanticAnswerCache:
+    """
+    Cache de respostas por similaridade de significado da pergunta
+
+    Cada pergunta é convertida em embedding (normalizado) e comparada por produto
+    interno com todas as perguntas já respondidas (força bruta NumPy: uma
+    multiplicação matriz-vetor). A resposta da mais parecida é servida se a
+    similaridade passar do limiar e as duas perguntas passarem em same_meaning
+    (mesmos números, negações, ordinais e antônimos). Entradas expiram após ttl
+    segundos; com o cache cheio, a entrada expirada ou menos usada é substituída.
+
+    Perguntas sobre o momento ("hoje", "agora", clima, notícias) não entram no cache.
+    """
+
+    def __init__(self, embedder: Callable[[str], Optional[Sequence[float]]], threshold: float = 0.9,
+                 max_size: int = 5000, ttl: float = 21600.0, clock: Callable[[], float] = time.monotonic,
+                 registry: MetricsRegistry = metrics):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.metrics = registry
+        self._lock = threading.Lock()
+        # Matriz de embeddings alocada no primeiro uso (dimensão do embedder)
+        self._vectors: Optional[np.ndarray] = None
+        self._stored_at = np.full(max_size, -np.inf)
+        self._last_used = np.full(max_size, -np.inf)
+        self._answers: List[Optional[str]] = [None] * max_size
+        self._words: List[FrozenSet[str]] = [frozenset()] * max_size
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def embed(self, question: str) -> Optional[np.ndarray]:
+        """
+        Embedding normalizado da pergunta, ou None se ela não deve usar o cache
+        (pergunta volátil ou vazia, ou falha do embedder)
+        """
+        words = normalize_question(question)
+        if not words or is_volatile(words):
+            self.metrics.increment("semantic_cache.skipped")
+            return None
+        try:
+            values = self.embedder(question)
+        except Exception as e:
+            logger.warning(f"Falha ao calcular embedding da pergunta: {str(e)}")
+            values = None
+        if values is None:
+            self.metrics.increment("semantic_cache.embed_failures")
+            return None
+        vector = np.asarray(values, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            return None
+        return vector / norm
+
+    def lookup(self, question: str) -> Tuple[Optional[np.ndarray], Optional[str]]:
+        """
+        Procura uma pergunta equivalente já respondida
+
+        Args:
+            question: Pergunta do usuário
+
+        Returns:
+            (embedding da pergunta para um add() posterior, resposta em cache ou None)
+        """
+        vector = self.embed(question)
+        if vector is None:
+            return None, None
+        match = self.nearest(vector, question)
+        if match is None:
+            self.metrics.increment("semantic_cache.misses")
+            return vector, None
+        similarity, answer = match
+        self.metrics.observe("semantic_cache.hit_similarity", similarity)
+        self.metrics.increment("semantic_cache.hits")
+        return vector, answer
+
+    def nearest(self, vector: np.ndarray, question: str) -> Optional[Tuple[float, str]]:
+        """
+        (similaridade, resposta) da pergunta válida mais parecida acima do limiar e com o
+        mesmo sentido (same_meaning) que question, ou None
+        """
+        words = frozenset(normalize_question(question))
+        with self._lock:
+            if self._size == 0 or self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                return None
+            now = self.clock()
+            scores = self._vectors[:self._size] @ vector
+            scores[self._stored_at[:self._size] < now - self.ttl] = -np.inf
+            candidates = np.flatnonzero(scores >= self.threshold)
+            for index in candidates[np.argsort(-scores[candidates])]:
+                if same_meaning(words, self._words[index]):
+                    self._last_used[index] = now
+                    return float(scores[index]), self._answers[index]
+            if candidates.size:
+                self.metrics.increment("semantic_cache.rejected_near_misses")
+            return None
+
+    def add(self, vector: np.ndarray, answer: str, question: str):
+        """Guarda a resposta de uma pergunta pelo seu embedding (o devolvido por lookup)"""
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                self._vectors = np.zeros((self.max_size, vector.shape[0]), dtype=np.float32)
+                self._size = 0
+            now = self.clock()
+            if self._size < self.max_size:
+                index = self._size
+                self._size += 1
+            else:
+                # Substitui uma entrada expirada ou, se não houver, a menos usada
+                expired = np.flatnonzero(self._stored_at < now - self.ttl)
+                index = int(expired[0]) if expired.size else int(np.argmin(self._last_used))
+                self.metrics.increment("semantic_cache.evictions")
+            self._vectors[index] = vector
+            self._stored_at[index] = now
+            self._last_used[index] = now
+            self._answers[index] = answer
+            self._words[index] = frozenset(normalize_question(question))
+            self.metrics.set_gauge("semantic_cache.size", self._size)
+
+    def clear(self):
+        """Remove todas as entradas"""
+        with self._lock:
+            self._size = 0
+            self._stored_at.fill(-np.inf)
+            self._last_used.fill(-np.inf)
+            self._answers = [None] * self.max_size
+            self._words = [frozenset()] * self.max_size
+            self.metrics.set_gauge("semantic_cache.size", 0)
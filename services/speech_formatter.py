@@ -0,0 +1,200 @@
+import re
+from typing import List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+# Padrões compilados uma única vez na importação. O texto é lido em trechos de
+# parágrafos inteiros e a leitura para assim que o limite de fala é atingido. Cada
+# trecho é convertido com poucas passadas sobre o trecho inteiro (regex e
+# str.replace, em C), sem laço em Python por linha: títulos, itens, tabelas e
+# parágrafos são registrados com marcadores internos, que no fim viram pontuação.
+# Os padrões de linha começam por "\n", o que deixa o motor de regex pular direto
+# para o início das linhas.
+_FENCE_PATTERN = re.compile(r"\n[ \t]*(?:```|~~~)")
+# Título, item, citação ou linha de tabela (grupo: o conteúdo da linha); linhas só
+# com marcação, como linhas horizontais e separadores de tabela, ficam vazias
+_BLOCK_LINE_PATTERN = re.compile(
+    r"\n[ \t]*(?:[-*_:|][-*_:| \t]*(?=[\n\x01])|#{1,6}[ \t]+|>[ \t]?|[-*+][ \t]+|\d{1,3}[.)][ \t]+|\|[ \t]*)([^\n]*)"
+)
+_TRAILING_SPACE_PATTERN = re.compile(r"[ \t]+\n")
+_TRAILING_SPACE_CHECK = re.compile(r"\n(?<=[ \t]\n)")
+# Fim de frase redundante: depois de pontuação, de espaço, de outro fim de frase ou
+# no início do parágrafo
+_REDUNDANT_CLOSE_PATTERN = re.compile(r"\x01(?<=[ .,:;!?\x01\x02]\x01)")
+_LINK_PATTERN = re.compile(r"\[([^\]\n\x01\x02]*)\]\([^)\n\x01\x02]*\)")   # links e imagens: mantém o texto
+_HTML_TAG_PATTERN = re.compile(r"</?[A-Za-z][^>\n\x01\x02]*>")
+_URL_PATTERN = re.compile(r"https?://[^\s)>\]\x01\x02]+")
+
+# Marcadores internos de fim de frase e de fim de parágrafo
+_CLOSE = "\x01"
+_PARAGRAPH = "\x02"
+_BLOCK_SENTENCE = _CLOSE + "\n{}" + _CLOSE
+_EMPTY_SENTENCE = _BLOCK_SENTENCE.format("")
+
+# Marcas de ênfase e de código inline são removidas (o conteúdo é mantido)
+_EMPHASIS_MARKERS = ("*", "__", "~~", "#", "`")
+_SENTENCE_END = ".!?"
+_PAUSE_PUNCTUATION = ".!?,;:"
+_SSML_PARAGRAPH_BREAK = '<break strength="strong"/>'
+
+# Caracteres do texto original lidos por caractere de fala permitido: a marcação
+# não é falada, então um trecho do tamanho do limite costuma render menos fala
+_READ_FACTOR = 1.5
+
+
+def _link_text(match: "re.Match") -> str:
+    return match.group(1)
+
+
+class SpeechFormatter:
+    """Converte markdown em texto (ou SSML) adequado para síntese de fala"""
+
+    def __init__(self, max_chars: int = 500, min_chars: int = 200):
+        self.max_chars = max_chars
+        self.min_chars = min_chars
+
+    def format(self, text: str, ssml: bool = False, max_chars: Optional[int] = None) -> str:
+        """
+        Formata o texto trecho a trecho, parando assim que o limite de fala é atingido
+
+        Args:
+            text: Texto original (markdown)
+            ssml: Se True, escapa o texto e converte parágrafos em pausas SSML
+            max_chars: Limite de caracteres falados (padrão: self.max_chars)
+
+        Returns:
+            Texto pronto para fala (sem a tag <speak> no modo SSML)
+        """
+        if not text:
+            return ""
+
+        limit = max_chars or self.max_chars
+        text = "\n" + text
+        paragraphs: List[str] = []
+        spoken = 0
+        start = 0
+        while start < len(text) and spoken <= limit:
+            chunk, start = self._next_chunk(text, start, int(limit * _READ_FACTOR))
+            for paragraph in self._convert(chunk, final=start >= len(text)):
+                paragraphs.append(paragraph)
+                spoken += len(paragraph) + 1
+
+        if spoken > limit:
+            paragraphs = self._truncate(paragraphs, limit)
+
+        if ssml:
+            return f" {_SSML_PARAGRAPH_BREAK} ".join(escape(paragraph) for paragraph in paragraphs)
+        return " ".join(paragraphs)
+
+    def _next_chunk(self, text: str, start: int, size: int) -> Tuple[str, int]:
+        """
+        Lê a partir de start ao menos size caracteres, até o fim de um parágrafo
+
+        Blocos de código não são lidos em voz alta: saem do trecho, que é
+        estendido quando um bloco passa do fim do parágrafo.
+
+        Args:
+            text: Texto original (começando por uma quebra de linha)
+            start: Posição inicial do trecho
+            size: Tamanho mínimo do trecho
+
+        Returns:
+            Tupla (trecho sem os blocos de código, posição inicial do próximo trecho)
+        """
+        end = text.find("\n\n", start + size)
+        # Um parágrafo muito longo é cortado em uma quebra de linha ou espaço
+        if end == -1 or end > start + 4 * size:
+            end = min(len(text), start + 4 * size)
+            if end < len(text):
+                cut = text.rfind("\n", start + size, end)
+                if cut == -1:
+                    cut = text.rfind(" ", start + size, end)
+                if cut != -1:
+                    end = cut
+
+        pieces: List[str] = []
+        position = start
+        fence = _FENCE_PATTERN.search(text, position, end)
+        while fence:
+            pieces.append(text[position:fence.start()])
+            closing = _FENCE_PATTERN.search(text, fence.end())
+            position = text.find("\n", closing.end()) if closing else -1
+            if position == -1:
+                position = end = len(text)
+                break
+            if position >= end:
+                end = text.find("\n\n", position)
+                if end == -1:
+                    end = len(text)
+            fence = _FENCE_PATTERN.search(text, position, end)
+        pieces.append(text[position:end])
+        return "".join(pieces), end
+
+    def _convert(self, text: str, final: bool) -> List[str]:
+        """
+        Converte um trecho de parágrafos inteiros em parágrafos falados
+
+        Args:
+            text: Trecho do texto original, sem blocos de código
+            final: Se o trecho termina o texto (o último parágrafo só ganha
+                pontuação se terminar em título, item ou tabela)
+
+        Returns:
+            Parágrafos falados
+        """
+        text += "\n"
+        if "\t" in text or _TRAILING_SPACE_CHECK.search(text):
+            text = _TRAILING_SPACE_PATTERN.sub("\n", text.replace("\t", " "))
+        # Parágrafos são marcados antes da limpeza: uma linha que fica vazia não separa parágrafos
+        text = text.replace("\n\n", _CLOSE + _PARAGRAPH + "\n")
+        # Títulos, itens de lista, citações e linhas de tabela viram frases separadas
+        parts = _BLOCK_LINE_PATTERN.split(text)
+        if len(parts) > 1:
+            parts[1::2] = map(_BLOCK_SENTENCE.format, parts[1::2])
+            text = "".join(parts)
+            if _EMPTY_SENTENCE in text:
+                text = text.replace(_EMPTY_SENTENCE, _CLOSE)
+            if "|" in text:
+                text = text.replace(" |" + _CLOSE, _CLOSE).replace(" | ", ", ").replace("|", " ")
+        if not final:
+            text = text.rstrip() + _CLOSE
+
+        if "[" in text:
+            if "!" in text:
+                text = text.replace("![", "[")
+            text = _LINK_PATTERN.sub(_link_text, text)
+        if "<" in text:
+            text = _HTML_TAG_PATTERN.sub("", text)
+        if "/" in text:
+            text = _URL_PATTERN.sub("", text)
+        for marker in _EMPHASIS_MARKERS:
+            if marker[0] in text:
+                text = text.replace(marker, "")
+
+        # Marcadores viram pontuação, sem frases vazias nem pontuação repetida; o padrão
+        # começa pelo marcador, raro no texto, e por isso a busca é rápida
+        text = _REDUNDANT_CLOSE_PATTERN.sub("", text.replace("\n", " "))
+        text = text.lstrip(_CLOSE + " ").replace(_CLOSE, ".")
+        return [paragraph for paragraph in map(str.strip, text.split(_PARAGRAPH)) if paragraph]
+
+    def _truncate(self, paragraphs: List[str], limit: int) -> List[str]:
+        """Corta no último fim de frase antes do limite ou adiciona reticências"""
+        kept: List[str] = []
+        used = 0
+        for paragraph in paragraphs:
+            room = limit - used
+            if len(paragraph) <= room:
+                kept.append(paragraph)
+                used += len(paragraph) + 1
+                continue
+
+            cut = max(paragraph.rfind(mark, 0, room) for mark in _SENTENCE_END)
+            if cut != -1 and used + cut > self.min_chars:
+                kept.append(paragraph[:cut + 1])
+            elif used <= self.min_chars:
+                kept.append(paragraph[:room].rstrip() + "...")
+            break
+        return kept
+
+
+# Instância global do formatador
+speech_formatter = SpeechFormatter()
@@ -0,0 +1,58 @@
+from datetime import date, datetime
+from typing import Union
+from xml.sax.saxutils import escape, quoteattr
+
+# Pausas usadas para separar parágrafos e itens de listas faladas
+PARAGRAPH_BREAK = '<break strength="strong"/>'
+ITEM_BREAK = '<break strength="medium"/>'
+
+
+def speak(content: str) -> str:
+    """
+    Envolve o conteúdo na tag raiz <speak>
+
+    Args:
+        content: Conteúdo SSML já escapado
+
+    Returns:
+        Documento SSML completo
+    """
+    return f"<speak>{content}</speak>"
+
+
+def text(plain_text: str) -> str:
+    """Escapa texto comum para ser inserido em SSML"""
+    return escape(plain_text)
+
+
+def say_as_date(value: Union[date, datetime, str], fmt: str = "ymd") -> str:
+    """
+    Marca uma data para ser lida como data pela Alexa
+
+    Args:
+        value: Data (date/datetime) ou texto no formato indicado
+        fmt: Formato da data para o atributo format do say-as
+
+    Returns:
+        Trecho <say-as interpret-as="date">
+    """
+    if isinstance(value, (date, datetime)):
+        value = value.strftime("%Y%m%d") if fmt == "ymd" else value.isoformat()
+    return f'<say-as interpret-as="date" format={quoteattr(fmt)}>{escape(value)}</say-as>'
+
+
+def say_as_time(value: Union[datetime, str]) -> str:
+    """
+    Marca um horário do dia (HH:MM) para leitura como hora
+
+    Args:
+        value: datetime ou texto "HH:MM"
+
+    Returns:
+        Trecho SSML com o horário
+    """
+    if isinstance(value, datetime):
+        value = value.strftime("%H:%M")
+    # O say-as "time" da Alexa interpreta durações (1'21"); horários no formato
+    # HH:MM já são lidos como hora do dia, então o valor só é escapado.
+    return escape(value)
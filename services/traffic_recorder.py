@@ -0,0 +1,260 @@
+import contextvars
+import hashlib
+import hmac
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Chamadas a upstreams da requisição em andamento: [(nome, segundos, sucesso)]
+_upstream_calls: contextvars.ContextVar[Optional[List[list]]] = contextvars.ContextVar(
+    "upstream_calls", default=None
+)
+
+# Campos com identificadores de usuário, dispositivo e sessão (substituídos por pseudônimos)
+_ID_FIELDS = ("userId", "deviceId", "sessionId", "personId")
+# Campos com credenciais (substituídos por um marcador, preservando se estavam presentes)
+_SECRET_FIELDS = ("accessToken", "apiAccessToken", "consentToken", "apiEndpoint")
+# Campos do objeto person mantidos (os demais são descartados)
+_PERSON_FIELDS = ("personId", "accessToken")
+# Campos das resoluções de slot que não trazem texto do usuário
+_RESOLUTION_KEEP_FIELDS = ("authority", "code")
+
+# Valores de SECRET_KEY de exemplo: com eles os pseudônimos podem ser revertidos por força bruta
+INSECURE_SALTS = frozenset(("", "your-secret-key-here", "sua_chave_secreta_para_sessoes"))
+
+
+def record_upstream(name: str, seconds: float, ok: bool = True):
+    """Registra a duração de uma chamada a um upstream na requisição gravada em andamento (se houver)"""
+    calls = _upstream_calls.get()
+    if calls is not None:
+        calls.append([name, round(seconds, 4), 1 if ok else 0])
+
+
+@contextmanager
+def upstream_timer(name: str) -> Iterator[None]:
+    """Context manager: mede e registra uma chamada a um upstream (ver record_upstream)"""
+    if _upstream_calls.get() is None:
+        yield
+        return
+    start = time.monotonic()
+    try:
+        yield
+    except Exception:
+        record_upstream(name, time.monotonic() - start, ok=False)
+        raise
+    record_upstream(name, time.monotonic() - start)
+
+
+def _digest(value: str, salt: bytes, size: int) -> str:
+    return hmac.new(salt, value.encode("utf-8"), hashlib.sha256).hexdigest()[:size]
+
+
+def _redact_text(value: str, salt: bytes) -> str:
+    """Texto falado substituído pelo tamanho e um hash (a mesma frase gera sempre o mesmo valor)"""
+    return f"redacted.{len(value)}.{_digest(value, salt, 12)}"
+
+
+def _redact_strings(value: Any, salt: bytes) -> Any:
+    """Resoluções de slot: todos os textos viram hash, exceto autoridade e código do status"""
+    if isinstance(value, dict):
+        return {key: item if key in _RESOLUTION_KEEP_FIELDS else _redact_strings(item, salt)
+                for key, item in value.items()}
+    if isinstance(value, list):
+        return [_redact_strings(item, salt) for item in value]
+    if isinstance(value, str):
+        return _redact_text(value, salt)
+    return value
+
+
+def _redact_slot(slot: Any, salt: bytes) -> Any:
+    """Slot sem o valor falado nem as resoluções (mantém nome, tipo e status de confirmação)"""
+    if not isinstance(slot, dict):
+        return slot
+    redacted = {}
+    for key, item in slot.items():
+        if key == "value" and isinstance(item, str):
+            redacted[key] = _redact_text(item, salt)
+        elif key == "resolutions":
+            redacted[key] = _redact_strings(item, salt)
+        elif key == "slotValue":
+            redacted[key] = _redact_slot(item, salt)
+        elif key == "values" and isinstance(item, list):
+            redacted[key] = [_redact_slot(value, salt) for value in item]
+        else:
+            redacted[key] = item
+    return redacted
+
+
+def redact_envelope(value: Any, salt: bytes, raw_text: bool = False) -> Any:
+    """
+    Cópia do envelope da Alexa sem credenciais e com identificadores pseudonimizados
+
+    O mesmo ID gera sempre o mesmo pseudônimo (HMAC com salt), preservando a
+    distribuição de usuários e sessões para o replay. Os valores dos slots (o que
+    o usuário falou) e suas resoluções viram tamanho e hash, a menos que raw_text
+    seja True; do objeto person só fica o pseudônimo.
+    """
+    if isinstance(value, dict):
+        redacted = {}
+        for key, item in value.items():
+            if key in _SECRET_FIELDS:
+                redacted[key] = "redacted" if item else item
+            elif key in _ID_FIELDS and isinstance(item, str):
+                redacted[key] = f"{key}.{_digest(item, salt, 20)}"
+            elif key == "slots" and isinstance(item, dict) and not raw_text:
+                redacted[key] = {name: _redact_slot(slot, salt) for name, slot in item.items()}
+            elif key == "person" and isinstance(item, dict):
+                redacted[key] = redact_envelope({field: item[field] for field in _PERSON_FIELDS if field in item}, salt)
+            else:
+                redacted[key] = redact_envelope(item, salt, raw_text)
+        return redacted
+    if isinstance(value, list):
+        return [redact_envelope(item, salt, raw_text) for item in value]
+    return value
+
+
+class TrafficRecorder:
+    """
+    Gravação de tráfego da Alexa para replay (opt-in)
+
+    Cada requisição vira uma linha JSON compacta num arquivo só de acréscimo:
+    instante relativo ao início da gravação, envelope sem credenciais e com IDs
+    pseudonimizados, status, latência total e as chamadas aos upstreams (Gemini,
+    Calendar, OAuth, Alexa Settings) com suas durações. A escrita é feita por uma
+    thread própria; a requisição só enfileira a linha.
+
+    O texto falado só é gravado em claro com raw_text=True. O salt dos pseudônimos
+    (SECRET_KEY) não pode ser um valor de exemplo.
+    """
+
+    def __init__(self, filepath: str, sample_rate: float = 1.0, salt: str = "", raw_text: bool = False,
+                 clock=time.monotonic):
+        if salt in INSECURE_SALTS:
+            raise ValueError("A gravação de tráfego exige um SECRET_KEY próprio: com o valor de exemplo "
+                             "os IDs pseudonimizados podem ser revertidos")
+        self.filepath = filepath
+        self.sample_rate = sample_rate
+        self.salt = salt.encode("utf-8")
+        self.raw_text = raw_text
+        self.clock = clock
+        self.started_at = clock()
+        self.random = random.Random()
+        self._queue: "queue.SimpleQueue[Optional[str]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def sampled(self) -> bool:
+        """Sorteia se a próxima requisição será gravada"""
+        return self.sample_rate >= 1.0 or self.random.random() < self.sample_rate
+
+    def record(self, started_at: float, body: bytes, status: int, latency: float, upstream: List[list]):
+        """
+        Enfileira uma requisição gravada
+
+        Args:
+            started_at: Chegada da requisição (clock do gravador)
+            body: Corpo da requisição
+            status: Status HTTP da resposta
+            latency: Tempo até o fim da resposta, em segundos
+            upstream: Chamadas aos upstreams [(nome, segundos, sucesso)]
+        """
+        try:
+            envelope = redact_envelope(json.loads(body), self.salt, self.raw_text)
+        except ValueError:
+            envelope = None
+        entry = {
+            "t": round(started_at - self.started_at, 4),
+            "status": status,
+            "latency": round(latency, 4),
+            "upstream": upstream,
+            "envelope": envelope,
+        }
+        self._ensure_writer()
+        self._queue.put(json.dumps(entry, ensure_ascii=False, separators=(",", ":")))
+
+    def _ensure_writer(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._write_loop, name="traffic-recorder", daemon=True)
+                    self._thread.start()
+
+    def _write_loop(self):
+        try:
+            self._write_lines()
+        except OSError as e:
+            logger.error(f"Erro ao gravar tráfego em {self.filepath}: {str(e)}")
+
+    def _write_lines(self):
+        with open(self.filepath, "a", encoding="utf-8") as f:
+            while True:
+                line = self._queue.get()
+                lines = [line]
+                # Agrupa o que já estiver na fila numa única escrita
+                while True:
+                    try:
+                        lines.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = None in lines
+                lines = [item for item in lines if item is not None]
+                if lines:
+                    f.write("\n".join(lines) + "\n")
+                    f.flush()
+                    self.recorded += len(lines)
+                if stop:
+                    return
+
+    def close(self, timeout: float = 5.0):
+        """Grava o que estiver na fila e encerra a thread de escrita"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+
+class TrafficRecorderMiddleware:
+    """Middleware ASGI que grava as requisições de um caminho (padrão /alexa) no TrafficRecorder"""
+
+    def __init__(self, app, recorder: TrafficRecorder, path: str = "/alexa"):
+        self.app = app
+        self.recorder = recorder
+        self.path = path
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope["path"] != self.path or scope["method"] != "POST"
+                or not self.recorder.sampled()):
+            await self.app(scope, receive, send)
+            return
+
+        started_at = self.recorder.clock()
+        chunks = []
+        status = 500
+
+        async def recording_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                chunks.append(message.get("body", b""))
+            return message
+
+        async def recording_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        calls: List[list] = []
+        token = _upstream_calls.set(calls)
+        try:
+            await self.app(scope, recording_receive, recording_send)
+        finally:
+            _upstream_calls.reset(token)
+            self.recorder.record(started_at, b"".join(chunks), status, self.recorder.clock() - started_at, calls)
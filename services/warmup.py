@@ -0,0 +1,118 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Optional, Set
+
+from config.settings import config
+from services.cache import TTLCache
+from services.metrics import MetricsRegistry, metrics
+
+logger = logging.getLogger(__name__)
+
+# Renova o token OAuth no aquecimento se ele expirar antes disso (segundos)
+TOKEN_MIN_VALIDITY = 300
+
+
+class SessionWarmer:
+    """
+    Aquecimento em segundo plano no início de uma sessão da Alexa
+
+    Enquanto a Alexa fala a mensagem de boas-vindas, abre a conexão TLS com o
+    Gemini, renova o token OAuth do usuário se estiver perto de expirar e deixa a
+    agenda de hoje no cache do CalendarService. O primeiro intent da sessão encontra
+    tudo pronto em vez de pagar handshake, renovação de token e consulta ao Calendar
+    dentro do prazo de 8 segundos.
+
+    O trabalho roda num pool limitado (WARMUP_WORKERS) e cada usuário é aquecido no
+    máximo uma vez por WARMUP_INTERVAL; nada disso bloqueia a resposta à Alexa.
+    """
+
+    def __init__(self, gemini_service, calendar_service, oauth, workers: int = config.WARMUP_WORKERS,
+                 interval: float = config.WARMUP_INTERVAL, registry: MetricsRegistry = metrics):
+        self.gemini_service = gemini_service
+        self.calendar_service = calendar_service
+        self.oauth = oauth
+        self.interval = interval
+        self.registry = registry
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if workers > 0:
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="session-warmup")
+        # Usuários aquecidos recentemente (e a conexão com o Gemini, chave None)
+        self._recent: TTLCache[bool] = TTLCache(max_size=10000, ttl=interval)
+        self._lock = threading.Lock()
+        # Aquecimentos agendados ainda não terminados (esperados no encerramento)
+        self._pending: Set[Future] = set()
+
+    def _claim(self, key) -> bool:
+        """Reserva o aquecimento de uma chave se ela não foi aquecida no último intervalo"""
+        with self._lock:
+            if self._recent.get(key) is not None:
+                return False
+            self._recent.set(key, True)
+            return True
+
+    def schedule(self, user_id: str) -> bool:
+        """
+        Agenda o aquecimento para o usuário (retorna imediatamente)
+
+        Só consulta dicionários em memória: pode ser chamado no event loop.
+
+        Args:
+            user_id: ID do usuário da Alexa
+
+        Returns:
+            True se algum trabalho foi agendado
+        """
+        if self._executor is None:
+            return False
+
+        warm_gemini = self._claim(None)
+        # Token e agenda só fazem sentido para contas vinculadas
+        warm_user = bool(user_id) and user_id in self.oauth.user_tokens and self._claim(user_id)
+        if not warm_gemini and not warm_user:
+            self.registry.increment("warmup.skipped")
+            return False
+
+        future = self._executor.submit(self._warm, user_id if warm_user else None, warm_gemini)
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        self.registry.increment("warmup.scheduled")
+        return True
+
+    def _warm(self, user_id: Optional[str], warm_gemini: bool):
+        start = time.monotonic()
+        try:
+            if warm_gemini:
+                self.gemini_service.warm_up()
+
+            if user_id:
+                access_token = self.oauth.get_user_access_token(user_id, min_validity=TOKEN_MIN_VALIDITY)
+                if access_token and self.calendar_service.prefetch_day(user_id, access_token):
+                    self.registry.increment("warmup.agendas_prefetched")
+        except Exception as e:
+            # Aquecimento é oportunista: falhas aparecem de novo (e são tratadas) no intent
+            logger.warning(f"Falha no aquecimento da sessão: {str(e)}")
+            self.registry.increment("warmup.failures")
+        finally:
+            self.registry.observe("warmup.duration_seconds", time.monotonic() - start)
+
+    def _done(self, future: Future):
+        with self._lock:
+            self._pending.discard(future)
+
+    def shutdown(self, timeout: Optional[float] = 0):
+        """
+        Encerra o pool de aquecimento
+
+        Aquecimentos que ainda não começaram são cancelados; os em andamento (que
+        podem ter renovado tokens OAuth) são esperados por até timeout segundos
+        (None espera sem limite).
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            with self._lock:
+                pending = list(self._pending)
+            wait(pending, timeout)
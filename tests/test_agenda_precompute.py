@@ -0,0 +1,74 @@
+"""
+Testes da idade máxima da agenda pré-calculada servida pelo handler
+
+O Calendar, o OAuth e os canais de notificação são objetos falsos; o relógio é injetado.
+"""
+import logging
+import os
+from datetime import timezone
+
+os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+os.environ.setdefault("SEMANTIC_CACHE_EMBEDDER", "")
+logging.disable(logging.CRITICAL)
+
+import pytest  # noqa: E402
+
+from config.settings import config  # noqa: E402
+from models.alexa_handler import AlexaRequestHandler  # noqa: E402
+from services.agenda_precompute import AgendaPrecomputer  # noqa: E402
+from services.calendar_service import CalendarService  # noqa: E402
+
+USER = "amzn1.ask.account.teste"
+
+
+class FakeOAuth:
+    def get_user_access_token(self, user_id):
+        return "token"
+
+
+class FakeCalendar:
+    day_range = staticmethod(CalendarService.day_range)
+
+    def initialize_service(self, access_token):
+        return True
+
+    def user_timezone(self, user_id, fallback=None):
+        return timezone.utc
+
+    def get_events(self, time_min, time_max, user_id, time_zone):
+        return {"success": True, "events": [], "count": 0}
+
+    def format_events_for_speech(self, events, ssml=False):
+        return "Você não tem eventos agendados."
+
+
+class FakeWatch:
+    def __init__(self, open_channel: bool):
+        self.open_channel = open_channel
+
+    def channel_for(self, user_id):
+        return object() if self.open_channel else None
+
+
+def make_handler(now, open_channel: bool) -> AlexaRequestHandler:
+    precomputer = AgendaPrecomputer(FakeCalendar(), FakeOAuth(), max_age=14400, clock=lambda: now[0])
+    assert precomputer.refresh_user(USER)
+    handler = AlexaRequestHandler.__new__(AlexaRequestHandler)
+    handler.agenda_precomputer = precomputer
+    handler.calendar_watch = FakeWatch(open_channel)
+    return handler
+
+
+@pytest.mark.parametrize("open_channel,served_after", [
+    (True, 14400),
+    (False, config.AGENDA_FRESH_SECONDS),
+])
+def test_precomputed_speech_age_depends_on_open_channel(open_channel, served_after):
+    now = [1000.0]
+    handler = make_handler(now, open_channel)
+    today = CalendarService.day_range(0, tz=timezone.utc)[0].date()
+
+    now[0] += served_after
+    assert handler.precomputed_speech(USER, today) == "Você não tem eventos agendados."
+    now[0] += 1
+    assert handler.precomputed_speech(USER, today) is None
@@ -0,0 +1,228 @@
+"""
+Testes offline da verificação de origem da Alexa
+
+Uma CA raiz autoassinada e um certificado de echo-api.amazon.com são gerados na
+hora; o download da cadeia é substituído pelo cert_fetcher injetável.
+"""
+import base64
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from cryptography.x509.oid import ExtendedKeyUsageOID, NameOID
+from starlette.datastructures import Headers
+
+from services.alexa_verification import AlexaRequestVerifier, AlexaVerificationError
+
+NOW = datetime(2026, 1, 15, 12, 0, tzinfo=timezone.utc)
+CERT_URL = "https://s3.amazonaws.com/echo.api/echo-api-cert-12.pem"
+SKILL_ID = "amzn1.ask.skill.test123"
+
+
+def _name(common_name: str) -> x509.Name:
+    return x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, common_name)])
+
+
+def _certificate(subject_key, issuer_key, subject: str, issuer: str, ca: bool, san=None) -> x509.Certificate:
+    builder = (
+        x509.CertificateBuilder()
+        .subject_name(_name(subject))
+        .issuer_name(_name(issuer))
+        .public_key(subject_key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(NOW - timedelta(days=1))
+        .not_valid_after(NOW + timedelta(days=30))
+        .add_extension(x509.BasicConstraints(ca=ca, path_length=None), critical=True)
+        .add_extension(x509.SubjectKeyIdentifier.from_public_key(subject_key.public_key()), critical=False)
+        .add_extension(x509.AuthorityKeyIdentifier.from_issuer_public_key(issuer_key.public_key()), critical=False)
+        .add_extension(x509.KeyUsage(
+            digital_signature=True, content_commitment=False, key_encipherment=not ca,
+            data_encipherment=False, key_agreement=False, key_cert_sign=ca, crl_sign=ca,
+            encipher_only=False, decipher_only=False
+        ), critical=True)
+    )
+    if not ca:
+        builder = builder.add_extension(x509.ExtendedKeyUsage([ExtendedKeyUsageOID.SERVER_AUTH]), critical=False)
+    if san:
+        builder = builder.add_extension(x509.SubjectAlternativeName([x509.DNSName(san)]), critical=False)
+    return builder.sign(issuer_key, hashes.SHA256())
+
+
+@pytest.fixture(scope="module")
+def pki():
+    """(chave do certificado de assinatura, cadeia PEM, CA raiz, cadeia PEM sem o SAN da Alexa)"""
+    root_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    leaf_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    root = _certificate(root_key, root_key, "CA de teste", "CA de teste", ca=True)
+    leaf = _certificate(leaf_key, root_key, "echo-api.amazon.com", "CA de teste", ca=False,
+                        san="echo-api.amazon.com")
+    other = _certificate(leaf_key, root_key, "example.com", "CA de teste", ca=False, san="example.com")
+    pem = serialization.Encoding.PEM
+    return leaf_key, leaf.public_bytes(pem) + root.public_bytes(pem), root, other.public_bytes(pem)
+
+
+class Fetcher:
+    """cert_fetcher que conta os downloads e opcionalmente falha ou espera ser liberado"""
+
+    def __init__(self, chain: bytes = b"", error: Exception = None, release: threading.Event = None):
+        self.chain = chain
+        self.error = error
+        self.release = release
+        self.calls = 0
+
+    def __call__(self, url: str) -> bytes:
+        self.calls += 1
+        if self.release is not None:
+            self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.chain
+
+
+def make_verifier(pki, fetcher, **kwargs) -> AlexaRequestVerifier:
+    kwargs.setdefault("trusted_roots", [pki[2]])
+    kwargs.setdefault("clock", NOW.timestamp)
+    return AlexaRequestVerifier(skill_id=SKILL_ID, cert_fetcher=fetcher, **kwargs)
+
+
+def signed_request(leaf_key, cert_url: str = CERT_URL, timestamp: datetime = NOW):
+    """(cabeçalhos, corpo) de um LaunchRequest assinado como a Alexa assina"""
+    body = json.dumps({
+        "version": "1.0",
+        "context": {"System": {"application": {"applicationId": SKILL_ID}}},
+        "request": {"type": "LaunchRequest", "timestamp": timestamp.strftime("%Y-%m-%dT%H:%M:%SZ")}
+    }).encode()
+    signature = leaf_key.sign(body, padding.PKCS1v15(), hashes.SHA256())
+    headers = Headers({
+        "SignatureCertChainUrl": cert_url,
+        "Signature-256": base64.b64encode(signature).decode()
+    })
+    return headers, body
+
+
+def test_valid_request_downloads_certificate_once(pki):
+    fetcher = Fetcher(pki[1])
+    verifier = make_verifier(pki, fetcher)
+    headers, body = signed_request(pki[0])
+
+    assert verifier.verify(headers, body).timestamp == "2026-01-15T12:00:00Z"
+    verifier.verify(headers, body)
+    assert fetcher.calls == 1
+
+
+def test_tampered_body_is_rejected(pki):
+    verifier = make_verifier(pki, Fetcher(pki[1]))
+    headers, body = signed_request(pki[0])
+
+    with pytest.raises(AlexaVerificationError, match="Assinatura inválida"):
+        verifier.verify(headers, body.replace(b"LaunchRequest", b"IntentRequest"))
+
+
+@pytest.mark.parametrize("cert_url", [
+    "http://s3.amazonaws.com/echo.api/echo-api-cert.pem",
+    "https://notamazon.com/echo.api/echo-api-cert.pem",
+    "https://s3.amazonaws.com/EcHo.aPi/echo-api-cert.pem",
+    "https://s3.amazonaws.com/echo.api/../invalid.pem",
+    "https://s3.amazonaws.com:563/echo.api/echo-api-cert.pem",
+])
+def test_foreign_cert_url_is_rejected_without_download(pki, cert_url):
+    fetcher = Fetcher(pki[1])
+    verifier = make_verifier(pki, fetcher)
+
+    with pytest.raises(AlexaVerificationError):
+        verifier.verify(*signed_request(pki[0], cert_url=cert_url))
+    assert fetcher.calls == 0
+
+
+def test_stale_timestamp_is_rejected_without_download(pki):
+    fetcher = Fetcher(pki[1])
+    verifier = make_verifier(pki, fetcher)
+
+    with pytest.raises(AlexaVerificationError, match="Timestamp"):
+        verifier.verify(*signed_request(pki[0], timestamp=NOW - timedelta(minutes=5)))
+    assert fetcher.calls == 0
+
+
+def test_untrusted_or_foreign_certificate_is_rejected(pki):
+    other_root = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    other_ca = _certificate(other_root, other_root, "Outra CA", "Outra CA", ca=True)
+    untrusted = make_verifier(pki, Fetcher(pki[1]), trusted_roots=[other_ca])
+    foreign = make_verifier(pki, Fetcher(pki[3]))
+    headers, body = signed_request(pki[0])
+
+    for verifier in (untrusted, foreign):
+        with pytest.raises(AlexaVerificationError, match="Cadeia de certificados inválida"):
+            verifier.verify(headers, body)
+
+
+def test_failed_url_is_refused_without_download_until_failure_ttl(pki):
+    now = [NOW.timestamp()]
+    fetcher = Fetcher(error=OSError("timeout"))
+    verifier = make_verifier(pki, fetcher, failure_ttl=60, clock=lambda: now[0])
+    headers, body = signed_request(pki[0])
+
+    for _ in range(3):
+        with pytest.raises(AlexaVerificationError, match="Não foi possível obter o certificado"):
+            verifier.verify(headers, body)
+    assert fetcher.calls == 1
+
+    now[0] += 61
+    fetcher.error = None
+    fetcher.chain = pki[1]
+    verifier.verify(*signed_request(pki[0], timestamp=datetime.fromtimestamp(now[0], tz=timezone.utc)))
+    assert fetcher.calls == 2
+
+
+def test_concurrent_misses_share_one_download(pki):
+    release = threading.Event()
+    fetcher = Fetcher(pki[1], release=release)
+    verifier = make_verifier(pki, fetcher)
+    headers, body = signed_request(pki[0])
+    errors = []
+
+    def verify():
+        try:
+            verifier.verify(headers, body)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=verify) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert errors == []
+    assert fetcher.calls == 1
+
+
+def test_distinct_urls_downloading_at_once_are_capped(pki):
+    release = threading.Event()
+    verifier = make_verifier(pki, Fetcher(pki[1], release=release), max_pending_fetches=1)
+    slow = threading.Thread(target=verifier.load_public_key, args=(CERT_URL,))
+    slow.start()
+    time.sleep(0.1)
+
+    with pytest.raises(AlexaVerificationError, match="Muitos certificados"):
+        verifier.load_public_key("https://s3.amazonaws.com/echo.api/outro.pem")
+    release.set()
+    slow.join(5)
+    assert verifier.cached_public_key(CERT_URL) is not None
+
+
+def test_caches_keep_at_most_max_urls(pki):
+    fetcher = Fetcher(error=OSError("404"))
+    verifier = make_verifier(pki, fetcher, max_urls=3)
+
+    for i in range(10):
+        with pytest.raises(AlexaVerificationError):
+            verifier.load_public_key(f"https://s3.amazonaws.com/echo.api/cert-{i}.pem")
+    assert len(verifier._failures) == 3
+    assert fetcher.calls == 10
@@ -0,0 +1,84 @@
+"""
+Testes da espera entre tentativas dos canais de notificação do Calendar
+
+O Calendar e o OAuth são substituídos por objetos falsos; o relógio é injetado.
+"""
+import logging
+import os
+
+# Antes de carregar config: os outros testes importam o mesmo config.settings
+os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+os.environ.setdefault("SEMANTIC_CACHE_EMBEDDER", "")
+logging.disable(logging.CRITICAL)
+
+from services.calendar_watch import CalendarWatchManager  # noqa: E402
+
+
+class FakeOAuth:
+    def __init__(self, *user_ids):
+        self.user_tokens = {user_id: {} for user_id in user_ids}
+        self.refreshes = 0
+
+    def get_user_access_token(self, user_id):
+        self.refreshes += 1
+        return "token"
+
+
+class FakeCalendar:
+    """Calendar cujo events.watch falha (403) enquanto forbidden estiver ligado"""
+
+    def __init__(self):
+        self.forbidden = True
+        self.watches = 0
+
+    def initialize_service(self, access_token):
+        return True
+
+    def watch_events(self, channel_id, address, token, ttl):
+        self.watches += 1
+        if self.forbidden:
+            return {"success": False, "error": "403 Forbidden"}
+        return {"success": True, "resource_id": "recurso", "expiration": None}
+
+    def stop_channel(self, channel_id, resource_id):
+        return True
+
+
+def make_manager(tmp_path, now):
+    calendar = FakeCalendar()
+    oauth = FakeOAuth("ana", "bia")
+    manager = CalendarWatchManager(calendar, oauth, address="https://exemplo.com/calendar/notify",
+                                   tick=300, max_backoff=1200, clock=lambda: now[0],
+                                   filepath=str(tmp_path / "canais.json"))
+    return manager, calendar, oauth
+
+
+def test_failing_user_backs_off_exponentially(tmp_path):
+    now = [1000.0]
+    manager, calendar, oauth = make_manager(tmp_path, now)
+    calendar.forbidden = True
+
+    # Falha no primeiro tick: espera 300s, depois 600s, depois o teto de 1200s
+    retries = []
+    for _ in range(50):
+        if manager.due_users():
+            retries.append(now[0])
+            manager.run_once()
+        now[0] += 60
+    assert [b - a for a, b in zip(retries, retries[1:])] == [300, 600, 1200]
+    assert calendar.watches == 2 * len(retries)
+    assert oauth.refreshes == calendar.watches
+
+
+def test_success_clears_backoff(tmp_path):
+    now = [1000.0]
+    manager, calendar, _ = make_manager(tmp_path, now)
+
+    assert manager.run_once() == 0
+    assert manager.due_users() == []
+
+    now[0] += 300
+    calendar.forbidden = False
+    assert manager.run_once() == 2
+    assert manager._failures == {}
+    assert manager.channel_for("ana") is not None
@@ -0,0 +1,92 @@
+"""
+Testes das requisições de hedge do Gemini
+
+O envio HTTP é substituído por respostas falsas com latência controlada; nenhuma
+chamada sai da máquina.
+"""
+import logging
+import os
+import threading
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+os.environ.setdefault("SEMANTIC_CACHE_EMBEDDER", "")
+logging.disable(logging.CRITICAL)
+
+import pytest  # noqa: E402
+
+from services.gemini_service import GeminiService  # noqa: E402
+from services.rate_limiter import TokenBucket  # noqa: E402
+
+URL = "http://gemini.invalid/models/teste:generateContent"
+
+
+class FakeResponse:
+    def __init__(self, name: str):
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def hedged():
+    """(serviço com hedge após 0.1 s, latências por cópia, respostas enviadas)"""
+    service = GeminiService()
+    service.hedge_delay = 0.1
+    service.rate_limiter = TokenBucket(rate=0, capacity=1)
+    latencies = [0.5, 0.05]
+    responses = []
+    lock = threading.Lock()
+
+    def send(url, payload, timeout, stream=False):
+        with lock:
+            index = len(responses)
+            response = FakeResponse("primeira" if index == 0 else "cópia")
+            responses.append(response)
+        time.sleep(latencies[index])
+        return response
+
+    service._send = send
+    yield service, latencies, responses
+    service.close()
+
+
+def test_hedge_takes_a_limiter_permit_until_the_slower_copy_finishes(hedged):
+    service, _, responses = hedged
+    permit = service.limiter.acquire()
+
+    response = service._send_hedged(URL, {}, timeout=5)
+
+    assert response.name == "cópia"
+    assert service.limiter.in_flight == 2
+    time.sleep(0.6)
+    assert service.limiter.in_flight == 1
+    assert responses[0].closed and not response.closed
+    service.limiter.release(permit)
+    assert service.limiter.in_flight == 0
+
+
+def test_no_hedge_without_a_free_limiter_slot(hedged):
+    service, _, responses = hedged
+    service.limiter.limit = 1.0
+    permit = service.limiter.acquire()
+
+    response = service._send_hedged(URL, {}, timeout=5)
+
+    assert response.name == "primeira"
+    assert len(responses) == 1
+    service.limiter.release(permit)
+
+
+def test_slower_hedge_copy_is_closed_when_the_first_wins(hedged):
+    service, latencies, responses = hedged
+    latencies[:] = [0.2, 0.5]
+
+    response = service._send_hedged(URL, {}, timeout=5)
+
+    assert response.name == "primeira"
+    time.sleep(0.5)
+    assert responses[1].closed and not response.closed
+    assert service.limiter.in_flight == 0
@@ -0,0 +1,92 @@
+"""
+Testes da cota local do Gemini e do Retry-After contra o servidor falso
+
+O servidor falso (benchmarks/fake_gemini_server.py) responde 429 com o
+Retry-After configurado; nenhuma chamada sai da máquina.
+"""
+import logging
+import os
+import threading
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+os.environ.setdefault("SEMANTIC_CACHE_EMBEDDER", "")
+logging.disable(logging.CRITICAL)
+
+import pytest  # noqa: E402
+
+from benchmarks.fake_gemini_server import FakeGeminiBehavior, FakeGeminiServer  # noqa: E402
+from config.settings import config  # noqa: E402
+from services.gemini_service import GeminiService  # noqa: E402
+from services.rate_limiter import TokenBucket, token_bucket_for  # noqa: E402
+
+
+@pytest.fixture
+def fake_gemini():
+    """(serviço apontado para o servidor falso, comportamento do servidor)"""
+    behavior = FakeGeminiBehavior(latency=0.01)
+    with FakeGeminiServer(behavior) as server:
+        service = GeminiService()
+        service.base_url = server.base_url
+        # Bucket próprio: as pausas de Retry-After de um teste não valem para os outros
+        service.rate_limiter = TokenBucket(rate=0, capacity=1)
+        yield service, behavior
+
+
+def test_local_quota_is_disabled_by_default():
+    assert config.GEMINI_RATE_LIMIT_RPM == 0
+    bucket = token_bucket_for("chave-sem-cota", rate=0, capacity=10)
+
+    assert all(bucket.try_acquire() for _ in range(100))
+    assert bucket.acquire(deadline=time.monotonic())
+
+
+def test_disabled_quota_still_honours_retry_after():
+    bucket = TokenBucket(rate=0, capacity=10)
+    bucket.pause_until(time.monotonic() + 0.2)
+
+    assert not bucket.try_acquire()
+    assert not bucket.acquire(deadline=time.monotonic() + 0.05)
+    assert bucket.acquire(deadline=time.monotonic() + 1)
+
+
+def test_retry_after_beyond_deadline_fails_fast(fake_gemini):
+    service, behavior = fake_gemini
+    behavior.rate_limited = 1.0
+    behavior.retry_after = "30"
+
+    start = time.monotonic()
+    result = service.generate_content("qual a capital da França", deadline=start + 3)
+
+    assert not result["success"]
+    assert time.monotonic() - start < 1.5
+    assert behavior.requests == 1
+
+
+def test_retry_after_within_deadline_is_retried(fake_gemini):
+    service, behavior = fake_gemini
+    behavior.rate_limited = 1.0
+    behavior.retry_after = "1"
+    recover = threading.Timer(0.3, lambda: setattr(behavior, "rate_limited", 0.0))
+    recover.start()
+
+    start = time.monotonic()
+    result = service.generate_content("qual a capital da Itália", deadline=start + 5)
+    recover.join()
+
+    assert result["success"]
+    assert time.monotonic() - start >= 1.0
+    assert behavior.requests == 2
+
+
+def test_retry_after_without_deadline_is_bounded_by_request_timeout(fake_gemini):
+    service, behavior = fake_gemini
+    behavior.rate_limited = 1.0
+    behavior.retry_after = str(int(service.request_timeout) + 60)
+
+    start = time.monotonic()
+    result = service.generate_content("quem descobriu o Brasil")
+
+    assert not result["success"]
+    assert time.monotonic() - start < 1.5
+    assert behavior.requests == 1
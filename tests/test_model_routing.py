@@ -0,0 +1,62 @@
+"""
+Testes do orçamento de fala e de raciocínio dos pedidos de detalhes
+
+A requisição ao Gemini é capturada antes do envio; nenhuma chamada sai da máquina.
+"""
+import logging
+import os
+
+os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+os.environ.setdefault("SEMANTIC_CACHE_EMBEDDER", "")
+logging.disable(logging.CRITICAL)
+
+import pytest  # noqa: E402
+
+from config.settings import config  # noqa: E402
+from services.gemini_service import GeminiService  # noqa: E402
+from services.model_router import TIER_DEFAULT, TIER_DETAILED  # noqa: E402
+
+
+@pytest.fixture
+def captured():
+    """(serviço com os modelos 2.5 Flash, payloads enviados)"""
+    service = GeminiService()
+    service.router.models[TIER_DEFAULT] = "gemini-2.5-flash"
+    service.router.models[TIER_DETAILED] = "gemini-2.5-flash"
+    payloads = []
+
+    def post_generate(payload, priority, deadline, model=None):
+        payloads.append(payload)
+        return {"candidates": [{"content": {"parts": [{"text": "resposta"}]}}]}
+
+    service._post_generate = post_generate
+    return service, payloads
+
+
+def test_detailed_request_gets_longer_speech_and_keeps_thinking(captured):
+    service, payloads = captured
+    prompt = "explique em detalhes como funciona a inflação"
+    max_chars = service.speech_limit(prompt, config.SPEECH_MAX_CHARS)
+
+    assert service.generate_content(prompt, max_speech_chars=max_chars)["success"]
+
+    generation = payloads[0]["generationConfig"]
+    assert max_chars == config.SPEECH_MAX_CHARS_DETAILED > config.SPEECH_MAX_CHARS
+    assert generation["thinkingConfig"] == {"thinkingBudget": config.GEMINI_DETAILED_THINKING_BUDGET}
+    assert generation["maxOutputTokens"] == (service.output_budget(max_chars)
+                                             + config.GEMINI_DETAILED_THINKING_BUDGET)
+    assert str(max_chars) in payloads[0]["systemInstruction"]["parts"][0]["text"]
+
+
+def test_default_request_keeps_speech_budget_without_thinking(captured):
+    service, payloads = captured
+    prompt = "por que o céu é azul durante o dia"
+    max_chars = service.speech_limit(prompt, config.SPEECH_MAX_CHARS)
+
+    assert service.generate_content(prompt, max_speech_chars=max_chars)["success"]
+
+    generation = payloads[0]["generationConfig"]
+    assert max_chars == config.SPEECH_MAX_CHARS
+    assert generation["thinkingConfig"] == {"thinkingBudget": 0}
+    assert generation["maxOutputTokens"] == service.output_budget(max_chars)
+    assert service.router.classify(prompt) != TIER_DETAILED
@@ -0,0 +1,94 @@
+"""
+Testes do cache semântico com perguntas quase iguais de sentido oposto
+
+Os embeddings vêm do embedContent do Gemini falso (benchmarks/fake_gemini_server.py),
+com o embedder injetado em FakeGeminiBehavior.embed; nenhuma chamada sai da máquina.
+"""
+import logging
+import os
+
+os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+os.environ.setdefault("SEMANTIC_CACHE_EMBEDDER", "")
+logging.disable(logging.CRITICAL)
+
+import pytest  # noqa: E402
+
+from benchmarks.fake_gemini_server import FakeGeminiBehavior, FakeGeminiServer  # noqa: E402
+from config.settings import config  # noqa: E402
+from services.gemini_service import GeminiService  # noqa: E402
+from services.metrics import MetricsRegistry  # noqa: E402
+from services.rate_limiter import TokenBucket  # noqa: E402
+from services.semantic_cache import HashingEmbedder, SemanticAnswerCache  # noqa: E402
+
+NEAR_MISSES = [
+    ("como faço para ligar o modo avião no meu celular android samsung galaxy",
+     "como faço para desligar o modo avião no meu celular android samsung galaxy"),
+    ("qual é o maior rio em volume de água da américa do sul",
+     "qual é o menor rio em volume de água da américa do sul"),
+    ("quem foi o primeiro presidente da república federativa do brasil depois da ditadura militar",
+     "quem foi o segundo presidente da república federativa do brasil depois da ditadura militar"),
+    ("quantos gols pelé fez na carreira", "quantos gols pelé não fez na carreira"),
+    ("quem ganhou a copa de 2002", "quem ganhou a copa de 2006"),
+    ("é possível viajar no tempo", "é impossível viajar no tempo"),
+    ("qual a primeira capital do brasil", "qual a última capital do brasil"),
+]
+PARAPHRASES = [
+    ("O que é IA?", "me explica inteligência artificial"),
+    ("qual o maior rio do mundo", "Alexa, qual é o maior rio do mundo?"),
+    ("quantos gols pelé não fez", "quantos gols o pelé não fez"),
+]
+
+
+def constant_embedder(text):
+    """Pior embedder possível: toda pergunta tem similaridade 1.0 com todas as outras"""
+    return [1.0, 0.0, 0.0]
+
+
+@pytest.fixture(params=[constant_embedder, HashingEmbedder()], ids=["constante", "hashing"])
+def fake_gemini(request):
+    """(serviço com cache semântico por embedContent do servidor falso, comportamento do servidor)"""
+    behavior = FakeGeminiBehavior(latency=0.0, embed=request.param)
+    with FakeGeminiServer(behavior) as server:
+        service = GeminiService()
+        service.base_url = server.base_url
+        service.rate_limiter = TokenBucket(rate=0, capacity=1)
+        service.semantic_cache = SemanticAnswerCache(service.embed_content, threshold=0.9,
+                                                     registry=MetricsRegistry())
+        yield service, behavior
+
+
+def test_semantic_cache_is_off_by_default():
+    assert config.SEMANTIC_CACHE_EMBEDDER == ""
+    assert GeminiService().semantic_cache is None
+
+
+@pytest.mark.parametrize("first,second", NEAR_MISSES)
+def test_near_miss_is_not_served_from_cache(fake_gemini, first, second):
+    service, behavior = fake_gemini
+
+    assert service.generate_content(first)["success"]
+    result = service.generate_content(second)
+
+    assert result["success"]
+    assert not result.get("cached")
+    assert behavior.requests == 2
+    assert behavior.embed_requests == 2
+
+
+@pytest.mark.parametrize("first,second", PARAPHRASES)
+def test_paraphrase_is_served_from_cache(first, second):
+    cache = SemanticAnswerCache(constant_embedder, threshold=0.9, registry=MetricsRegistry())
+    vector, _ = cache.lookup(first)
+    cache.add(vector, "resposta", first)
+
+    assert cache.lookup(second)[1] == "resposta"
+
+
+def test_matching_entry_is_found_behind_a_near_miss():
+    cache = SemanticAnswerCache(constant_embedder, threshold=0.9, registry=MetricsRegistry())
+    for question in ("quantos gols pelé fez", "quantos gols pelé não fez"):
+        vector, _ = cache.lookup(question)
+        cache.add(vector, question, question)
+
+    assert cache.lookup("quantos gols o pelé não fez")[1] == "quantos gols pelé não fez"
+    assert cache.lookup("quantos gols o pelé fez")[1] == "quantos gols pelé fez"